@@ -272,6 +272,12 @@ class MultiTrace:
     of the MultiTrace instance, which returns the number of draws), the
     trace with the highest chain number is always used.
 
+    The values of several chains combined by `get_values` and
+    `get_sampler_stats` are cached per variable, burn and thin, so that
+    repeated accesses do not concatenate the chains again, and the values of
+    a single chain are views of the trace. Copy them before modifying them in
+    place.
+
     Attributes
     ----------
     nchains: int
@@ -291,6 +297,7 @@ class MultiTrace:
                 raise ValueError("Chains are not unique.")
             self._straces[strace.chain] = strace
 
+        self._values_cache = {}
         self._report = SamplerReport()
         for strace in straces:
             if hasattr(strace, "_warnings"):
@@ -345,7 +352,15 @@ class MultiTrace:
             return self.get_sampler_stats(var, burn=burn, thin=thin)
         raise KeyError("Unknown variable %s" % var)
 
-    _attrs = {"_straces", "varnames", "chains", "stat_names", "supports_sampler_stats", "_report"}
+    _attrs = {
+        "_straces",
+        "varnames",
+        "chains",
+        "stat_names",
+        "supports_sampler_stats",
+        "_report",
+        "_values_cache",
+    }
 
     def __getattr__(self, name):
         # Avoid infinite recursion when called before __init__
@@ -370,6 +385,41 @@ class MultiTrace:
         chain = self.chains[-1]
         return len(self._straces[chain])
 
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_values_cache"] = {}
+        return state
+
+    def __setstate__(self, state):
+        state.setdefault("_values_cache", {})
+        self.__dict__.update(state)
+
+    def _cached_values(self, key, chains, get, combine, squeeze):
+        """Get the values of `chains` with `get(chain)`, caching the combined
+        values of the last `key`.
+
+        The lengths of the chains are part of the key, since traces that are
+        still being sampled grow. The combined values are returned read-only,
+        since they are shared with the cache or are a view of the trace.
+        """
+        if not combine:
+            return _squeeze_cat([get(chain) for chain in chains], combine, squeeze)
+        if len(chains) == 1:
+            results = get(chains[0]).view()
+        else:
+            key = key + tuple((chain, len(self._straces[chain])) for chain in chains)
+            if key in self._values_cache:
+                results = self._values_cache[key]
+            else:
+                results = np.concatenate([get(chain) for chain in chains])
+                self._values_cache.clear()
+                self._values_cache[key] = results
+        results.setflags(write=False)
+        return results if squeeze else [results]
+
+    def _clear_cache(self):
+        self._values_cache.clear()
+
     @property
     def varnames(self):
         chain = self.chains[-1]
@@ -431,6 +481,7 @@ class MultiTrace:
                 )
 
             v = np.squeeze(v.reshape(len(chains), len(self), -1))
+            self._clear_cache()
 
             for idx, chain in enumerate(chains.values()):
                 if new_var:
@@ -450,6 +501,7 @@ class MultiTrace:
         if name not in varnames:
             raise KeyError(f"Unknown variable {name}")
         self.varnames.remove(name)
+        self._clear_cache()
         chains = self._straces
         for chain in chains.values():
             for va in chain.vars:
@@ -484,10 +536,16 @@ class MultiTrace:
             chains = self.chains
         varname = get_var_name(varname)
         try:
-            results = [self._straces[chain].get_values(varname, burn, thin) for chain in chains]
+            chains = tuple(chains)
         except TypeError:  # Single chain passed.
-            results = [self._straces[chains].get_values(varname, burn, thin)]
-        return _squeeze_cat(results, combine, squeeze)
+            chains = (chains,)
+        return self._cached_values(
+            ("values", varname, burn, thin),
+            chains,
+            lambda chain: self._straces[chain].get_values(varname, burn, thin),
+            combine,
+            squeeze,
+        )
 
     def get_sampler_stats(self, stat_name, burn=0, thin=1, combine=True, chains=None, squeeze=True):
         """Get sampler statistics from the trace.
@@ -513,14 +571,17 @@ class MultiTrace:
         if chains is None:
             chains = self.chains
         try:
-            chains = iter(chains)
+            chains = tuple(chains)
         except TypeError:
-            chains = [chains]
-
-        results = [
-            self._straces[chain].get_sampler_stats(stat_name, None, burn, thin) for chain in chains
-        ]
-        return _squeeze_cat(results, combine, squeeze)
+            chains = (chains,)
+
+        return self._cached_values(
+            ("stats", stat_name, burn, thin),
+            chains,
+            lambda chain: self._straces[chain].get_sampler_stats(stat_name, None, burn, thin),
+            combine,
+            squeeze,
+        )
 
     def _slice(self, slice):
         """Return a new MultiTrace object sliced according to `slice`."""
@@ -591,6 +652,7 @@ def merge_traces(mtraces: List[MultiTrace]) -> MultiTrace:
             if len(strace) != chain_len:
                 raise ValueError("Chains are of different lengths.")
             base_mtrace._straces[new_chain] = strace
+    base_mtrace._clear_cache()
     base_mtrace._report = merge_reports([trace.report for trace in mtraces])
     return base_mtrace
 
@@ -25,6 +25,7 @@ import warnings
 from typing import Any, Dict, List, Optional
 
 import numpy as np
+import theano
 
 from pymc3.backends import base
 from pymc3.backends.base import MultiTrace
@@ -221,6 +222,11 @@ class NDArray(base.BaseTrace):
         self.draws = None
         self.samples = {}
         self._stats = None
+        self._stats_records = None
+        self._array_ordering = None
+        self._array_samples = None
+        self._array_derived = None
+        self._array_flushed_idx = 0
 
     # Sampling methods
 
@@ -256,22 +262,56 @@ class NDArray(base.BaseTrace):
         if sampler_vars is None:
             return
 
-        if self._stats is None:
-            self._stats = []
-            for sampler in sampler_vars:
-                data = dict()  # type: Dict[str, np.ndarray]
-                self._stats.append(data)
-                for varname, dtype in sampler.items():
-                    data[varname] = np.zeros(draws, dtype=dtype)
-        else:
-            for data, vars in zip(self._stats, sampler_vars):
+        # Sampler stats live in one record array per sampler; the dicts in
+        # `_stats` hold views of the record fields.
+        old_draws = self.draws - draws
+        records = []
+        for i, vars in enumerate(sampler_vars):
+            record = np.zeros(self.draws, dtype=[(key, dtype) for key, dtype in vars.items()])
+            if self._stats is not None:
+                data = self._stats[i]
                 if vars.keys() != data.keys():
                     raise ValueError("Sampler vars can't change")
-                old_draws = len(self)
-                for varname, dtype in vars.items():
-                    old = data[varname]
-                    new = np.zeros(draws, dtype=dtype)
-                    data[varname] = np.concatenate([old, new])
+                for varname in vars:
+                    record[varname][:old_draws] = data[varname][:old_draws]
+            records.append(record)
+        self._stats_records = records
+        self._stats = [
+            {varname: record[varname] for varname in record.dtype.names} for record in records
+        ]
+
+    def setup_array(self, ordering, dtype=None) -> None:
+        """Prepare the trace for recording flat arrays with `record_array`.
+
+        Must be called after `setup`.
+
+        Parameters
+        ----------
+        ordering: ArrayOrdering
+            Layout of the free variables of the model in the flat arrays
+            that will be recorded. It must cover all of `model.vars`.
+        dtype: str, optional
+            dtype of the flat arrays. Defaults to `theano.config.floatX`.
+        """
+        if self.draws is None:
+            raise ValueError("`setup` must be called before `setup_array`.")
+        missing = {var.name for var in self.model.vars} - set(ordering.by_name)
+        if missing:
+            raise ValueError("Ordering does not contain the free variables %s." % missing)
+        if dtype is None:
+            dtype = theano.config.floatX
+
+        derived = tuple(var for var in self.vars if var.name not in ordering.by_name)
+        # compiled once per model, before sampling, and shared across chains
+        if derived and self.model._shared_fastfn_batch(derived) is None:
+            names = [var.name for var in derived]
+            raise ValueError("The variables %s can not be computed in batches." % names)
+
+        self._flush_array()
+        self._array_ordering = ordering
+        self._array_derived = derived
+        self._array_samples = np.zeros((self.draws, ordering.size), dtype=dtype)
+        self._array_flushed_idx = self.draw_idx
 
     def record(self, point, sampler_stats=None) -> None:
         """Record results of a sampling iteration.
@@ -294,10 +334,64 @@ class NDArray(base.BaseTrace):
                     data[key][self.draw_idx] = val
         self.draw_idx += 1
 
+    def record_array(self, q, sampler_stats=None) -> None:
+        """Record results of a sampling iteration from a flat array.
+
+        The values of the variables that are not free variables of the
+        model (deterministics, untransformed variables) are computed in
+        one batch when the trace is read or closed.
+
+        Parameters
+        ----------
+        q: array
+            Values of the free variables, laid out as described by the
+            ordering passed to `setup_array`.
+        sampler_stats: list of dicts, optional
+            The diagnostic values for each sampler
+        """
+        if self._array_samples is None:
+            raise ValueError("`setup_array` must be called before `record_array`.")
+        self._array_samples[self.draw_idx] = q
+
+        if self._stats is not None and sampler_stats is None:
+            raise ValueError("Expected sampler_stats")
+        if self._stats is None and sampler_stats is not None:
+            raise ValueError("Unknown sampler_stats")
+        if sampler_stats is not None:
+            for record, vars in zip(self._stats_records, sampler_stats):
+                missing = set(record.dtype.names) - vars.keys()
+                if missing:
+                    raise ValueError("Missing sampler stats %s" % missing)
+                record[self.draw_idx] = tuple(vars[key] for key in record.dtype.names)
+        self.draw_idx += 1
+
+    def _flush_array(self):
+        """Write the pending draws of `record_array` to `samples`."""
+        start, stop = self._array_flushed_idx, self.draw_idx
+        if self._array_samples is None or start >= stop:
+            return
+        block = self._array_samples[start:stop]
+        ordering = self._array_ordering
+
+        points = {}
+        for name, slc, shp, dtype in ordering.vmap:
+            points[name] = block[:, slc].reshape((stop - start,) + tuple(shp)).astype(dtype)
+            if name in self.samples:
+                self.samples[name][start:stop] = points[name]
+
+        if self._array_derived:
+            fn = self.model._shared_fastfn_batch(self._array_derived)
+            derived = [name for name in self.varnames if name not in ordering.by_name]
+            for varname, values in zip(derived, fn(points)):
+                self.samples[varname][start:stop] = values
+        self._array_flushed_idx = stop
+
     def _get_sampler_stats(self, varname, sampler_idx, burn, thin):
         return self._stats[sampler_idx][varname][burn::thin]
 
     def close(self):
+        self._flush_array()
+        self._array_samples = None
         if self.draw_idx == self.draws:
             return
         # Remove trailing zeros if interrupted before completed all
@@ -329,6 +423,7 @@ class NDArray(base.BaseTrace):
         -------
         A NumPy array
         """
+        self._flush_array()
         return self.samples[varname][burn::thin]
 
     def _slice(self, idx):
@@ -338,6 +433,7 @@ class NDArray(base.BaseTrace):
 
         # Only the first `draw_idx` value are valid because of preallocation
         idx = slice(*idx.indices(len(self)))
+        self._flush_array()
 
         sliced = NDArray(model=self.model, vars=self.vars)
         sliced.chain = self.chain
@@ -361,6 +457,7 @@ class NDArray(base.BaseTrace):
         with variable names as keys.
         """
         idx = int(idx)
+        self._flush_array()
         return {varname: values[idx] for varname, values in self.samples.items()}
 
 
@@ -73,6 +73,8 @@ class SamplerReport:
         self._n_tune = None
         self._n_draws = None
         self._t_sampling = None
+        # calls and time per component of `pm.sample(profile=True)`
+        self.profile = None
 
     @property
     def _warnings(self):
@@ -16,6 +16,8 @@ import collections
 import io
 import os
 import pkgutil
+import queue
+import threading
 import urllib.request
 
 from copy import copy
@@ -34,6 +36,7 @@ __all__ = [
     "get_data",
     "GeneratorAdapter",
     "Minibatch",
+    "StreamingMinibatch",
     "align_minibatches",
     "Data",
 ]
@@ -446,6 +449,161 @@ class Minibatch(tt.TensorVariable):
         return ret
 
 
+class _BatchPrefetcher(threading.Thread):
+    """
+    Not for users. Background thread that reads shuffled batches from
+    an array-like source into a bounded queue.
+    """
+
+    def __init__(self, data, batch_size, dtype, random_seed=None, prefetch=2):
+        super().__init__(name="pymc3-minibatch-prefetch", daemon=True)
+        self.data = data
+        self.batch_size = batch_size
+        self.dtype = dtype
+        self.rng = np.random.RandomState(random_seed)
+        self.queue = queue.Queue(maxsize=prefetch)
+        self._halt = threading.Event()
+        self._error = None
+
+    def batch_indices(self):
+        n = self.data.shape[0]
+        while True:
+            perm = self.rng.permutation(n)
+            for start in range(0, n - self.batch_size + 1, self.batch_size):
+                # sorted indices keep reads from memory mapped or chunked storage local
+                yield np.sort(perm[start : start + self.batch_size])
+
+    def run(self):
+        try:
+            for idx in self.batch_indices():
+                if not self._put(np.asarray(self.data[idx], self.dtype)):
+                    return
+        except Exception as e:
+            self._put(e)
+
+    def _put(self, item):
+        while not self._halt.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        # the thread has exited after a failed read, so the error is raised again
+        if self._error is not None:
+            raise self._error
+        if self._halt.is_set():
+            raise StopIteration
+        item = self.queue.get()
+        if isinstance(item, Exception):
+            self._error = item
+            raise item
+        return item
+
+    def stop(self):
+        self._halt.set()
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join()
+
+
+class StreamingMinibatch(tt.TensorVariable):
+    """Minibatch that streams from out-of-core data
+
+    Unlike :class:`Minibatch` the full dataset is never copied to a
+    ``theano.shared`` variable. Batches are read from ``data`` by a
+    background thread that shuffles the rows, reads the next batches
+    ahead of time and hands them to the graph through a
+    :func:`pymc3.theanof.generator`, so every evaluation of the graph
+    (e.g. every step of :func:`pymc3.fit`) gets a fresh batch without
+    waiting on I/O.
+
+    Parameters
+    ----------
+    data: array-like or ``str``
+        anything with ``shape`` that supports indexing the first axis with
+        a sorted integer array, e.g. :class:`numpy.memmap`, ``h5py``
+        or ``zarr`` datasets. A ``str`` is treated as the path of
+        a ``.npy`` file that is opened with ``mmap_mode="r"``
+    batch_size: ``int``
+        number of rows in a batch, batches are taken along the first axis
+    dtype: ``str``
+        cast batches to specific type, defaults to ``floatX``
+        for float data
+    name: ``str``
+        name for tensor, defaults to "StreamingMinibatch"
+    random_seed: ``int``
+        random seed for shuffling the rows
+    prefetch: ``int``
+        number of batches that are read ahead of time
+
+    Attributes
+    ----------
+    prefetcher: :class:`threading.Thread`
+        background thread that reads the batches
+    minibatch: minibatch tensor
+        Used for training
+
+    Notes
+    -----
+    Rows are shuffled once per pass over the data and every batch is drawn
+    without replacement, the rows left over at the end of a pass are skipped.
+    As with :class:`Minibatch`, pass ``total_size`` to the observed node to
+    scale the density.
+
+    Examples
+    --------
+    >>> data = np.lib.format.open_memmap("data.npy", mode="w+", shape=(10 ** 6, 10))
+    >>> x = StreamingMinibatch("data.npy", batch_size=128)
+    >>> with pm.Model() as model:
+    ...     mu = pm.Normal('mu', shape=10)
+    ...     lik = pm.Normal('lik', mu, observed=x, total_size=data.shape)
+    ...     approx = pm.fit()
+    >>> x.stop()
+    """
+
+    def __init__(
+        self,
+        data,
+        batch_size=128,
+        dtype=None,
+        name="StreamingMinibatch",
+        random_seed=42,
+        prefetch=2,
+    ):
+        if isinstance(data, str):
+            data = np.load(data, mmap_mode="r")
+        if not isinstance(batch_size, int):
+            raise TypeError("Unrecognized `batch_size` type, expected int, got %r" % batch_size)
+        if not 0 < batch_size <= data.shape[0]:
+            raise ValueError(
+                "`batch_size` should be positive and not bigger than the first "
+                "dimension of the data, got %r" % batch_size
+            )
+        if dtype is None:
+            dtype = pm.smartfloatX(np.asarray(data[:1])).dtype
+        self.prefetcher = _BatchPrefetcher(data, batch_size, dtype, random_seed, prefetch)
+        self.prefetcher.start()
+        self.minibatch = pm.theanof.generator(self.prefetcher)
+        super().__init__(self.minibatch.type, None, None, name=name)
+        Apply(theano.compile.view_op, inputs=[self.minibatch], outputs=[self])
+        self.tag.test_value = copy(self.minibatch.tag.test_value)
+
+    def stop(self):
+        """Stop the background thread, the variable can't be evaluated afterwards"""
+        self.prefetcher.stop()
+
+    def clone(self):
+        ret = self.type()
+        ret.name = self.name
+        ret.tag = copy(self.tag)
+        return ret
+
+
 def align_minibatches(batches=None):
     if batches is None:
         for rngs in Minibatch.RNG.values():
@@ -80,6 +80,7 @@ from pymc3.distributions.distribution import (
 )
 from pymc3.distributions.mixture import Mixture, MixtureSameFamily, NormalMixture
 from pymc3.distributions.multivariate import (
+    GMRF,
     Dirichlet,
     DirichletMultinomial,
     KroneckerNormal,
@@ -88,6 +89,7 @@ from pymc3.distributions.multivariate import (
     MatrixNormal,
     Multinomial,
     MvNormal,
+    MvNormalLowRank,
     MvStudentT,
     Wishart,
     WishartBartlett,
@@ -153,6 +155,8 @@ __all__ = [
     "MvNormal",
     "MatrixNormal",
     "KroneckerNormal",
+    "MvNormalLowRank",
+    "GMRF",
     "MvStudentT",
     "Dirichlet",
     "Multinomial",
@@ -39,7 +39,7 @@ from pymc3.distributions.shape_utils import (
     get_broadcastable_dist_samples,
     to_tuple,
 )
-from pymc3.memoize import memoize
+from pymc3.memoize import CACHE_REGISTRY, memoize
 from pymc3.model import (
     ContextMeta,
     FreeRV,
@@ -742,8 +742,8 @@ def draw_values(params, point=None, size=None):
         # Distribution parameters may be nodes which have named node-inputs
         # specified in the point. Need to find the node-inputs, their
         # parents and children to replace them.
-        leaf_nodes, named_nodes_descendents, named_nodes_ancestors = build_named_node_tree(
-            (param for _, param in symbolic_params if hasattr(param, "name"))
+        leaf_nodes, named_nodes_descendents, named_nodes_ancestors = _named_node_tree(
+            param for _, param in symbolic_params if hasattr(param, "name")
         )
 
         # Init givens and the stack of nodes to try to `_draw_value` from
@@ -840,6 +840,63 @@ def draw_values(params, point=None, size=None):
     return [evaluated[j] for j in params]  # set the order back
 
 
+def _named_node_tree(params):
+    """Return the named node tree of `params`, see `build_named_node_tree`.
+
+    The tree only depends on the graphs of the parameters, so it is built
+    once and reused by later calls with the same parameters, e.g. for each
+    draw of `sample_posterior_predictive`. The returned dictionaries are
+    shared between calls and must not be modified.
+    """
+    # The key keeps the parameters alive, so their ids can not be reused
+    key = tuple(params)
+    try:
+        return _named_node_tree.cache[key]
+    except KeyError:
+        tree = _named_node_tree.cache[key] = build_named_node_tree(key)
+        return tree
+
+
+_named_node_tree.cache = {}
+CACHE_REGISTRY.append(_named_node_tree.cache)
+
+
+def _given_ancestors(param, variables):
+    """Return the cached set of the `variables` that `param` depends on."""
+    key = (param, tuple(variables))
+    try:
+        return _given_ancestors.cache[key]
+    except KeyError:
+        ancestors = set(theano.graph.basic.ancestors([param], blockers=list(variables)))
+        found = _given_ancestors.cache[key] = {var for var in variables if var in ancestors}
+        return found
+
+
+_given_ancestors.cache = {}
+CACHE_REGISTRY.append(_given_ancestors.cache)
+
+
+def _observed_shape(param):
+    """Return the current shape of the observations of an ObservedRV.
+
+    The observations are often a ``pm.Data`` container whose shape changes
+    with ``pm.set_data``, so the shape is computed by a function that is
+    compiled once per variable and reused for any later data.
+    """
+    observations = param.observations
+    if not isinstance(observations, theano.graph.basic.Variable):
+        return tuple(np.shape(observations))
+    try:
+        shape_fn = _observed_shape.cache[param]
+    except KeyError:
+        shape_fn = _observed_shape.cache[param] = function([], observations.shape)
+    return tuple(shape_fn())
+
+
+_observed_shape.cache = {}
+CACHE_REGISTRY.append(_observed_shape.cache)
+
+
 @memoize
 def _compile_theano_function(param, vars, givens=None):
     """Compile theano function for a given parameter and input variables.
@@ -961,10 +1018,7 @@ def _draw_value(param, point=None, givens=None, size=None):
             if hasattr(param, "observations"):
                 # shape inspection for ObservedRV
                 dist_tmp = param.distribution
-                try:
-                    distshape = param.observations.shape.eval()
-                except AttributeError:
-                    distshape = param.observations.shape
+                distshape = _observed_shape(param)
 
                 dist_tmp.shape = distshape
                 try:
@@ -995,7 +1049,7 @@ def _draw_value(param, point=None, givens=None, size=None):
                 variables = values = []
             # We only truly care if the ancestors of param that were given
             # value have the matching dshape and val.shape
-            param_ancestors = set(theano.graph.basic.ancestors([param], blockers=list(variables)))
+            param_ancestors = _given_ancestors(param, variables)
             inputs = [(var, val) for var, val in zip(variables, values) if var in param_ancestors]
             if inputs:
                 input_vars, input_vals = list(zip(*inputs))
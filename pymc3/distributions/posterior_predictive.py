@@ -2,7 +2,9 @@ from __future__ import annotations
 
 import contextvars
 import logging
+import multiprocessing
 import numbers
+import os
 import warnings
 
 from collections import UserDict
@@ -10,7 +12,6 @@ from contextlib import AbstractContextManager
 from typing import TYPE_CHECKING, Any, Callable, Dict, List, cast, overload
 
 import numpy as np
-import theano.graph.basic
 import theano.graph.fg
 import theano.tensor as tt
 
@@ -23,6 +24,9 @@ from pymc3.distributions.distribution import (
     _compile_theano_function,
     _DrawValuesContext,
     _DrawValuesContextBlocker,
+    _given_ancestors,
+    _named_node_tree,
+    _observed_shape,
     is_fast_drawable,
     vectorized_ppc,
 )
@@ -31,7 +35,7 @@ from pymc3.model import (
     Model,
     MultiObservedRV,
     ObservedRV,
-    get_named_nodes_and_relations,
+    _for_each_dataset,
     modelcontext,
 )
 from pymc3.util import chains_and_samples, dataset_to_point_list, get_var_name
@@ -149,7 +153,12 @@ def fast_sample_posterior_predictive(
     var_names: list[str] | None = None,
     keep_size: bool = False,
     random_seed=None,
-) -> dict[str, np.ndarray]:
+    chunk_size: int | None = None,
+    cores: int = 1,
+    mp_ctx=None,
+    memmap_dir: str | None = None,
+    data: dict[str, Any] | list[dict[str, Any]] | None = None,
+) -> dict[str, np.ndarray] | list[dict[str, np.ndarray]]:
     """Generate posterior predictive samples from a model given a trace.
 
     This is a vectorized alternative to the standard ``sample_posterior_predictive`` function.
@@ -176,12 +185,29 @@ def fast_sample_posterior_predictive(
         data: ``(nchains, ndraws, ...)``.
     random_seed: int
         Seed for the random number generator.
+    chunk_size: int, optional
+        Number of draws of the trace that are sampled together in one vectorized block. The
+        samples of each block are written into preallocated output arrays, so that only one
+        block of intermediate values is kept in memory. Defaults to sampling all draws at once,
+        or to splitting them evenly if ``cores > 1``.
+    cores: int
+        Number of processes among which the blocks are distributed.
+    mp_ctx: multiprocessing.context.BaseContent
+        A multiprocessing context for the parallel sampling of blocks.
+    memmap_dir: str, optional
+        Directory in which the samples are stored as memory mapped ``.npy`` files, one per
+        variable, instead of being kept in memory.
+    data: dict or list of dict, optional
+        New values for the ``pm.Data`` containers of the model, see :func:`~pymc3.set_data`.
+        With a list of dicts, the samples are generated for each dataset in turn, reusing the
+        compiled functions even if the size of the data changes. The data containers are set
+        back to their previous values afterwards.
 
     Returns
     -------
-    samples: dict
+    samples: dict or list of dict
         Dictionary with the variable names as keys, and values numpy arrays containing
-        posterior predictive samples.
+        posterior predictive samples, or a list of such dictionaries if ``data`` is a list.
     """
 
     ### Implementation note: primarily this function canonicalizes the arguments:
@@ -193,6 +219,28 @@ def fast_sample_posterior_predictive(
     ### greater than the number of samples in the trace parameter, we sample repeatedly.  This
     ### makes the shape issues just a little easier to deal with.
 
+    if data is not None:
+        if memmap_dir is not None and not isinstance(data, dict):
+            raise IncorrectArgumentsError(
+                "Can not store the samples of several datasets in memmap_dir"
+            )
+        return _for_each_dataset(
+            lambda: fast_sample_posterior_predictive(
+                trace,
+                samples=samples,
+                model=model,
+                var_names=var_names,
+                keep_size=keep_size,
+                random_seed=random_seed,
+                chunk_size=chunk_size,
+                cores=cores,
+                mp_ctx=mp_ctx,
+                memmap_dir=memmap_dir,
+            ),
+            data,
+            model=model,
+        )
+
     if isinstance(trace, InferenceData):
         nchains, ndraws = chains_and_samples(trace)
         trace = dataset_to_point_list(trace.posterior)
@@ -285,14 +333,29 @@ def fast_sample_posterior_predictive(
                         self.data[k] = v
 
         ppc_trace = _ExtendableTrace()
-        for s in _samples:
-            strace = _trace if s == len_trace else _trace[slice(0, s)]
-            try:
-                values = posterior_predictive_draw_values(cast(List[Any], vars), strace, s)
-                new_trace: dict[str, np.ndarray] = {k.name: v for (k, v) in zip(vars, values)}
-                ppc_trace.extend_trace(new_trace)
-            except KeyboardInterrupt:
-                pass
+        if chunk_size is None and cores == 1 and memmap_dir is None:
+            for s in _samples:
+                strace = _trace if s == len_trace else _trace[slice(0, s)]
+                try:
+                    values = posterior_predictive_draw_values(cast(List[Any], vars), strace, s)
+                    new_trace: dict[str, np.ndarray] = {k.name: v for (k, v) in zip(vars, values)}
+                    ppc_trace.extend_trace(new_trace)
+                except KeyboardInterrupt:
+                    pass
+        else:
+            if chunk_size is None:
+                chunk_size = -(-sum(_samples) // cores)
+            blocks = []
+            for s in _samples:
+                strace = _trace if s == len_trace else _trace[slice(0, s)]
+                for start in range(0, s, chunk_size):
+                    block = strace[slice(start, start + chunk_size)]
+                    blocks.append((block.data, len(block)))
+            # one seed per block, so that the samples do not depend on `cores`
+            seeds = np.random.randint(2 ** 30, size=len(blocks))
+            ppc_trace.data = _sample_blocks(
+                model, [var.name for var in vars], blocks, seeds, cores, mp_ctx, memmap_dir
+            )
 
     if keep_size:
         return {k: ary.reshape((nchains, ndraws, *ary.shape[1:])) for k, ary in ppc_trace.items()}
@@ -300,6 +363,77 @@ def fast_sample_posterior_predictive(
     return ppc_trace.data
 
 
+def _sample_blocks(
+    model: Model,
+    var_names: list[str],
+    blocks: list[tuple[Point, int]],
+    seeds: np.ndarray,
+    cores: int,
+    mp_ctx,
+    memmap_dir: str | None,
+) -> dict[str, np.ndarray]:
+    """Draw posterior predictive samples for blocks of a trace into preallocated arrays."""
+    total = sum(n for _, n in blocks)
+    args = [(data, n, seed) for (data, n), seed in zip(blocks, seeds)]
+    output: dict[str, np.ndarray] = {}
+    offset = 0
+
+    def store(n, values):
+        nonlocal offset
+        if not output:
+            for name, value in zip(var_names, values):
+                shape = (total,) + value.shape[1:]
+                if memmap_dir is None:
+                    output[name] = np.empty(shape, dtype=value.dtype)
+                else:
+                    path = os.path.join(memmap_dir, f"{name}.npy")
+                    output[name] = np.lib.format.open_memmap(
+                        path, mode="w+", dtype=value.dtype, shape=shape
+                    )
+        for name, value in zip(var_names, values):
+            output[name][offset : offset + n] = value
+        offset += n
+
+    cores = min(cores, len(blocks))
+    try:
+        if cores > 1:
+            if mp_ctx is None or isinstance(mp_ctx, str):
+                mp_ctx = multiprocessing.get_context(mp_ctx)
+            with mp_ctx.Pool(
+                cores, initializer=_init_block_worker, initargs=(model, var_names)
+            ) as pool:
+                for (_, n, _), values in zip(args, pool.imap(_sample_block, args)):
+                    store(n, values)
+        else:
+            vars = [model[name] for name in var_names]
+            for data, n, seed in args:
+                store(n, _draw_block_values(model, vars, data, n, seed))
+    except KeyboardInterrupt:
+        pass
+    return {name: value[:offset] for name, value in output.items()}
+
+
+def _draw_block_values(model, vars, data, samples, seed):
+    np.random.seed(seed)
+    with model:
+        return posterior_predictive_draw_values(vars, _TraceDict(dict_=data), samples)
+
+
+_block_model = None
+_block_vars = None
+
+
+def _init_block_worker(model, var_names):
+    global _block_model, _block_vars
+    _block_model = model
+    _block_vars = [model[name] for name in var_names]
+
+
+def _sample_block(args):
+    data, samples, seed = args
+    return _draw_block_values(_block_model, _block_vars, data, samples, seed)
+
+
 def posterior_predictive_draw_values(
     vars: list[Any], trace: _TraceDict, samples: int
 ) -> list[np.ndarray]:
@@ -500,27 +634,11 @@ class _PosteriorPredictiveSampler(AbstractContextManager):
         # Distribution parameters may be nodes which have named node-inputs
         # specified in the point. Need to find the node-inputs, their
         # parents and children to replace them.
-        symbolic_params = self.symbolic_params
-        self.leaf_nodes = {}
-        self.named_nodes_parents = {}
-        self.named_nodes_children = {}
-        for _, param in symbolic_params:
-            if hasattr(param, "name"):
-                # Get the named nodes under the `param` node
-                nn, nnp, nnc = get_named_nodes_and_relations(param)
-                self.leaf_nodes.update(nn)
-                # Update the discovered parental relationships
-                for k in nnp.keys():
-                    if k not in self.named_nodes_parents.keys():
-                        self.named_nodes_parents[k] = nnp[k]
-                    else:
-                        self.named_nodes_parents[k].update(nnp[k])
-                # Update the discovered child relationships
-                for k in nnc.keys():
-                    if k not in self.named_nodes_children.keys():
-                        self.named_nodes_children[k] = nnc[k]
-                    else:
-                        self.named_nodes_children[k].update(nnc[k])
+        (
+            self.leaf_nodes,
+            self.named_nodes_parents,
+            self.named_nodes_children,
+        ) = _named_node_tree(param for _, param in self.symbolic_params if hasattr(param, "name"))
 
     def draw_value(self, param, trace: _TraceDict | None = None, givens=None):
         """Draw a set of random values from a distribution or return a constant.
@@ -589,10 +707,7 @@ class _PosteriorPredictiveSampler(AbstractContextManager):
                 if hasattr(param, "observations"):
                     # shape inspection for ObservedRV
                     dist_tmp = param.distribution
-                    try:
-                        distshape: tuple[int, ...] = tuple(param.observations.shape.eval())
-                    except AttributeError:
-                        distshape = tuple(param.observations.shape)
+                    distshape: tuple[int, ...] = _observed_shape(param)
 
                     dist_tmp.shape = distshape
                     try:
@@ -650,9 +765,7 @@ class _PosteriorPredictiveSampler(AbstractContextManager):
                     variables = values = []
                 # We only truly care if the ancestors of param that were given
                 # value have the matching dshape and val.shape
-                param_ancestors = set(
-                    theano.graph.basic.ancestors([param], blockers=list(variables))
-                )
+                param_ancestors = _given_ancestors(param, variables)
                 inputs = [
                     (var, val) for var, val in zip(variables, values) if var in param_ancestors
                 ]
@@ -683,12 +796,9 @@ def _param_shape(var_desig, model: Model) -> tuple[int, ...]:
     else:
         v = var_desig
     if hasattr(v, "observations"):
-        try:
-            # To get shape of _observed_ data container `pm.Data`
-            # (wrapper for theano.SharedVariable) we evaluate it.
-            shape = tuple(v.observations.shape.eval())
-        except AttributeError:
-            shape = v.observations.shape
+        # The shape of an _observed_ data container `pm.Data`
+        # (wrapper for theano.SharedVariable) changes with its value.
+        shape = _observed_shape(v)
     elif hasattr(v, "dshape"):
         shape = v.dshape
     else:
@@ -0,0 +1,266 @@
+#   Copyright 2020 The PyMC Developers
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""Vectorized sampling from the prior predictive distribution.
+
+The random variables of the model are drawn in the order in which they were
+created. The parameters of each distribution are computed for all samples at
+once by a compiled function that maps the parameter graph over the values of
+the random variables drawn before, and the values of the random variable are
+drawn for all samples with one call of a batched numpy generator. Distributions
+without a batched generator fall back to their ``random`` method.
+"""
+
+import numpy as np
+import theano
+import theano.graph.basic
+
+from pymc3.distributions import continuous, discrete
+from pymc3.distributions.distribution import (
+    Distribution,
+    _compile_theano_function,
+    _DrawValuesContext,
+    _observed_shape,
+    draw_values,
+)
+from pymc3.distributions.shape_utils import to_tuple
+from pymc3.memoize import CACHE_REGISTRY
+from pymc3.model import ObservedRV
+from pymc3.theanof import scan_over_batch
+from pymc3.util import get_untransformed_name, is_transformed_name
+
+__all__ = ["batched_random"]
+
+
+def _half_cauchy(beta, size):
+    return np.abs(beta * np.random.standard_cauchy(size))
+
+
+# The batched generators take the values of the parameters, with a leading
+# axis of samples if they depend on random variables, and the size of the draw.
+_BATCHED_RANDOM = {
+    continuous.Normal: (
+        ("mu", "sigma"),
+        lambda mu, sigma, size: np.random.normal(mu, sigma, size),
+    ),
+    continuous.HalfNormal: (
+        ("sigma",),
+        lambda sigma, size: np.abs(np.random.normal(0.0, sigma, size)),
+    ),
+    continuous.Uniform: (
+        ("lower", "upper"),
+        lambda lower, upper, size: np.random.uniform(lower, upper, size),
+    ),
+    continuous.Exponential: (
+        ("lam",),
+        lambda lam, size: np.random.exponential(1.0 / lam, size),
+    ),
+    continuous.Gamma: (
+        ("alpha", "beta"),
+        lambda alpha, beta, size: np.random.gamma(alpha, 1.0 / beta, size),
+    ),
+    continuous.InverseGamma: (
+        ("alpha", "beta"),
+        lambda alpha, beta, size: 1.0 / np.random.gamma(alpha, 1.0 / beta, size),
+    ),
+    continuous.Beta: (
+        ("alpha", "beta"),
+        lambda alpha, beta, size: np.random.beta(alpha, beta, size),
+    ),
+    continuous.Lognormal: (
+        ("mu", "sigma"),
+        lambda mu, sigma, size: np.random.lognormal(mu, sigma, size),
+    ),
+    continuous.StudentT: (
+        ("nu", "mu", "sigma"),
+        lambda nu, mu, sigma, size: mu + sigma * np.random.standard_t(nu, size),
+    ),
+    continuous.Cauchy: (
+        ("alpha", "beta"),
+        lambda alpha, beta, size: alpha + beta * np.random.standard_cauchy(size),
+    ),
+    continuous.HalfCauchy: (("beta",), _half_cauchy),
+    continuous.Laplace: (
+        ("mu", "b"),
+        lambda mu, b, size: np.random.laplace(mu, b, size),
+    ),
+    discrete.Poisson: (("mu",), lambda mu, size: np.random.poisson(mu, size)),
+    discrete.Bernoulli: (("p",), lambda p, size: np.random.binomial(1, p, size)),
+    discrete.Binomial: (("n", "p"), lambda n, p, size: np.random.binomial(n, p, size)),
+}
+
+
+def batched_random(dist_class, params, generator):
+    """Register a batched random generator for a distribution class.
+
+    Parameters
+    ----------
+    dist_class: type
+        Distribution class, subclasses are not matched.
+    params: tuple of str
+        Names of the attributes of the distribution whose values are passed
+        to ``generator``.
+    generator: callable
+        Called with the values of ``params`` followed by ``size``, a tuple
+        ``(samples,) + shape``. The values of the parameters that depend on
+        random variables have a leading axis of length ``samples`` and are
+        padded so that they broadcast against ``size``.
+    """
+    _BATCHED_RANDOM[dist_class] = (tuple(params), generator)
+
+
+def _batch_function(outputs, inputs):
+    """Compile and cache the function that maps ``outputs`` over a batch of ``inputs``."""
+    key = (tuple(outputs), tuple(inputs))
+    try:
+        return _batch_function.cache[key]
+    except KeyError:
+        batch_inputs, batch_outputs = scan_over_batch(inputs, outputs)
+        f = _batch_function.cache[key] = theano.function(
+            batch_inputs,
+            batch_outputs,
+            allow_input_downcast=True,
+            on_unused_input="ignore",
+            accept_inplace=True,
+        )
+        return f
+
+
+_batch_function.cache = {}
+CACHE_REGISTRY.append(_batch_function.cache)
+
+
+def _dist_params(dist):
+    """The theano variables among the attributes of a distribution and of the
+    distributions it is built from, e.g. the components of a mixture."""
+    params = []
+    for value in vars(dist).values():
+        for item in value if isinstance(value, (list, tuple)) else [value]:
+            if isinstance(item, theano.graph.basic.Variable):
+                params.append(item)
+            elif isinstance(item, Distribution):
+                params.extend(_dist_params(item))
+    return params
+
+
+class _PriorPredictiveSampler:
+    """Draws ``samples`` values of model variables from the prior predictive distribution."""
+
+    def __init__(self, model, samples):
+        self.model = model
+        self.samples = samples
+        # the values have the leading axes ``size``, which are flattened into
+        # one axis of length ``n`` to evaluate graphs over the samples
+        self.size = tuple(int(s) for s in to_tuple(samples))
+        self.n = int(np.prod(self.size))
+        # maps the variables the user sees, and the transformed free variables,
+        # to the values drawn so far
+        self.values = {}
+        self.rvs = []
+        self.transformed = {}
+        for rv in model.basic_RVs:
+            if is_transformed_name(rv.name):
+                var = model[get_untransformed_name(rv.name)]
+                self.transformed[var] = rv
+            else:
+                var = rv
+            self.rvs.append(var)
+
+    def draw(self, vars):
+        needed = self.needed_rvs(vars)
+        for var in self.rvs:
+            if var in needed:
+                self.draw_rv(var)
+        drawn = []
+        for var in vars:
+            if var in self.values:
+                drawn.append(self.values[var])
+            else:
+                (value,), batched = self.evaluate([var])
+                if not batched:
+                    value = np.broadcast_to(value, self.size + np.shape(value)).copy()
+                drawn.append(value)
+        return drawn
+
+    def needed_rvs(self, vars):
+        """The random variables whose values are needed to draw ``vars``."""
+        rvs = set(self.rvs)
+        owners = {rv: var for var, rv in self.transformed.items()}
+        needed = set()
+        stack = list(vars)
+        while stack:
+            var = stack.pop()
+            for node in theano.graph.basic.ancestors([var]):
+                node = owners.get(node, node)
+                if node in rvs and node not in needed:
+                    needed.add(node)
+                    stack.extend(_dist_params(node.distribution))
+        return needed
+
+    def evaluate(self, params):
+        """Evaluate ``params`` for the drawn values.
+
+        Returns the values and whether they have the leading axes of the
+        samples, which is the case if ``params`` depend on drawn random variables.
+        """
+        ancestors = set(theano.graph.basic.ancestors(params, blockers=list(self.values)))
+        inputs = [var for var in self.values if var in ancestors]
+        if not inputs:
+            return [_compile_theano_function(param, [])() for param in params], False
+        values = []
+        for var in inputs:
+            value = np.asarray(self.values[var], var.dtype)
+            values.append(value.reshape((self.n,) + value.shape[len(self.size) :]))
+        outputs = _batch_function(params, inputs)(*values)
+        return [out.reshape(self.size + out.shape[1:]) for out in outputs], True
+
+    def shape(self, var):
+        if isinstance(var, ObservedRV):
+            return _observed_shape(var)
+        return tuple(int(s) for s in to_tuple(var.distribution.shape))
+
+    def draw_rv(self, var):
+        dist = var.distribution
+        shape = self.shape(var)
+        size = self.size + shape
+        value = None
+        if type(dist) in _BATCHED_RANDOM:
+            names, generator = _BATCHED_RANDOM[type(dist)]
+            params = [getattr(dist, name) for name in names]
+            values, batched = self.evaluate(params)
+            args = []
+            for param, arg in zip(params, values):
+                arg = np.asarray(arg)
+                if batched:
+                    # pad the core axes so that they align with the trailing axes of size
+                    pad = len(shape) - param.ndim
+                    arg = arg.reshape(self.size + (1,) * pad + arg.shape[len(self.size) :])
+                args.append(arg)
+            try:
+                value = generator(*args, size=size)
+            except ValueError:
+                value = None
+        if value is None:
+            # random methods expect the values in a point to belong to a single
+            # draw, the drawn values are handed over as values drawn with size
+            with _DrawValuesContext() as context:
+                for v, val in self.values.items():
+                    # random methods pass on size as given or as a tuple
+                    context.drawn_vars[(v, self.samples)] = val
+                    context.drawn_vars[(v, self.size)] = val
+                (value,) = draw_values([var], size=self.samples)
+        value = np.asarray(value, var.dtype)
+        self.values[var] = value
+        if var in self.transformed:
+            self.values[self.transformed[var]] = var.transformation.forward_val(value)
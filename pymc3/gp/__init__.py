@@ -13,4 +13,15 @@
 #   limitations under the License.
 
 from pymc3.gp import cov, mean, util
-from pymc3.gp.gp import TP, Latent, LatentKron, Marginal, MarginalKron, MarginalSparse
+from pymc3.gp.gp import (
+    HSGP,
+    SVGP,
+    TP,
+    Latent,
+    LatentKron,
+    Marginal,
+    MarginalKron,
+    MarginalSparse,
+    MarginalToeplitz,
+    StateSpace,
+)
@@ -14,6 +14,7 @@
 
 import warnings
 
+from collections import OrderedDict
 from functools import reduce
 from numbers import Number
 from operator import add, mul
@@ -22,6 +23,11 @@ import numpy as np
 import theano
 import theano.tensor as tt
 
+from scipy.spatial.distance import cdist
+from scipy.special import comb, factorial, gamma
+
+from pymc3.memoize import CACHE_REGISTRY
+
 __all__ = [
     "Constant",
     "WhiteNoise",
@@ -87,6 +93,43 @@ class Covariance:
     def full(self, X, Xs):
         raise NotImplementedError
 
+    def power_spectral_density(self, omega):
+        r"""
+        Evaluate the power spectral density of a stationary covariance function.
+
+        Parameters
+        ----------
+        omega: array-like
+            The frequencies, an array with shape `(m, input_dim)`.
+        """
+        raise NotImplementedError(
+            f"The power spectral density of {self.__class__.__name__} is not implemented"
+        )
+
+    def state_space(self, dt):
+        r"""
+        Evaluate the state space representation of a one dimensional
+        stationary covariance function, as a Gauss-Markov process whose
+        state at :math:`t` is :math:`x(t)` and whose function value is
+        :math:`h^T x(t)`.
+
+        Parameters
+        ----------
+        dt: array-like
+            The time steps between consecutive inputs, with shape `(n,)`.
+
+        Returns
+        -------
+        A: The transition matrices of the state over the time steps, with
+            shape `(n, p, p)`.
+        P_inf: The stationary covariance of the state, with shape `(p, p)`.
+        h: The numpy array with shape `(p,)` that maps the state to the
+            function value.
+        """
+        raise NotImplementedError(
+            f"The state space representation of {self.__class__.__name__} is not implemented"
+        )
+
     def _slice(self, X, Xs):
         if self.input_dim != X.shape[-1]:
             warnings.warn(
@@ -197,11 +240,60 @@ class Add(Combination):
     def __call__(self, X, Xs=None, diag=False):
         return reduce(add, self.merge_factors(X, Xs, diag))
 
+    def power_spectral_density(self, omega):
+        if not all(isinstance(factor, Covariance) for factor in self.factor_list):
+            raise NotImplementedError(
+                "The power spectral density of a sum is only defined for sums of covariances"
+            )
+        return reduce(add, [factor.power_spectral_density(omega) for factor in self.factor_list])
+
+    def state_space(self, dt):
+        # the state of a sum of independent processes stacks their states
+        if not all(isinstance(factor, Covariance) for factor in self.factor_list):
+            raise NotImplementedError(
+                "The state space representation of a sum is only defined for sums of covariances"
+            )
+        dt = tt.as_tensor_variable(dt)
+        parts = [factor.state_space(dt) for factor in self.factor_list]
+        p = sum(len(h) for _, _, h in parts)
+        A = tt.zeros((dt.shape[0], p, p), dtype=theano.config.floatX)
+        P_inf = tt.zeros((p, p), dtype=theano.config.floatX)
+        start = 0
+        for A_i, P_inf_i, h in parts:
+            slc = slice(start, start + len(h))
+            A = tt.set_subtensor(A[:, slc, slc], A_i)
+            P_inf = tt.set_subtensor(P_inf[slc, slc], P_inf_i)
+            start += len(h)
+        return A, P_inf, np.concatenate([h for _, _, h in parts])
+
 
 class Prod(Combination):
     def __call__(self, X, Xs=None, diag=False):
         return reduce(mul, self.merge_factors(X, Xs, diag))
 
+    def power_spectral_density(self, omega):
+        # the spectral density of a product of covariance functions is a
+        # convolution, only scaled covariance functions are supported
+        covs = [factor for factor in self.factor_list if isinstance(factor, Covariance)]
+        scales = [factor for factor in self.factor_list if not isinstance(factor, Covariance)]
+        if len(covs) != 1 or any(np.ndim(scale) != 0 for scale in scales):
+            raise NotImplementedError(
+                "The power spectral density of a product is only defined for a "
+                "covariance function multiplied by scalars"
+            )
+        return reduce(mul, scales, covs[0].power_spectral_density(omega))
+
+    def state_space(self, dt):
+        covs = [factor for factor in self.factor_list if isinstance(factor, Covariance)]
+        scales = [factor for factor in self.factor_list if not isinstance(factor, Covariance)]
+        if len(covs) != 1 or any(np.ndim(scale) != 0 for scale in scales):
+            raise NotImplementedError(
+                "The state space representation of a product is only defined for a "
+                "covariance function multiplied by scalars"
+            )
+        A, P_inf, h = covs[0].state_space(dt)
+        return A, reduce(mul, scales, P_inf), h
+
 
 class Exponentiated(Covariance):
     def __init__(self, kernel, power):
@@ -351,6 +443,84 @@ class Circular(Covariance):
         return tt.alloc(1.0, X.shape[0])
 
 
+# the largest number of elements of the per column distances that are
+# embedded as a constant, which is copied into every compiled function
+MAX_CACHED_DIST_SIZE = 2 ** 22
+# the number of distance matrices that are kept alive by the cache
+MAX_CACHED_DISTS = 8
+
+
+def _constant_square_dist(X, Xs, per_dim):
+    """The squared distances between the rows of the constant inputs ``X``
+    and ``Xs``, or ``X`` if ``Xs`` is None, as a constant with shape ``(n, m)``,
+    or ``(n, m, d)`` with the squared distances per column if ``per_dim``.
+    Returns None if the per column distances have more than
+    ``MAX_CACHED_DIST_SIZE`` elements.
+
+    The last ``MAX_CACHED_DISTS`` distances are cached by the values of the
+    inputs, so that the covariance functions of a model that share inputs
+    compute them once.
+    """
+    x = X.data
+    xs = x if Xs is None else Xs.data
+    if per_dim and x.shape[0] * xs.shape[0] * x.shape[1] > MAX_CACHED_DIST_SIZE:
+        return None
+    cache = _constant_square_dist.cache
+    key = (X.signature(), None if Xs is None else Xs.signature(), per_dim)
+    try:
+        sqd = cache.pop(key)
+    except KeyError:
+        dtype = np.result_type(x.dtype, xs.dtype, np.float32)
+        if per_dim:
+            sqd = np.square(x[:, None, :] - xs[None, :, :], dtype=dtype)
+        else:
+            sqd = cdist(x, xs, "sqeuclidean").astype(dtype)
+        sqd = tt.constant(sqd)
+        while len(cache) >= MAX_CACHED_DISTS:
+            cache.popitem(last=False)
+    cache[key] = sqd
+    return sqd
+
+
+_constant_square_dist.cache = OrderedDict()
+CACHE_REGISTRY.append(_constant_square_dist.cache)
+
+
+def _matern_state_space(lam, order, dt):
+    r"""The state space representation of a Matern covariance function with
+    smoothness `order - 1/2`, unit variance and the rate `lam`, whose spectral
+    density is proportional to :math:`(\lambda^2 + \omega^2)^{-order}`.
+
+    The state is the function value and its first `order - 1` derivatives.
+    The feedback matrix :math:`F` has the single eigenvalue :math:`-\lambda`,
+    so that :math:`N = F + \lambda I` is nilpotent and the transition matrix
+    :math:`\exp(F \Delta) = e^{-\lambda \Delta} \sum_{k < order} (N \Delta)^k / k!`
+    is evaluated for all time steps at once.
+    """
+    dt = tt.as_tensor_variable(dt)
+    # the last row of the companion matrix F holds the coefficients of (s + lam)^order
+    N = lam * np.eye(order) + np.eye(order, k=1)
+    coeffs = [-comb(order, k) * lam ** (order - k) for k in range(order)]
+    N = tt.set_subtensor(tt.as_tensor_variable(N)[order - 1], coeffs)
+    N = tt.inc_subtensor(N[order - 1, order - 1], lam)
+    A = tt.zeros((dt.shape[0], order, order)) + tt.eye(order)
+    Nk = tt.eye(order)
+    for k in range(1, order):
+        Nk = tt.dot(Nk, N)
+        A = A + (dt ** k / factorial(k))[:, None, None] * Nk
+    A = tt.exp(-lam * dt)[:, None, None] * A
+    if order == 1:
+        P_inf = tt.ones((1, 1))
+    elif order == 2:
+        P_inf = tt.stacklists([[1.0, 0.0], [0.0, lam ** 2]])
+    elif order == 3:
+        kappa = lam ** 2 / 3.0
+        P_inf = tt.stacklists([[1.0, 0.0, -kappa], [0.0, kappa, 0.0], [-kappa, 0.0, lam ** 4]])
+    else:
+        raise NotImplementedError("Only Matern covariances of order 1, 2 and 3 are supported")
+    return A, P_inf, np.eye(order)[0]
+
+
 class Stationary(Covariance):
     r"""
     Base class for stationary kernels/covariance functions.
@@ -374,6 +544,14 @@ class Stationary(Covariance):
         self.ls = tt.as_tensor_variable(ls)
 
     def square_dist(self, X, Xs):
+        if isinstance(X, tt.TensorConstant) and (Xs is None or isinstance(Xs, tt.TensorConstant)):
+            # the distances between constant inputs are computed once, only
+            # their scaling by the lengthscales remains in the graph
+            if self.ls.ndim == 0:
+                return _constant_square_dist(X, Xs, per_dim=False) / tt.square(self.ls)
+            sqd = _constant_square_dist(X, Xs, per_dim=True)
+            if sqd is not None:
+                return tt.dot(sqd, tt.ones(sqd.data.shape[-1]) / tt.square(self.ls))
         X = tt.mul(X, 1.0 / self.ls)
         X2 = tt.sum(tt.square(X), 1)
         if Xs is None:
@@ -398,6 +576,15 @@ class Stationary(Covariance):
     def full(self, X, Xs=None):
         raise NotImplementedError
 
+    def _state_space_ls(self):
+        """The lengthscale of a one dimensional covariance function, for the
+        state space representation."""
+        if self.input_dim != 1:
+            raise NotImplementedError(
+                "The state space representation is only defined in one dimension"
+            )
+        return tt.flatten(self.ls)[0]
+
 
 class Periodic(Stationary):
     r"""
@@ -441,12 +628,25 @@ class ExpQuad(Stationary):
     .. math::
 
        k(x, x') = \mathrm{exp}\left[ -\frac{(x - x')^2}{2 \ell^2} \right]
+
+    The power spectral density is
+
+    .. math::
+
+       S(\omega) = (\sqrt{2 \pi})^D \prod_{i=1}^D \ell_i
+                    \mathrm{exp}\left( -\frac{1}{2} \sum_{i=1}^D \ell_i^2 \omega_i^2 \right)
     """
 
     def full(self, X, Xs=None):
         X, Xs = self._slice(X, Xs)
         return tt.exp(-0.5 * self.square_dist(X, Xs))
 
+    def power_spectral_density(self, omega):
+        ls = tt.ones(self.input_dim) * self.ls
+        c = tt.power(tt.sqrt(2.0 * np.pi), self.input_dim)
+        exp = tt.exp(-0.5 * tt.dot(tt.square(omega), tt.square(ls)))
+        return c * tt.prod(ls) * exp
+
 
 class RatQuad(Stationary):
     r"""
@@ -478,6 +678,15 @@ class Matern52(Stationary):
        k(x, x') = \left(1 + \frac{\sqrt{5(x - x')^2}}{\ell} +
                    \frac{5(x-x')^2}{3\ell^2}\right)
                    \mathrm{exp}\left[ - \frac{\sqrt{5(x - x')^2}}{\ell} \right]
+
+    The power spectral density is
+
+    .. math::
+
+       S(\omega) = \frac{2^D \pi^{D/2} \Gamma(\frac{D+5}{2}) 5^{5/2}}
+                         {\frac{3}{4}\sqrt{\pi}}
+                    \prod_{i=1}^D \ell_i
+                    \left(5 + \sum_{i=1}^D \ell_i^2 \omega_i^2\right)^{-\frac{D+5}{2}}
     """
 
     def full(self, X, Xs=None):
@@ -485,6 +694,17 @@ class Matern52(Stationary):
         r = self.euclidean_dist(X, Xs)
         return (1.0 + np.sqrt(5.0) * r + 5.0 / 3.0 * tt.square(r)) * tt.exp(-1.0 * np.sqrt(5.0) * r)
 
+    def power_spectral_density(self, omega):
+        ls = tt.ones(self.input_dim) * self.ls
+        D52 = (self.input_dim + 5) / 2
+        num = 2.0 ** self.input_dim * np.pi ** (self.input_dim / 2) * gamma(D52) * 5.0 ** 2.5
+        den = 0.75 * np.sqrt(np.pi)
+        pow = tt.power(5.0 + tt.dot(tt.square(omega), tt.square(ls)), -1.0 * D52)
+        return (num / den) * tt.prod(ls) * pow
+
+    def state_space(self, dt):
+        return _matern_state_space(np.sqrt(5.0) / self._state_space_ls(), 3, dt)
+
 
 class Matern32(Stationary):
     r"""
@@ -494,6 +714,15 @@ class Matern32(Stationary):
 
        k(x, x') = \left(1 + \frac{\sqrt{3(x - x')^2}}{\ell}\right)
                   \mathrm{exp}\left[ - \frac{\sqrt{3(x - x')^2}}{\ell} \right]
+
+    The power spectral density is
+
+    .. math::
+
+       S(\omega) = \frac{2^D \pi^{D/2} \Gamma(\frac{D+3}{2}) 3^{3/2}}
+                         {\frac{1}{2}\sqrt{\pi}}
+                    \prod_{i=1}^D \ell_i
+                    \left(3 + \sum_{i=1}^D \ell_i^2 \omega_i^2\right)^{-\frac{D+3}{2}}
     """
 
     def full(self, X, Xs=None):
@@ -501,6 +730,17 @@ class Matern32(Stationary):
         r = self.euclidean_dist(X, Xs)
         return (1.0 + np.sqrt(3.0) * r) * tt.exp(-np.sqrt(3.0) * r)
 
+    def power_spectral_density(self, omega):
+        ls = tt.ones(self.input_dim) * self.ls
+        D32 = (self.input_dim + 3) / 2
+        num = 2.0 ** self.input_dim * np.pi ** (self.input_dim / 2) * gamma(D32) * 3.0 ** 1.5
+        den = 0.5 * np.sqrt(np.pi)
+        pow = tt.power(3.0 + tt.dot(tt.square(omega), tt.square(ls)), -1.0 * D32)
+        return (num / den) * tt.prod(ls) * pow
+
+    def state_space(self, dt):
+        return _matern_state_space(np.sqrt(3.0) / self._state_space_ls(), 2, dt)
+
 
 class Matern12(Stationary):
     r"""
@@ -514,6 +754,9 @@ class Matern12(Stationary):
         r = self.euclidean_dist(X, Xs)
         return tt.exp(-r)
 
+    def state_space(self, dt):
+        return _matern_state_space(1.0 / self._state_space_ls(), 1, dt)
+
 
 class Exponential(Stationary):
     r"""
@@ -528,6 +771,9 @@ class Exponential(Stationary):
         X, Xs = self._slice(X, Xs)
         return tt.exp(-0.5 * self.euclidean_dist(X, Xs))
 
+    def state_space(self, dt):
+        return _matern_state_space(0.5 / self._state_space_ls(), 1, dt)
+
 
 class Cosine(Stationary):
     r"""
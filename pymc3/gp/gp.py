@@ -13,9 +13,12 @@
 #   limitations under the License.
 
 import functools
+import multiprocessing
 import warnings
 
 import numpy as np
+import scipy.linalg
+import theano
 import theano.tensor as tt
 
 from theano.tensor.nlinalg import eigh
@@ -23,25 +26,45 @@ from theano.tensor.nlinalg import eigh
 import pymc3 as pm
 
 from pymc3.distributions import draw_values
+from pymc3.distributions.shape_utils import to_tuple
 from pymc3.gp.cov import Constant, Covariance
 from pymc3.gp.mean import Zero
 from pymc3.gp.util import (
     cholesky,
     conditioned_vars,
     infer_shape,
+    kmeans_inducing_points,
     solve_lower,
     solve_upper,
     stabilize,
 )
 from pymc3.math import (
+    CGSolve,
+    SLQLogDet,
     cartesian,
+    kalman_filter,
+    kalman_smoother,
+    khatri_rao_dot,
+    khatri_rao_gram,
     kron_diag,
     kron_dot,
     kron_solve_lower,
-    kron_solve_upper,
+    toeplitz_logdet,
+    toeplitz_solve,
 )
 
-__all__ = ["Latent", "Marginal", "TP", "MarginalSparse", "LatentKron", "MarginalKron"]
+__all__ = [
+    "Latent",
+    "Marginal",
+    "TP",
+    "MarginalSparse",
+    "LatentKron",
+    "MarginalKron",
+    "HSGP",
+    "MarginalToeplitz",
+    "SVGP",
+    "StateSpace",
+]
 
 
 class Base:
@@ -399,6 +422,10 @@ class Marginal(Base):
             fcond = gp.conditional("fcond", Xnew=Xnew)
     """
 
+    def __init__(self, mean_func=Zero(), cov_func=Constant(0.0)):
+        self._solver = None
+        super().__init__(mean_func, cov_func)
+
     def _build_marginal_likelihood(self, X, noise):
         mu = self.mean_func(X)
         Kxx = self.cov_func(X)
@@ -406,7 +433,23 @@ class Marginal(Base):
         cov = Kxx + Knx
         return mu, cov
 
-    def marginal_likelihood(self, name, X, y, noise, is_observed=True, **kwargs):
+    def _set_solver(self, solver, solver_kwargs):
+        if solver == "cholesky":
+            self._solver = None
+        elif solver == "cg":
+            solver_kwargs = dict(solver_kwargs or {})
+            cg_kwargs = {
+                key: solver_kwargs[key]
+                for key in ["tol", "maxiter", "precond_rank"]
+                if key in solver_kwargs
+            }
+            self._solver = (CGSolve(**cg_kwargs), SLQLogDet(**solver_kwargs))
+        else:
+            raise ValueError(f"Unknown solver '{solver}', use 'cholesky' or 'cg'")
+
+    def marginal_likelihood(
+        self, name, X, y, noise, is_observed=True, solver="cholesky", solver_kwargs=None, **kwargs
+    ):
         R"""
         Returns the marginal likelihood distribution, given the input
         locations `X` and the data `y`.
@@ -433,17 +476,62 @@ class Marginal(Base):
         is_observed: bool
             Whether to set `y` as an `observed` variable in the `model`.
             Default is `True`.
+        solver: str
+            How the linear systems and the log-determinant of the covariance
+            are computed, also by `conditional` and `predict`.  With
+            `"cholesky"` (default) the covariance is factorized.  With `"cg"`
+            the solves use preconditioned conjugate gradients and the
+            log-determinant is estimated by stochastic Lanczos quadrature,
+            see `pm.math.CGSolve` and `pm.math.SLQLogDet`.  This takes
+            :math:`O(n^2)` instead of :math:`O(n^3)` time per iteration,
+            for larger data sets.  The gradient of the estimated
+            log-determinant is a separate estimate, so above `exact_size`
+            data points, 1000 by default, `"cg"` is meant for `find_MAP`
+            and ADVI rather than NUTS.
+        solver_kwargs: dict
+            Parameters of `pm.math.SLQLogDet` and `pm.math.CGSolve` for
+            `solver="cg"`.
         **kwargs
             Extra keyword arguments that are passed to `MvNormal` distribution
-            constructor.
+            constructor, or to `DensityDist` for `solver="cg"`.
         """
 
         if not isinstance(noise, Covariance):
             noise = pm.gp.cov.WhiteNoise(noise)
+        self._set_solver(solver, solver_kwargs)
         mu, cov = self._build_marginal_likelihood(X, noise)
         self.X = X
         self.y = y
         self.noise = noise
+        if self._solver is not None:
+            cg, slq = self._solver
+            if isinstance(X, theano.compile.SharedVariable):
+                n_points = X.get_value().shape[0]
+            elif isinstance(X, tt.Variable):
+                n_points = None
+            else:
+                n_points = np.shape(X)[0]
+            if n_points is None or n_points > slq.exact_size:
+                warnings.warn(
+                    "The gradient of the log-determinant estimate of solver='cg' is estimated "
+                    "separately from its value. Use it with find_MAP or ADVI, but not with "
+                    "NUTS or HMC, or increase 'exact_size' in solver_kwargs."
+                )
+
+            def logp(value):
+                delta = value - mu
+                n = tt.cast(delta.shape[0], theano.config.floatX)
+                quad = tt.dot(delta, cg(cov, delta))
+                return -0.5 * (n * np.log(2.0 * np.pi) + slq(cov) + quad)
+
+            kwargs.update(
+                random=pm.MvNormal.dist(mu=mu, cov=cov).random, wrap_random_with_dist_shape=False
+            )
+            if is_observed:
+                return pm.DensityDist(name, logp, observed=y, **kwargs)
+            else:
+                shape = infer_shape(X, kwargs.pop("shape", None))
+                return pm.DensityDist(name, logp, shape=shape, **kwargs)
         if is_observed:
             return pm.MvNormal(name, mu=mu, cov=cov, observed=y, **kwargs)
         else:
@@ -473,19 +561,28 @@ class Marginal(Base):
         Kxs = self.cov_func(X, Xnew)
         Knx = noise(X)
         rxx = y - mean_total(X)
-        L = cholesky(stabilize(Kxx) + Knx)
-        A = solve_lower(L, Kxs)
-        v = solve_lower(L, rxx)
-        mu = self.mean_func(Xnew) + tt.dot(tt.transpose(A), v)
+        if self._solver is None:
+            L = cholesky(stabilize(Kxx) + Knx)
+            A = solve_lower(L, Kxs)
+            v = solve_lower(L, rxx)
+            mu = self.mean_func(Xnew) + tt.dot(tt.transpose(A), v)
+            # Kxs^T K^{-1} Kxs, or its diagonal
+            reduction = tt.sum(tt.square(A), 0) if diag else tt.dot(tt.transpose(A), A)
+        else:
+            cg, _ = self._solver
+            K = stabilize(Kxx) + Knx
+            mu = self.mean_func(Xnew) + tt.dot(tt.transpose(Kxs), cg(K, rxx))
+            A = cg(K, Kxs)
+            reduction = tt.sum(Kxs * A, 0) if diag else tt.dot(tt.transpose(Kxs), A)
         if diag:
             Kss = self.cov_func(Xnew, diag=True)
-            var = Kss - tt.sum(tt.square(A), 0)
+            var = Kss - reduction
             if pred_noise:
                 var += noise(Xnew, diag=True)
             return mu, var
         else:
             Kss = self.cov_func(Xnew)
-            cov = Kss - tt.dot(tt.transpose(A), A)
+            cov = Kss - reduction
             if pred_noise:
                 cov += noise(Xnew)
             return mu, cov if pred_noise else stabilize(cov)
@@ -579,6 +676,90 @@ class Marginal(Base):
         mu, cov = self._build_conditional(Xnew, pred_noise, diag, *givens)
         return mu, cov
 
+    def predict_trace(
+        self,
+        Xnew,
+        trace,
+        diag=True,
+        pred_noise=False,
+        given=None,
+        chunk_size=100,
+        cores=1,
+        mp_ctx=None,
+        model=None,
+    ):
+        R"""
+        Return the mean vectors and variances, or covariance matrices, of the
+        conditional distribution for every draw of a `trace` as numpy arrays.
+
+        The conditional is compiled once into a function that is vectorized
+        over the draws, and the factorization of the covariance of each draw
+        is shared by the mean and the variance. The draws are evaluated in
+        chunks, which can be distributed among several processes.
+
+        Parameters
+        ----------
+        Xnew: array-like
+            Function input values.  If one-dimensional, must be a column
+            vector with shape `(n, 1)`.
+        trace: MultiTrace or dict
+            Contains the values of the free variables of the model, e.g.
+            the trace returned by `pm.sample`.
+        diag: bool
+            If `True`, return the variances instead of the full covariance
+            matrices.  Default is `True`.
+        pred_noise: bool
+            Whether or not observation noise is included in the conditional.
+            Default is `False`.
+        given: dict
+            Same as `conditional` method.
+        chunk_size: int
+            Number of draws that are evaluated in one call of the compiled
+            function.
+        cores: int
+            Number of processes among which the chunks are distributed.
+        mp_ctx: multiprocessing.context.BaseContent
+            A multiprocessing context for the parallel evaluation.
+        model: Model (optional if in ``with`` context)
+
+        Returns
+        -------
+        mu: array, shape (ndraws, n)
+        cov: array, shape (ndraws, n) or (ndraws, n, n)
+        """
+        from pymc3.sampling import _eval_batch, _init_batch_worker
+
+        if given is None:
+            given = {}
+        model = pm.modelcontext(model)
+        varnames = getattr(trace, "varnames", trace)
+        missing = [var.name for var in model.vars if var.name not in varnames]
+        if missing:
+            raise ValueError(f"The trace does not contain the free variables {missing}.")
+
+        mu, cov = self.predictt(Xnew, diag, pred_noise, given)
+        fn = model.makefn_batch([mu, cov])
+
+        values = [np.asarray(trace[var.name]) for var in model.vars]
+        n_draws = len(values[0]) if values else 0
+        chunks = [
+            [value[start : start + chunk_size] for value in values]
+            for start in range(0, n_draws, chunk_size)
+        ]
+        cores = min(cores, len(chunks))
+        if cores > 1:
+            if mp_ctx is None or isinstance(mp_ctx, str):
+                mp_ctx = multiprocessing.get_context(mp_ctx)
+            with mp_ctx.Pool(cores, initializer=_init_batch_worker, initargs=(fn,)) as pool:
+                results = pool.map(_eval_batch, chunks)
+        else:
+            results = [fn(*chunk) for chunk in chunks]
+        if not results:
+            test_values = [np.asarray(model.test_point[var.name])[None] for var in model.vars]
+            results = [[out[:0] for out in fn(*test_values)]]
+        mus, covs = zip(*results)
+        return np.concatenate(mus), np.concatenate(covs)
+
 
 @conditioned_vars(["X", "Xu", "y", "sigma"])
 class MarginalSparse(Marginal):
@@ -925,15 +1106,18 @@ class LatentKron(Base):
         delta = f - self.mean_func(X)
         covs = [stabilize(cov(Xi)) for cov, Xi in zip(self.cov_funcs, Xs)]
         chols = [cholesky(cov) for cov in covs]
-        cholTs = [tt.transpose(chol) for chol in chols]
         Kss = self.cov_func(Xnew)
-        Kxs = self.cov_func(X, Xnew)
-        Ksx = tt.transpose(Kxs)
-        alpha = kron_solve_lower(chols, delta)
-        alpha = kron_solve_upper(cholTs, alpha)
-        mu = tt.dot(Ksx, alpha).ravel() + self.mean_func(Xnew)
-        A = kron_solve_lower(chols, Kxs)
-        cov = stabilize(Kss - tt.dot(tt.transpose(A), A))
+        # the cross covariance between the grid and the new points is the
+        # column-wise Kronecker product of the cross covariances of the
+        # factors, and so is its product with the inverse Cholesky factors
+        Xnews, _ = self.cov_func._split(Xnew, None)
+        As = [
+            solve_lower(chol, cov(Xi, Xnew_i))
+            for chol, cov, Xi, Xnew_i in zip(chols, self.cov_funcs, Xs, Xnews)
+        ]
+        alpha = tt.flatten(kron_solve_lower(chols, delta))
+        mu = khatri_rao_dot(As, alpha) + self.mean_func(Xnew)
+        cov = stabilize(Kss - khatri_rao_gram(As, tt.ones_like(alpha)))
         return mu, cov
 
     def conditional(self, name, Xnew, **kwargs):
@@ -1108,27 +1292,25 @@ class MarginalKron(Base):
         if sigma is not None:
             eigs += sigma ** 2
 
-        # New points
+        # New points, the cross covariance between the grid and the new
+        # points in the eigenbasis is the column-wise Kronecker product of
+        # the cross covariances of the factors in their eigenbases
         Km = self.cov_func(Xnew, diag=diag)
-        Knm = self.cov_func(X, Xnew)
-        Kmn = Knm.T
+        Xnews, _ = self.cov_func._split(Xnew, None)
+        Bs = [tt.dot(QT, f(x, xnew)) for QT, f, x, xnew in zip(QTs, self.cov_funcs, Xs, Xnews)]
 
         # Build conditional mu
-        alpha = kron_dot(QTs, delta)
-        alpha = alpha / eigs[:, None]
-        alpha = kron_dot(Qs, alpha)
-        mu = tt.dot(Kmn, alpha).ravel() + self.mean_func(Xnew)
+        alpha = tt.flatten(kron_dot(QTs, delta)) / eigs
+        mu = khatri_rao_dot(Bs, alpha) + self.mean_func(Xnew)
 
         # Build conditional cov
-        A = kron_dot(QTs, Knm)
-        A = A / tt.sqrt(eigs[:, None])
         if diag:
-            Asq = tt.sum(tt.square(A), 0)
+            Asq = khatri_rao_dot([tt.square(B) for B in Bs], 1.0 / eigs)
             cov = Km - Asq
             if pred_noise:
                 cov += sigma
         else:
-            Asq = tt.dot(A.T, A)
+            Asq = khatri_rao_gram(Bs, 1.0 / eigs)
             cov = Km - Asq
             if pred_noise:
                 cov += sigma * tt.identity_like(cov)
@@ -1214,3 +1396,712 @@ class MarginalKron(Base):
         """
         mu, cov = self._build_conditional(Xnew, pred_noise, diag)
         return mu, cov
+
+
+@conditioned_vars(["X", "f"])
+class HSGP(Base):
+    R"""
+    Hilbert space approximate Gaussian process.
+
+    The `gp.HSGP` class approximates a `gp.Latent` GP with a stationary
+    covariance function by a linear combination of the eigenfunctions of the
+    Laplacian on the box :math:`[-L, L]` around the center of the inputs,
+
+    .. math::
+
+       f(x) \approx \mu(x) + \sum_{j=1}^m
+           \sqrt{S\left(\sqrt{\lambda_j}\right)} \phi_j(x) \beta_j \,,
+       \quad \beta_j \sim \mathcal{N}(0, 1)
+
+    where :math:`S` is the power spectral density of the covariance function
+    and :math:`\lambda_j` and :math:`\phi_j` are the eigenvalues and
+    eigenfunctions of the Laplacian.  The basis does not depend on the
+    hyperparameters of the covariance function, so that evaluating the GP
+    costs :math:`O(nm)` instead of the :math:`O(n^3)` of a Cholesky
+    decomposition.  The approximation is accurate for inputs well inside the
+    box, and when the number of basis functions is large compared to the
+    extent of the inputs divided by the lengthscale.
+
+    The covariance function must implement `power_spectral_density`, as
+    `ExpQuad`, `Matern52` and `Matern32` (possibly scaled by a constant) do.
+
+    Parameters
+    ----------
+    m: list of int
+        The number of basis functions for each active dimension of the
+        covariance function.  The total number of basis functions is
+        their product.
+    L: list of float
+        The boundaries of the box :math:`[-L, L]` for each active dimension,
+        relative to the center of the inputs of `prior`.
+    c: float
+        Sets the boundaries to `c` times the largest distance of the inputs
+        of `prior` from their center, for each dimension.  Values between
+        1.2 and 2 are a good choice.  One of `L` or `c` must be provided.
+    cov_func: instance of Covariance
+        The stationary covariance function.
+    mean_func: None, instance of Mean
+        The mean function.  Defaults to zero.
+
+    Examples
+    --------
+    .. code:: python
+
+        # A one dimensional column vector of inputs.
+        X = np.linspace(0, 10, 1000)[:, None]
+
+        with pm.Model() as model:
+            ls = pm.Gamma("ls", alpha=2, beta=1)
+            cov_func = pm.gp.cov.Matern52(1, ls=ls)
+
+            # Approximate the GP by 30 basis functions on a box 1.5 times
+            # larger than the extent of the inputs.
+            gp = pm.gp.HSGP(m=[30], c=1.5, cov_func=cov_func)
+
+            f = gp.prior("f", X=X)
+
+        ...
+
+        # After fitting or sampling, the function at new points in the box
+        # is a deterministic function of the same coefficients.
+        Xnew = np.linspace(-1, 11, 50)[:, None]
+
+        with model:
+            fcond = gp.conditional("fcond", Xnew=Xnew)
+
+    References
+    ----------
+    -   Solin, A., Sarkka, S. (2019) Hilbert Space Methods for Reduced-Rank
+        Gaussian Process Regression.
+    -   Riutort-Mayol, G., Burkner, P. C., Andersen, M. R., Solin, A., Vehtari, A.
+        (2020).  Practical Hilbert Space Approximate Bayesian Gaussian Processes
+        for Probabilistic Programming.
+    """
+
+    def __init__(self, m, L=None, c=None, mean_func=Zero(), cov_func=Constant(0.0)):
+        m = [int(mi) for mi in np.atleast_1d(m)]
+        if len(m) != cov_func.input_dim:
+            raise ValueError(
+                "The number of basis functions must be given for each of the "
+                f"{cov_func.input_dim} active dimensions of the covariance function"
+            )
+        if (L is None) == (c is None):
+            raise ValueError("Provide one of 'L' or 'c'")
+        if c is not None and c < 1.0:
+            raise ValueError("'c' must be larger than 1, or the box excludes inputs of the prior")
+        self.m = m
+        self.L = None if L is None else tt.as_tensor_variable(pm.floatX(np.atleast_1d(L)))
+        self.c = c
+        # the indices of the basis functions, one row per basis function
+        self._S = pm.floatX(cartesian(*[np.arange(1, mi + 1) for mi in m]))
+        self._X_mean = None
+        super().__init__(mean_func, cov_func)
+
+    def __add__(self, other):
+        raise TypeError("Additive HSGPs are not supported, add their covariance functions instead")
+
+    def _set_boundary(self, X):
+        # the basis is centered at the inputs of the prior, and their extent
+        # sets the box if `c` is given
+        X, _ = self.cov_func._slice(X, None)
+        self._X_mean = tt.mean(X, axis=0)
+        if self.L is None:
+            self.L = self.c * tt.max(tt.abs_(X - self._X_mean), axis=0)
+
+    def _build_basis(self, X):
+        """The eigenfunctions at `X` and the square roots of the spectral densities
+        at the square roots of their eigenvalues."""
+        X, _ = self.cov_func._slice(X, None)
+        Xs = X - self._X_mean
+        omega = np.pi * tt.as_tensor_variable(self._S) / (2.0 * self.L)
+        phi = tt.prod(
+            tt.sin(omega * (Xs[:, None, :] + self.L)) / tt.sqrt(self.L),
+            axis=2,
+        )
+        sqrt_psd = tt.sqrt(self.cov_func.power_spectral_density(omega))
+        return phi, sqrt_psd
+
+    def _build_prior(self, name, X, **kwargs):
+        self._set_boundary(X)
+        phi, sqrt_psd = self._build_basis(X)
+        kwargs.pop("shape", None)
+        beta = pm.Normal(name + "_coeffs_", mu=0.0, sigma=1.0, shape=len(self._S), **kwargs)
+        self._beta = beta
+        f = pm.Deterministic(name, self.mean_func(X) + tt.dot(phi, beta * sqrt_psd))
+        return f
+
+    def prior(self, name, X, **kwargs):
+        R"""
+        Returns the approximate GP prior distribution evaluated over the
+        input locations `X`.
+
+        The center of `X` and, if `c` is given, the boundaries of the box
+        are fixed by the inputs given here.
+
+        Parameters
+        ----------
+        name: string
+            Name of the random variable
+        X: array-like
+            Function input values.
+        **kwargs
+            Extra keyword arguments that are passed to the distribution
+            constructor of the coefficients of the basis functions.
+        """
+
+        f = self._build_prior(name, X, **kwargs)
+        self.X = X
+        self.f = f
+        return f
+
+    def _build_conditional(self, Xnew):
+        if self._X_mean is None:
+            raise ValueError("The prior must be defined before the conditional")
+        phi, sqrt_psd = self._build_basis(Xnew)
+        return self.mean_func(Xnew) + tt.dot(phi, self._beta * sqrt_psd)
+
+    def conditional(self, name, Xnew, **kwargs):
+        R"""
+        Returns the approximate GP evaluated over new input locations `Xnew`.
+
+        Since the function is a linear combination of the basis functions,
+        the conditional is a deterministic function of the coefficients of
+        the prior.  The approximation is only valid for `Xnew` inside the box
+        of the basis functions.
+
+        Parameters
+        ----------
+        name: string
+            Name of the random variable
+        Xnew: array-like
+            Function input values.
+        **kwargs
+            Extra keyword arguments that are passed to `Deterministic`.
+        """
+        fnew = self._build_conditional(Xnew)
+        return pm.Deterministic(name, fnew, **kwargs)
+
+
+@conditioned_vars(["X", "y", "noise"])
+class MarginalToeplitz(Marginal):
+    R"""
+    Marginal Gaussian process on a regular one dimensional grid.
+
+    The `gp.MarginalToeplitz` class is an implementation of the sum of a GP
+    prior with a stationary covariance function and additive white noise,
+    for inputs that are evenly spaced.  The covariance matrix of the data
+    is then a symmetric Toeplitz matrix, which is represented by its first
+    row only.  The marginal likelihood is computed by Levinson and Durbin
+    recursions in :math:`O(n^2)` time and :math:`O(n)` memory, instead of
+    the :math:`O(n^3)` time and :math:`O(n^2)` memory of a Cholesky
+    decomposition.  It has `marginal_likelihood`, `conditional` and
+    `predict` methods, see the docstrings of `gp.Marginal`.
+
+    Parameters
+    ----------
+    cov_func: instance of Covariance
+        The stationary covariance function.
+    mean_func: None, instance of Mean
+        The mean function.  Defaults to zero.
+
+    Examples
+    --------
+    .. code:: python
+
+        # An evenly spaced column vector of inputs.
+        X = np.linspace(0, 100, 5000)[:, None]
+
+        with pm.Model() as model:
+            ls = pm.Gamma("ls", alpha=2, beta=1)
+            cov_func = pm.gp.cov.Matern32(1, ls=ls)
+            gp = pm.gp.MarginalToeplitz(cov_func=cov_func)
+
+            sigma = pm.HalfCauchy("sigma", beta=3)
+            y_ = gp.marginal_likelihood("y", X=X, y=y, noise=sigma)
+    """
+
+    def __add__(self, other):
+        raise TypeError("Additive Toeplitz processes are not supported, add their covariances")
+
+    def _check_grid(self, X):
+        if isinstance(X, np.ndarray):
+            if X.ndim != 2 or X.shape[1] != 1:
+                raise ValueError("X must be a column vector with shape `(n, 1)`")
+            dX = np.diff(X[:, 0])
+            if len(dX) and not np.allclose(dX, dX[0]):
+                raise ValueError("The inputs X must be evenly spaced")
+
+    def _build_marginal_likelihood(self, X, noise):
+        mu = self.mean_func(X)
+        # the first row of the covariance matrix of the data
+        r = self.cov_func(X[:1], X)[0]
+        r = tt.inc_subtensor(r[0], tt.square(noise.sigma))
+        return mu, r
+
+    def marginal_likelihood(self, name, X, y, noise, is_observed=True, **kwargs):
+        R"""
+        Returns the marginal likelihood distribution, given the input
+        locations `X` and the data `y`.
+
+        Parameters
+        ----------
+        name: string
+            Name of the random variable
+        X: array-like
+            Evenly spaced function input values, a column vector with
+            shape `(n, 1)`.
+        y: array-like
+            Data that is the sum of the function with the GP prior and Gaussian
+            noise.  Must have shape `(n, )`.
+        noise: scalar, Variable
+            Standard deviation of the Gaussian noise.
+        is_observed: bool
+            Whether to set `y` as an `observed` variable in the `model`.
+            Default is `True`.
+        **kwargs
+            Extra keyword arguments that are passed to the `DensityDist`
+            constructor.
+        """
+        if isinstance(noise, Covariance):
+            raise TypeError("Only white noise, given by its standard deviation, is supported")
+        self._check_grid(X)
+        noise = pm.gp.cov.WhiteNoise(noise)
+        mu, r = self._build_marginal_likelihood(X, noise)
+        self.X = X
+        self.y = y
+        self.noise = noise
+
+        def logp(value):
+            delta = value - mu
+            n = tt.cast(delta.shape[0], theano.config.floatX)
+            quad = tt.dot(delta, toeplitz_solve(r, delta))
+            return -0.5 * (n * np.log(2.0 * np.pi) + toeplitz_logdet(r) + quad)
+
+        def random(point=None, size=None):
+            mu_, r_ = draw_values([mu, r], point=point, size=size)
+            n = r_.shape[-1]
+            mu_, r_ = np.broadcast_arrays(mu_, r_)
+            if size is not None and mu_.ndim == 1:
+                mu_ = np.broadcast_to(mu_, to_tuple(size) + (n,))
+                r_ = np.broadcast_to(r_, mu_.shape)
+            samples = [
+                np.random.multivariate_normal(m, scipy.linalg.toeplitz(c))
+                for m, c in zip(mu_.reshape(-1, n), r_.reshape(-1, n))
+            ]
+            return np.reshape(samples, mu_.shape)
+
+        kwargs.update(random=random, wrap_random_with_dist_shape=False)
+        if is_observed:
+            return pm.DensityDist(name, logp, observed=y, **kwargs)
+        else:
+            shape = infer_shape(X, kwargs.pop("shape", None))
+            return pm.DensityDist(name, logp, shape=shape, **kwargs)
+
+    def _build_conditional(self, Xnew, pred_noise, diag, X, y, noise, cov_total, mean_total):
+        if not isinstance(noise, pm.gp.cov.WhiteNoise):
+            raise TypeError("Only white noise, given by its standard deviation, is supported")
+        r = cov_total(X[:1], X)[0]
+        r = tt.inc_subtensor(r[0], tt.square(noise.sigma))
+        Kxs = self.cov_func(X, Xnew)
+        rxx = y - mean_total(X)
+        mu = self.mean_func(Xnew) + tt.dot(tt.transpose(Kxs), toeplitz_solve(r, rxx))
+        A = toeplitz_solve(r, Kxs)
+        if diag:
+            Kss = self.cov_func(Xnew, diag=True)
+            var = Kss - tt.sum(Kxs * A, 0)
+            if pred_noise:
+                var += noise(Xnew, diag=True)
+            return mu, var
+        else:
+            Kss = self.cov_func(Xnew)
+            cov = Kss - tt.dot(tt.transpose(Kxs), A)
+            if pred_noise:
+                cov += noise(Xnew)
+            return mu, cov if pred_noise else stabilize(cov)
+
+
+@conditioned_vars(["Xu", "u"])
+class SVGP(Base):
+    R"""
+    Sparse variational Gaussian process.
+
+    The `gp.SVGP` class represents a GP by its values `u` at a set of
+    inducing points `Xu`.  The function values at the inputs `X` are the
+    conditional mean of the GP given `u`,
+
+    .. math::
+
+       f(X) = \mu(X) + K(X, X_u) K(X_u, X_u)^{-1} (u - \mu(X_u)) \,,
+
+    so that, unlike `gp.MarginalSparse`, the log-likelihood is a sum over the
+    data points.  It can be evaluated on minibatches of the data, created
+    with `pm.Minibatch` and scaled by `total_size`, which costs
+    :math:`O(bm^2 + m^3)` for a batch of :math:`b` points and :math:`m`
+    inducing points.  The inducing values are parameterized by
+    :math:`u = \mu(X_u) + L v`, where :math:`L` is the Cholesky factor of
+    :math:`K(X_u, X_u)` and :math:`v \sim \mathcal{N}(0, I)`, and the
+    variational approximation of ADVI for `v` is the variational
+    distribution of the inducing values.
+
+    For Gaussian noise, `marginal_likelihood` adds the correction for the
+    variance of `f` given `u`, so that the ELBO of `pm.fit` is the bound of
+    Hensman et al.  With `method="fullrank_advi"` the variational
+    distribution of `u` is a full multivariate normal.
+
+    Parameters
+    ----------
+    cov_func: None, 2D array, or instance of Covariance
+        The covariance function.  Defaults to zero.
+    mean_func: None, instance of Mean
+        The mean function.  Defaults to zero.
+
+    Examples
+    --------
+    .. code:: python
+
+        # Minibatches of a large data set.
+        X_batch = pm.Minibatch(X, batch_size=500)
+        y_batch = pm.Minibatch(y, batch_size=500)
+
+        with pm.Model() as model:
+            ls = pm.Gamma("ls", alpha=2, beta=1)
+            sigma = pm.HalfNormal("sigma", sigma=1)
+            cov_func = pm.gp.cov.ExpQuad(1, ls=ls)
+            gp = pm.gp.SVGP(cov_func=cov_func)
+
+            # Place 50 inducing points by K-means on all inputs.
+            y_ = gp.marginal_likelihood(
+                "y", X=X_batch, Xu=50, y=y_batch, noise=sigma, total_size=len(y)
+            )
+            approx = pm.fit(20000, method="fullrank_advi")
+
+        ...
+
+        # The distribution at new points given the inducing values.
+        Xnew = np.linspace(-1, 2, 50)[:, None]
+
+        with model:
+            fcond = gp.conditional("fcond", Xnew=Xnew)
+
+    References
+    ----------
+    -   Titsias, M. (2009). Variational Learning of Inducing Variables in
+        Sparse Gaussian Processes.
+    -   Hensman, J., Fusi, N., and Lawrence, N. D. (2013). Gaussian Processes
+        for Big Data.
+    """
+
+    def __add__(self, other):
+        raise TypeError("Additive SVGPs are not supported, add their covariance functions instead")
+
+    def _build_inducing(self, name, X, Xu, **kwargs):
+        if np.ndim(Xu) == 0:
+            Xu = kmeans_inducing_points(int(Xu), X)
+        shape = infer_shape(Xu, kwargs.pop("shape", None))
+        Xu = tt.as_tensor_variable(Xu)
+        Luu = cholesky(stabilize(self.cov_func(Xu)))
+        v = pm.Normal(name + "_u_rotated_", mu=0.0, sigma=1.0, shape=shape, **kwargs)
+        u = pm.Deterministic(name + "_u", self.mean_func(Xu) + tt.dot(Luu, v))
+        self.Xu = Xu
+        self.u = u
+        self._Luu = Luu
+        self._v = v
+
+    def _build_projection(self, X):
+        """The whitened cross covariance :math:`L^{-1} K(X_u, X)`, and the mean
+        of the GP at `X` given the inducing values."""
+        A = solve_lower(self._Luu, self.cov_func(self.Xu, X))
+        return A, self.mean_func(X) + tt.dot(tt.transpose(A), self._v)
+
+    def prior(self, name, X, Xu, **kwargs):
+        R"""
+        Returns the conditional mean of the GP at the input locations `X`
+        given the inducing values, and creates the inducing values.
+
+        The inducing values are named `name + "_u"`.  The returned variable
+        is a deterministic function of them, so that `X` can be a minibatch.
+        Use it in the likelihood of non-Gaussian data, with `total_size` if
+        the data are minibatches.
+
+        Parameters
+        ----------
+        name: string
+            Prefix of the names of the random variables.
+        X: array-like or Minibatch
+            Function input values.
+        Xu: array-like or int
+            The inducing points, or the number of inducing points which are
+            then placed by `gp.util.kmeans_inducing_points` on `X`.
+        **kwargs
+            Extra keyword arguments that are passed to the distribution
+            constructor of the whitened inducing values.
+        """
+        self._build_inducing(name, X, Xu, **kwargs)
+        _, f = self._build_projection(X)
+        return f
+
+    def _build_marginal_likelihood_logp(self, y, X, noise):
+        A, f = self._build_projection(X)
+        sigma2 = tt.square(noise)
+        # the variance of f given u, which the projection neglects
+        var = self.cov_func(X, diag=True) - tt.sum(tt.square(A), 0)
+        return -0.5 * (tt.log(2.0 * np.pi * sigma2) + (tt.square(y - f) + var) / sigma2)
+
+    def marginal_likelihood(self, name, X, Xu, y, noise, **kwargs):
+        R"""
+        Returns the likelihood of data with Gaussian noise, which is a lower
+        bound of the marginal likelihood given the inducing values.
+
+        The log-likelihood of each data point is
+
+        .. math::
+
+           \log \mathcal{N}(y_i \mid f_i, \sigma^2)
+               - \frac{k_{ii} - q_{ii}}{2 \sigma^2}
+
+        where :math:`k_{ii} - q_{ii}` is the variance of :math:`f_i` given
+        the inducing values.
+
+        Parameters
+        ----------
+        name: string
+            Name of the random variable
+        X: array-like or Minibatch
+            Function input values.  If one-dimensional, must be a column
+            vector with shape `(n, 1)`.
+        Xu: array-like or int
+            The inducing points, or the number of inducing points which are
+            then placed by `gp.util.kmeans_inducing_points` on `X`.
+        y: array-like or Minibatch
+            Data that is the sum of the function with the GP prior and Gaussian
+            noise.  Must have shape `(n, )`.
+        noise: scalar, Variable
+            Standard deviation of the Gaussian noise.
+        **kwargs
+            Extra keyword arguments that are passed to `DensityDist`, for
+            instance `total_size` if `X` and `y` are minibatches.
+        """
+        self._build_inducing(name, X, Xu)
+        self.noise = noise
+        logp = functools.partial(self._build_marginal_likelihood_logp, X=X, noise=noise)
+        return pm.DensityDist(name, logp, observed=y, **kwargs)
+
+    def _build_conditional(self, Xnew, diag):
+        A, mu = self._build_projection(Xnew)
+        if diag:
+            return mu, self.cov_func(Xnew, diag=True) - tt.sum(tt.square(A), 0)
+        return mu, stabilize(self.cov_func(Xnew) - tt.dot(tt.transpose(A), A))
+
+    def conditional(self, name, Xnew, **kwargs):
+        R"""
+        Returns the conditional distribution of the GP evaluated over new
+        input locations `Xnew` given the inducing values.
+
+        Parameters
+        ----------
+        name: string
+            Name of the random variable
+        Xnew: array-like
+            Function input values.
+        **kwargs
+            Extra keyword arguments that are passed to `MvNormal` distribution
+            constructor.
+        """
+        mu, cov = self._build_conditional(Xnew, False)
+        shape = infer_shape(Xnew, kwargs.pop("shape", None))
+        return pm.MvNormal(name, mu=mu, cov=cov, shape=shape, **kwargs)
+
+    def predict(self, Xnew, point=None, diag=False):
+        R"""
+        Return the mean vector and covariance matrix of the conditional
+        distribution as numpy arrays, given a `point`, such as a sample
+        of the approximation.
+
+        Parameters
+        ----------
+        Xnew: array-like
+            Function input values.
+        point: pymc3.model.Point
+            A specific point to condition on.
+        diag: bool
+            If `True`, return the diagonal instead of the full covariance
+            matrix.  Default is `False`.
+        """
+        mu, cov = self._build_conditional(Xnew, diag)
+        return draw_values([mu, cov], point=point)
+
+
+@conditioned_vars(["X", "y", "noise"])
+class StateSpace(Base):
+    R"""
+    Marginal Gaussian process in one dimension computed by Kalman filtering.
+
+    The `gp.StateSpace` class is an implementation of the sum of a GP prior
+    and additive white noise, like `gp.Marginal`, for one dimensional inputs
+    such as the times of a time series.  A GP with a Matern covariance
+    function of smoothness :math:`\nu = 1/2, 3/2, 5/2` is a linear
+    Gauss-Markov process whose state is the function value and its
+    derivatives, so that the marginal likelihood is computed by a Kalman
+    filter in :math:`O(n)` time and memory instead of the :math:`O(n^3)`
+    of a Cholesky decomposition.  The inputs do not need to be evenly spaced
+    or sorted.
+
+    The covariance function must implement `state_space`, as `Exponential`,
+    `Matern12`, `Matern32` and `Matern52`, their sums and their products with
+    scalars do.  It has `marginal_likelihood` and `predict` methods.  The
+    predictions are the marginal means and variances at new inputs given by
+    a Rauch-Tung-Striebel smoother.
+
+    Parameters
+    ----------
+    cov_func: instance of Covariance
+        The one dimensional covariance function.
+    mean_func: None, instance of Mean
+        The mean function.  Defaults to zero.
+
+    Examples
+    --------
+    .. code:: python
+
+        # A long time series.
+        t = np.sort(np.random.rand(100000)) * 1000
+        X = t[:, None]
+
+        with pm.Model() as model:
+            ls = pm.Gamma("ls", alpha=2, beta=0.2)
+            eta = pm.HalfNormal("eta", sigma=2)
+            cov_func = eta ** 2 * pm.gp.cov.Matern32(1, ls=ls)
+            gp = pm.gp.StateSpace(cov_func=cov_func)
+
+            sigma = pm.HalfNormal("sigma", sigma=1)
+            y_ = gp.marginal_likelihood("y", X=X, y=y, noise=sigma)
+            trace = pm.sample()
+
+        # The means and variances at new inputs for a draw.
+        Xnew = np.linspace(0, 1000, 500)[:, None]
+        mu, var = gp.predict(Xnew, point=trace[-1])
+
+    References
+    ----------
+    -   Hartikainen, J., Sarkka, S. (2010). Kalman Filtering and Smoothing
+        Solutions to Temporal Gaussian Process Regression Models.
+    """
+
+    def _inputs(self, X):
+        X = np.asarray(X)
+        if X.ndim != 2 or X.shape[1] != 1:
+            raise ValueError("The inputs of a StateSpace GP must be a column vector")
+        return X[:, 0]
+
+    def _build_filter(self, t, r, observed, noise):
+        """Filter the residuals `r` at the times `t`, sorted by time.
+
+        Returns the outputs of `kalman_filter`, the order of the time steps,
+        and the transition matrices and the vector `h` of the state space.
+        """
+        order = np.argsort(t, kind="stable")
+        t = t[order]
+        dt = pm.floatX(np.diff(t, prepend=t[:1]))
+        A, P_inf, h = self.cov_func.state_space(dt)
+        h = pm.floatX(h)
+        # the first step keeps the stationary state, since its time step is zero
+        Q = P_inf - tt.batched_dot(tt.dot(A, P_inf), A.dimshuffle(0, 2, 1))
+        m0 = tt.zeros(len(h), dtype=theano.config.floatX)
+        result = kalman_filter(r[order], A, Q, h, tt.square(noise), m0, P_inf, observed[order])
+        return result, order, A, h
+
+    def _build_marginal_likelihood_logp(self, y, X, noise):
+        t = self._inputs(X)
+        r = y - self.mean_func(X)
+        (logp, *_), order, _, _ = self._build_filter(t, r, np.ones(len(t)), noise)
+        # restore the order of the data
+        return logp[np.argsort(order)]
+
+    def marginal_likelihood(self, name, X, y, noise, is_observed=True, **kwargs):
+        R"""
+        Returns the marginal likelihood distribution, given the input
+        locations `X` and the data `y`.
+
+        Parameters
+        ----------
+        name: string
+            Name of the random variable
+        X: array-like
+            Function input values, a column vector with shape `(n, 1)`.
+        y: array-like
+            Data that is the sum of the function with the GP prior and Gaussian
+            noise.  Must have shape `(n, )`.
+        noise: scalar, Variable
+            Standard deviation of the Gaussian noise.
+        is_observed: bool
+            Whether to set `y` as an `observed` variable in the `model`.
+            Default is `True`.
+        **kwargs
+            Extra keyword arguments that are passed to `DensityDist`.
+        """
+        if isinstance(noise, Covariance):
+            raise TypeError("The noise of a StateSpace GP must be a standard deviation")
+        self._inputs(X)
+        self.X = X
+        self.y = y
+        self.noise = noise
+        logp = functools.partial(self._build_marginal_likelihood_logp, X=X, noise=noise)
+        if is_observed:
+            return pm.DensityDist(name, logp, observed=y, **kwargs)
+        else:
+            shape = infer_shape(X, kwargs.pop("shape", None))
+            return pm.DensityDist(name, logp, shape=shape, **kwargs)
+
+    def _build_conditional(self, Xnew, pred_noise):
+        t = self._inputs(self.X)
+        tnew = self._inputs(Xnew)
+        n = len(t)
+        # the new inputs are steps of the filter without observations
+        r = tt.concatenate(
+            [self.y - self.mean_func(self.X), tt.zeros(len(tnew), dtype=theano.config.floatX)]
+        )
+        observed = np.concatenate([np.ones(n), np.zeros(len(tnew))])
+        (_, m, P, m_pred, P_pred), order, A, h = self._build_filter(
+            np.concatenate([t, tnew]), r, observed, self.noise
+        )
+        m, P = kalman_smoother(A, m, P, m_pred, P_pred)
+        idx = np.argsort(order)[n:]
+        mu = self.mean_func(Xnew) + tt.dot(m[idx], h)
+        var = tt.dot(tt.dot(P[idx], h), h)
+        if pred_noise:
+            var += tt.square(self.noise)
+        return mu, var
+
+    def predict(self, Xnew, point=None, pred_noise=False):
+        R"""
+        Return the means and variances of the conditional distribution at
+        the new inputs as numpy arrays, given a `point`, such as the MAP
+        estimate or a sample from a `trace`.
+
+        Parameters
+        ----------
+        Xnew: array-like
+            Function input values, a column vector with shape `(m, 1)`.
+        point: pymc3.model.Point
+            A specific point to condition on.
+        pred_noise: bool
+            Whether or not observation noise is included in the conditional.
+            Default is `False`.
+        """
+        mu, var = self.predictt(Xnew, pred_noise)
+        return draw_values([mu, var], point=point)
+
+    def predictt(self, Xnew, pred_noise=False):
+        R"""
+        Return the means and variances of the conditional distribution at
+        the new inputs as symbolic variables.
+
+        Parameters
+        ----------
+        Xnew: array-like
+            Function input values, a column vector with shape `(m, 1)`.
+        pred_noise: bool
+            Whether or not observation noise is included in the conditional.
+            Default is `False`.
+        """
+        return self._build_conditional(Xnew, pred_noise)
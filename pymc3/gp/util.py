@@ -19,6 +19,9 @@ import theano.tensor as tt
 import theano.tensor.slinalg  # pylint: disable=unused-import
 
 from scipy.cluster.vq import kmeans
+from theano.compile import SharedVariable
+
+from pymc3.data import Minibatch
 
 cholesky = tt.slinalg.cholesky
 solve_lower = tt.slinalg.Solve(A_structure="lower_triangular")
@@ -44,6 +47,11 @@ def kmeans_inducing_points(n_inducing, X):
     # first whiten X
     if isinstance(X, tt.TensorConstant):
         X = X.value
+    elif isinstance(X, Minibatch):
+        # the inducing points cover all data, not one minibatch
+        X = X.shared.get_value()
+    elif isinstance(X, SharedVariable):
+        X = X.get_value()
     elif isinstance(X, (np.ndarray, tuple, list)):
         X = np.asarray(X)
     else:
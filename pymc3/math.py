@@ -25,6 +25,7 @@ import theano.tensor as tt
 import theano.tensor.slinalg  # pylint: disable=unused-import
 
 from scipy.linalg import block_diag as scipy_block_diag
+from scipy.linalg import cho_factor, cho_solve, eigh_tridiagonal, solve_toeplitz
 from theano.graph.basic import Apply
 from theano.graph.op import Op
 
@@ -164,6 +165,88 @@ def kron_diag(*diags):
     return reduce(flat_outer, diags)
 
 
+def khatri_rao(*Bs):
+    r"""The column-wise Kronecker product of matrices with the same number of columns.
+
+    Column :math:`j` of the result is :math:`b_{1j} \otimes b_{2j} \otimes ... \otimes b_{Dj}`,
+    so that its rows are ordered like the rows of ``kronecker(*Bs)``.
+
+    Parameters
+    ----------
+    Bs: list of 2D array-like objects
+        D matrices with shapes :math:`(n_d, M)`.
+
+    Returns
+    -------
+    tensor with shape :math:`(\prod_d n_d, M)`
+    """
+    Bs = [tt.as_tensor_variable(B) for B in Bs]
+
+    def khatri_rao2(A, B):
+        return (A[:, None, :] * B[None, :, :]).reshape((A.shape[0] * B.shape[0], A.shape[1]))
+
+    return reduce(khatri_rao2, Bs)
+
+
+def khatri_rao_dot(Bs, v):
+    r"""Reproduces ``dot(khatri_rao(*Bs).T, v)`` for a vector ``v``.
+
+    Only the column-wise Kronecker product of the factors after the first
+    one is formed, which has :math:`1 / n_1` of the size of the full product.
+
+    Parameters
+    ----------
+    Bs: list of 2D array-like objects
+        D matrices with shapes :math:`(n_d, M)`.
+    v: 1D array-like object with shape :math:`(\prod_d n_d,)`
+
+    Returns
+    -------
+    tensor with shape :math:`(M,)`
+    """
+    B = tt.as_tensor_variable(Bs[0])
+    V = tt.reshape(v, (B.shape[0], -1))
+    if len(Bs) == 1:
+        return tt.dot(V[:, 0], B)
+    return tt.sum(B * tt.dot(V, khatri_rao(*Bs[1:])), 0)
+
+
+def khatri_rao_gram(Bs, w):
+    r"""Reproduces ``dot(khatri_rao(*Bs).T * w, khatri_rao(*Bs))`` for a vector
+    of weights ``w``.
+
+    The products are accumulated by a scan over the rows of the first factor,
+    so that only the column-wise Kronecker product of the other factors and
+    the result are held in memory.
+
+    Parameters
+    ----------
+    Bs: list of 2D array-like objects
+        D matrices with shapes :math:`(n_d, M)`.
+    w: 1D array-like object with shape :math:`(\prod_d n_d,)`
+
+    Returns
+    -------
+    tensor with shape :math:`(M, M)`
+    """
+    B = tt.as_tensor_variable(Bs[0])
+    W = tt.reshape(w, (B.shape[0], -1))
+    if len(Bs) == 1:
+        return tt.dot(B.T * W[:, 0], B)
+    C = khatri_rao(*Bs[1:])
+
+    def step(b, w_row, gram):
+        Cb = C * b
+        return gram + tt.dot(Cb.T * w_row, Cb)
+
+    grams, _ = theano.scan(
+        step,
+        sequences=[B, W],
+        outputs_info=[tt.zeros((B.shape[1], B.shape[1]), dtype=B.dtype)],
+    )
+    return grams[-1]
+
+
 def tround(*args, **kwargs):
     """
     Temporary function to silence round warning in Theano. Please remove
@@ -461,3 +544,584 @@ def block_diagonal(matrices, sparse=False, format="csr"):
     if len(matrices) == 1:  # graph optimization
         return matrices[0]
     return BlockDiagonalMatrix(sparse=sparse, format=format)(*matrices)
+
+
+def _correlate(a, b):
+    r"""The correlations :math:`c_k = \sum_i a_i b_{i+k}`, :math:`k \geq 0`, of
+    the columns of `a` and `b`, summed over the columns, computed by FFT."""
+    n = a.shape[0]
+    m = 2 * n
+    fa = np.fft.rfft(a, m, axis=0)
+    fb = np.fft.rfft(b, m, axis=0)
+    c = np.fft.irfft(np.conj(fa) * fb, m, axis=0)[:n]
+    return c if c.ndim == 1 else c.sum(axis=1)
+
+
+def _toeplitz_grad(M_diag_sums):
+    """The gradient with respect to the first row of a symmetric Toeplitz
+    matrix, given the sums over the upper diagonals of the gradient with
+    respect to the matrix."""
+    g = 2.0 * M_diag_sums
+    g[0] = M_diag_sums[0]
+    return g
+
+
+def _durbin_logdet(r):
+    """The log-determinant of the symmetric positive definite Toeplitz matrix
+    with first row `r` by the Durbin recursion, in O(n^2)."""
+    n = r.shape[0]
+    a = np.zeros(n)
+    E = r[0]
+    logdet = np.log(E)
+    for k in range(1, n):
+        lam = (r[k] - a[: k - 1] @ r[k - 1 : 0 : -1]) / E
+        a[: k - 1] = a[: k - 1] - lam * a[: k - 1][::-1]
+        a[k - 1] = lam
+        E *= 1.0 - lam * lam
+        if E <= 0.0:
+            return np.inf
+        logdet += np.log(E)
+    return logdet
+
+
+class ToeplitzSolve(Op):
+    r"""Solve :math:`T x = b` for the symmetric positive definite Toeplitz
+    matrix :math:`T` with first row `r` by Levinson recursion, in
+    :math:`O(n^2)` time and :math:`O(n)` memory. `b` is a vector or a
+    matrix.
+
+    The gradient with respect to `r` sums over the diagonals of outer
+    products, which are computed by FFT.
+    """
+
+    __props__ = ()
+
+    def make_node(self, r, b):
+        r = tt.as_tensor_variable(r)
+        b = tt.as_tensor_variable(b)
+        if r.ndim != 1:
+            raise TypeError("r must be a vector", r.type)
+        if b.ndim not in (1, 2):
+            raise TypeError("b must be a vector or a matrix", b.type)
+        dtype = largest_common_dtype([r, b])
+        return Apply(self, [r, b], [tt.TensorType(dtype, b.broadcastable)()])
+
+    def perform(self, node, inputs, outputs, params=None):
+        r, b = inputs
+        (z,) = outputs
+        try:
+            x = solve_toeplitz(r, b)
+        except np.linalg.LinAlgError:
+            x = np.full(b.shape, np.nan)
+        z[0] = np.asarray(x, dtype=node.outputs[0].dtype)
+
+    def grad(self, inputs, g_outputs):
+        r, b = inputs
+        (gx,) = g_outputs
+        x = self(r, b)
+        gb = self(r, gx)
+        return [ToeplitzSolveGrad()(gb, x), gb]
+
+    def infer_shape(self, fgraph, nodes, shapes):
+        return [shapes[1]]
+
+
+class ToeplitzSolveGrad(Op):
+    """The gradient of `ToeplitzSolve` with respect to the first row."""
+
+    __props__ = ()
+
+    def make_node(self, gb, x):
+        gb = tt.as_tensor_variable(gb)
+        x = tt.as_tensor_variable(x)
+        return Apply(self, [gb, x], [tt.vector(dtype=x.dtype)])
+
+    def perform(self, node, inputs, outputs, params=None):
+        gb, x = inputs
+        (z,) = outputs
+        # the gradient with respect to the matrix is -gb x^T, summed over
+        # the lower and upper diagonals
+        sums = _correlate(gb, x) + _correlate(x, gb)
+        sums[0] *= 0.5
+        z[0] = np.asarray(-sums, dtype=node.outputs[0].dtype)
+
+    def infer_shape(self, fgraph, nodes, shapes):
+        return [shapes[1][:1]]
+
+
+class ToeplitzLogDet(Op):
+    r"""The log-determinant of the symmetric positive definite Toeplitz matrix
+    with first row `r`, by Durbin recursion in :math:`O(n^2)` time and
+    :math:`O(n)` memory. It is infinite if the matrix is not positive definite.
+
+    The gradient is computed from the first column of the inverse with the
+    Gohberg-Semencul formula and FFT.
+    """
+
+    __props__ = ()
+
+    def make_node(self, r):
+        r = tt.as_tensor_variable(r)
+        if r.ndim != 1:
+            raise TypeError("r must be a vector", r.type)
+        return Apply(self, [r], [tt.scalar(dtype=r.dtype)])
+
+    def perform(self, node, inputs, outputs, params=None):
+        (r,) = inputs
+        (z,) = outputs
+        z[0] = np.asarray(_durbin_logdet(r), dtype=r.dtype)
+
+    def grad(self, inputs, g_outputs):
+        (r,) = inputs
+        (gz,) = g_outputs
+        return [gz * ToeplitzInverseDiagSums()(r)]
+
+    def infer_shape(self, fgraph, nodes, shapes):
+        return [()]
+
+
+class ToeplitzInverseDiagSums(Op):
+    """The gradient of the log-determinant of a symmetric Toeplitz matrix with
+    respect to its first row, the sums over the diagonals of its inverse."""
+
+    __props__ = ()
+
+    def make_node(self, r):
+        r = tt.as_tensor_variable(r)
+        return Apply(self, [r], [r.type()])
+
+    def perform(self, node, inputs, outputs, params=None):
+        (r,) = inputs
+        (z,) = outputs
+        n = r.shape[0]
+        try:
+            x = solve_toeplitz(r, np.eye(1, n)[0])
+        except np.linalg.LinAlgError:
+            z[0] = np.full(n, np.nan, dtype=r.dtype)
+            return
+        # Gohberg-Semencul: T^{-1} = (A A^T - B B^T) / x_0 with the lower
+        # triangular Toeplitz matrices A and B with first columns x and
+        # (0, x_{n-1}, ..., x_1). The sum over the k-th diagonal of A A^T is
+        # sum_m (n - k - m) a_m a_{m+k}.
+        y = np.concatenate([[0.0], x[:0:-1]])
+        k = np.arange(n)
+
+        def diag_sums(a):
+            return (n - k) * _correlate(a, a) - _correlate(k * a, a)
+
+        sums = (diag_sums(x) - diag_sums(y)) / x[0]
+        z[0] = np.asarray(_toeplitz_grad(sums), dtype=r.dtype)
+
+    def infer_shape(self, fgraph, nodes, shapes):
+        return [shapes[0]]
+
+
+toeplitz_solve = ToeplitzSolve()
+toeplitz_logdet = ToeplitzLogDet()
+
+
+def _pivoted_cholesky(A, rank):
+    """The partial pivoted Cholesky factor `L`, with shape `(n, rank)`, of the
+    symmetric positive definite matrix `A`, and the diagonal of `A - L L^T`."""
+    n = A.shape[0]
+    rank = min(rank, n)
+    L = np.zeros((n, rank), dtype=A.dtype)
+    d = np.array(np.diag(A), dtype=A.dtype)
+    # stop before the factor is nearly exact, where the preconditioner
+    # becomes ill-conditioned
+    stop = 1e-4 * d.max()
+    for k in range(rank):
+        i = np.argmax(d)
+        if d[i] <= stop:
+            return L[:, :k], np.maximum(d, stop)
+        L[:, k] = (A[:, i] - L[:, :k] @ L[i, :k]) / np.sqrt(d[i])
+        d -= L[:, k] ** 2
+    return L, np.maximum(d, stop)
+
+
+def _woodbury_preconditioner(L, d):
+    """The solve with `L L^T + diag(d)` by the Woodbury identity."""
+    if L.shape[1] == 0:
+        return lambda R: R / d[:, None]
+    LD = L / d[:, None]
+    C = cho_factor(np.eye(L.shape[1]) + L.T @ LD)
+
+    def solve(R):
+        RD = R / d[:, None]
+        return RD - LD @ cho_solve(C, L.T @ RD)
+
+    return solve
+
+
+def _rademacher_probes(n, n_probes, random_seed):
+    rng = np.random.RandomState(random_seed)
+    return rng.choice([-1.0, 1.0], size=(n, n_probes))
+
+
+class CGSolve(Op):
+    r"""Solve :math:`A x = b` for a symmetric positive definite matrix `A` by
+    preconditioned conjugate gradients, in :math:`O(n^2)` time per iteration.
+    `b` is a vector or a matrix whose columns are solved for together.
+
+    Parameters
+    ----------
+    tol: float
+        Relative tolerance of the residual norm of each column.
+    maxiter: int
+        Maximum number of iterations, defaults to `10 n`.
+    precond_rank: int
+        Rank of the partial pivoted Cholesky factor of `A` that, with the
+        remaining diagonal, preconditions the iterations. With 0, the
+        diagonal of `A` is used.
+    """
+
+    __props__ = ("tol", "maxiter", "precond_rank")
+
+    def __init__(self, tol=1e-8, maxiter=None, precond_rank=15):
+        self.tol = tol
+        self.maxiter = maxiter
+        self.precond_rank = precond_rank
+
+    def make_node(self, A, b):
+        A = tt.as_tensor_variable(A)
+        b = tt.as_tensor_variable(b)
+        if A.ndim != 2:
+            raise TypeError("A must be a matrix", A.type)
+        if b.ndim not in (1, 2):
+            raise TypeError("b must be a vector or a matrix", b.type)
+        dtype = largest_common_dtype([A, b])
+        return Apply(self, [A, b], [tt.TensorType(dtype, b.broadcastable)()])
+
+    def solve(self, A, B):
+        n = A.shape[0]
+        maxiter = 10 * n if self.maxiter is None else self.maxiter
+        precond = _woodbury_preconditioner(*_pivoted_cholesky(A, self.precond_rank))
+        X = np.zeros_like(B)
+        R = B.copy()
+        Z = precond(R)
+        P = Z.copy()
+        rz = np.sum(R * Z, axis=0)
+        stop = self.tol * np.linalg.norm(B, axis=0)
+        for _ in range(maxiter):
+            active = np.linalg.norm(R, axis=0) > stop
+            if not active.any():
+                break
+            AP = A @ P
+            pAp = np.sum(P * AP, axis=0)
+            alpha = np.where(active, rz / np.where(active, pAp, 1.0), 0.0)
+            X += alpha * P
+            R -= alpha * AP
+            Z = precond(R)
+            rz_new = np.sum(R * Z, axis=0)
+            beta = np.where(active, rz_new / np.where(active, rz, 1.0), 0.0)
+            P = Z + beta * P
+            rz = rz_new
+        return X
+
+    def perform(self, node, inputs, outputs, params=None):
+        A, b = inputs
+        (z,) = outputs
+        try:
+            x = self.solve(A, b.reshape(b.shape[0], -1)).reshape(b.shape)
+        except np.linalg.LinAlgError:
+            x = np.full(b.shape, np.nan)
+        z[0] = np.asarray(x, dtype=node.outputs[0].dtype)
+
+    def grad(self, inputs, g_outputs):
+        A, b = inputs
+        (gx,) = g_outputs
+        x = self(A, b)
+        gb = self(A, gx)
+        if b.ndim == 1:
+            gA = -tt.outer(gb, x)
+        else:
+            gA = -tt.dot(gb, x.T)
+        return [gA, gb]
+
+    def infer_shape(self, fgraph, nodes, shapes):
+        return [shapes[1]]
+
+
+class SLQLogDet(Op):
+    r"""Estimate the log-determinant of a symmetric positive definite matrix
+    `A` by stochastic Lanczos quadrature, in :math:`O(n^2)` time per Lanczos
+    step and probe vector.
+
+    The gradient :math:`A^{-1}` is estimated from the same probe vectors
+    with conjugate gradient solves. The probe vectors are drawn once, so that
+    the estimate is a deterministic function of `A`. This gradient is not the
+    derivative of the estimated value, so that the estimate suits optimization
+    and ADVI, but gives energy errors in HMC and NUTS. Matrices with at most
+    `exact_size` rows are therefore factorized, with the exact value and
+    gradient.
+
+    Parameters
+    ----------
+    n_probes: int
+        Number of Rademacher probe vectors.
+    n_lanczos: int
+        Number of Lanczos steps per probe vector.
+    random_seed: int
+        Seed of the probe vectors.
+    tol, maxiter, precond_rank:
+        Parameters of the `CGSolve` of the gradient.
+    exact_size: int
+        Largest number of rows of `A` for which the log-determinant and its
+        gradient are computed exactly by a Cholesky decomposition.
+    """
+
+    __props__ = (
+        "n_probes",
+        "n_lanczos",
+        "random_seed",
+        "tol",
+        "maxiter",
+        "precond_rank",
+        "exact_size",
+    )
+
+    def __init__(
+        self,
+        n_probes=30,
+        n_lanczos=30,
+        random_seed=0,
+        tol=1e-8,
+        maxiter=None,
+        precond_rank=15,
+        exact_size=1000,
+    ):
+        self.n_probes = n_probes
+        self.n_lanczos = n_lanczos
+        self.random_seed = random_seed
+        self.tol = tol
+        self.maxiter = maxiter
+        self.precond_rank = precond_rank
+        self.exact_size = exact_size
+
+    def make_node(self, A):
+        A = tt.as_tensor_variable(A)
+        if A.ndim != 2:
+            raise TypeError("A must be a matrix", A.type)
+        return Apply(self, [A], [tt.scalar(dtype=A.dtype)])
+
+    def perform(self, node, inputs, outputs, params=None):
+        (A,) = inputs
+        (z,) = outputs
+        n = A.shape[0]
+        if n <= self.exact_size:
+            try:
+                L, _ = cho_factor(A, lower=True)
+            except np.linalg.LinAlgError:
+                z[0] = np.asarray(np.inf, dtype=A.dtype)
+                return
+            z[0] = np.asarray(2.0 * np.sum(np.log(np.diag(L))), dtype=A.dtype)
+            return
+        m = min(self.n_lanczos, n)
+        Z = _rademacher_probes(n, self.n_probes, self.random_seed)
+        # Lanczos tridiagonalizations of A started from each probe vector
+        Q = Z / np.sqrt(n)
+        Q_prev = np.zeros_like(Q)
+        alphas = np.zeros((m, self.n_probes))
+        betas = np.zeros((m, self.n_probes))
+        beta = np.zeros(self.n_probes)
+        steps = m
+        for j in range(m):
+            W = A @ Q - beta * Q_prev
+            alphas[j] = np.sum(W * Q, axis=0)
+            W -= alphas[j] * Q
+            beta = np.linalg.norm(W, axis=0)
+            betas[j] = beta
+            if j + 1 < m and np.any(beta < 1e-10):
+                # an invariant subspace is found for some probe vector
+                steps = j + 1
+                break
+            Q_prev, Q = Q, W / beta
+        logdet = 0.0
+        for i in range(self.n_probes):
+            try:
+                theta, S = eigh_tridiagonal(alphas[:steps, i], betas[: steps - 1, i])
+            except (np.linalg.LinAlgError, ValueError):
+                theta = np.array([np.nan])
+                S = np.ones((1, 1))
+            if np.any(theta <= 0.0):
+                z[0] = np.asarray(np.inf, dtype=A.dtype)
+                return
+            logdet += n * np.sum(S[0] ** 2 * np.log(theta))
+        z[0] = np.asarray(logdet / self.n_probes, dtype=A.dtype)
+
+    def grad(self, inputs, g_outputs):
+        (A,) = inputs
+        (gz,) = g_outputs
+        grad_op = SLQLogDetGrad(
+            self.n_probes,
+            self.random_seed,
+            self.tol,
+            self.maxiter,
+            self.precond_rank,
+            self.exact_size,
+        )
+        return [gz * grad_op(A)]
+
+    def infer_shape(self, fgraph, nodes, shapes):
+        return [()]
+
+
+class SLQLogDetGrad(Op):
+    r"""The Hutchinson estimate :math:`\frac{1}{m}\sum_i A^{-1} z_i z_i^T` of the
+    gradient of the log-determinant, symmetrized, from the probe vectors of
+    `SLQLogDet`, or the exact inverse for at most `exact_size` rows."""
+
+    __props__ = ("n_probes", "random_seed", "tol", "maxiter", "precond_rank", "exact_size")
+
+    def __init__(self, n_probes, random_seed, tol, maxiter, precond_rank, exact_size):
+        self.n_probes = n_probes
+        self.random_seed = random_seed
+        self.tol = tol
+        self.maxiter = maxiter
+        self.precond_rank = precond_rank
+        self.exact_size = exact_size
+
+    def make_node(self, A):
+        A = tt.as_tensor_variable(A)
+        return Apply(self, [A], [A.type()])
+
+    def perform(self, node, inputs, outputs, params=None):
+        (A,) = inputs
+        (z,) = outputs
+        n = A.shape[0]
+        if n <= self.exact_size:
+            try:
+                G = cho_solve(cho_factor(A, lower=True), np.eye(n))
+            except np.linalg.LinAlgError:
+                G = np.full_like(A, np.nan)
+            z[0] = np.asarray(0.5 * (G + G.T), dtype=A.dtype)
+            return
+        Z = _rademacher_probes(n, self.n_probes, self.random_seed)
+        X = CGSolve(self.tol, self.maxiter, self.precond_rank).solve(A, Z)
+        G = X @ Z.T / self.n_probes
+        z[0] = np.asarray(0.5 * (G + G.T), dtype=A.dtype)
+
+    def infer_shape(self, fgraph, nodes, shapes):
+        return [shapes[0]]
+
+
+cg_solve = CGSolve()
+slq_logdet = SLQLogDet()
+
+
+def _unbroadcast(x):
+    return tt.unbroadcast(x, *range(x.ndim))
+
+
+def kalman_filter(y, A, Q, h, noise_var, m0, P0, observed=None):
+    r"""Kalman filter for a linear Gaussian state space model with univariate
+    observations,
+
+    .. math::
+
+        x_k = A_k x_{k-1} + q_k \,, \quad q_k \sim \mathcal{N}(0, Q_k) \,,
+        \quad y_k = h^T x_k + e_k \,, \quad e_k \sim \mathcal{N}(0, r_k) \,,
+
+    with :math:`x_{-1} \sim \mathcal{N}(m_0, P_0)`.  The filter is a scan over
+    the time steps, so that it costs :math:`O(np^3)` for :math:`n` steps and a
+    state of size :math:`p`, and is differentiable.
+
+    Parameters
+    ----------
+    y: tensor, shape (n,)
+        The observations.
+    A: tensor, shape (n, p, p)
+        The transition matrices.
+    Q: tensor, shape (n, p, p)
+        The covariances of the transitions.
+    h: tensor, shape (p,)
+        Maps the state to the mean of the observations.
+    noise_var: scalar or tensor, shape (n,)
+        The variances :math:`r_k` of the observation noise.
+    m0, P0: tensors, shapes (p,) and (p, p)
+        The mean and covariance of the state before the first step.
+    observed: tensor, shape (n,), optional
+        Zero for the steps without an observation, whose values in `y`
+        are ignored.
+
+    Returns
+    -------
+    logp: tensor, shape (n,)
+        The log-likelihood of each observation given the previous ones.
+    m, P: tensors, shapes (n, p) and (n, p, p)
+        The filtered means and covariances of the states.
+    m_pred, P_pred: tensors, shapes (n, p) and (n, p, p)
+        The predicted means and covariances of the states, before the
+        observation of each step.
+    """
+    y, A, Q, h = map(tt.as_tensor_variable, (y, A, Q, h))
+    noise_var = tt.ones_like(y) * noise_var
+    if observed is None:
+        observed = tt.ones_like(y)
+    else:
+        observed = tt.cast(observed, y.dtype)
+
+    def step(A_k, Q_k, y_k, r_k, o_k, m, P):
+        m_pred = tt.dot(A_k, m)
+        P_pred = tt.dot(tt.dot(A_k, P), tt.transpose(A_k)) + Q_k
+        Ph = tt.dot(P_pred, h)
+        S = tt.dot(h, Ph) + r_k
+        v = y_k - tt.dot(h, m_pred)
+        K = o_k * Ph / S
+        m = m_pred + K * v
+        P = P_pred - tt.outer(K, Ph)
+        logp = -0.5 * o_k * (tt.log(2.0 * np.pi * S) + tt.square(v) / S)
+        return (
+            _unbroadcast(m),
+            _unbroadcast(0.5 * (P + tt.transpose(P))),
+            _unbroadcast(m_pred),
+            _unbroadcast(P_pred),
+            logp,
+        )
+
+    (m, P, m_pred, P_pred, logp), _ = theano.scan(
+        step,
+        sequences=[A, Q, y, noise_var, observed],
+        outputs_info=[
+            _unbroadcast(tt.as_tensor_variable(m0)),
+            _unbroadcast(tt.as_tensor_variable(P0)),
+            None,
+            None,
+            None,
+        ],
+    )
+    return logp, m, P, m_pred, P_pred
+
+
+def kalman_smoother(A, m, P, m_pred, P_pred):
+    r"""Rauch-Tung-Striebel smoother for the output of `kalman_filter`.
+
+    Parameters
+    ----------
+    A: tensor, shape (n, p, p)
+        The transition matrices given to `kalman_filter`.
+    m, P, m_pred, P_pred: tensors
+        The filtered and predicted means and covariances returned by
+        `kalman_filter`.
+
+    Returns
+    -------
+    m, P: tensors, shapes (n, p) and (n, p, p)
+        The means and covariances of the states given all observations.
+    """
+
+    def step(A_next, m_k, P_k, m_pred_next, P_pred_next, m_next, P_next):
+        G = tt.transpose(tt.slinalg.solve(P_pred_next, tt.dot(A_next, P_k)))
+        m_k = m_k + tt.dot(G, m_next - m_pred_next)
+        P_k = P_k + tt.dot(tt.dot(G, P_next - P_pred_next), tt.transpose(G))
+        return _unbroadcast(m_k), _unbroadcast(P_k)
+
+    (m_smooth, P_smooth), _ = theano.scan(
+        step,
+        sequences=[A[1:], m[:-1], P[:-1], m_pred[1:], P_pred[1:]],
+        outputs_info=[m[-1], P[-1]],
+        go_backwards=True,
+    )
+    m_smooth = tt.concatenate([m_smooth[::-1], m[-1:]])
+    P_smooth = tt.concatenate([P_smooth[::-1], P[-1:]])
+    return m_smooth, P_smooth
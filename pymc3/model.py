@@ -38,7 +38,16 @@ from pymc3.blocking import ArrayOrdering, DictToArrayBijection
 from pymc3.exceptions import ImputationWarning
 from pymc3.math import flatten_list
 from pymc3.memoize import WithMemoization, memoize
-from pymc3.theanof import floatX, generator, gradient, hessian, inputvars
+from pymc3.theanof import (
+    cached_function,
+    floatX,
+    generator,
+    gradient,
+    hessian,
+    inputvars,
+    makeiter,
+    scan_over_batch,
+)
 from pymc3.util import get_transformed_name, get_var_name
 from pymc3.vartypes import continuous_types, discrete_types, isgenerator, typefilter
 
@@ -697,7 +706,7 @@ class ValueGradFunction:
 
         inputs = [self._vars_joined]
 
-        self._theano_function = theano.function(inputs, outputs, givens=givens, **kwargs)
+        self._theano_function = cached_function(inputs, outputs, givens=givens, **kwargs)
 
     def set_weights(self, values):
         if values.shape != (self._n_costs - 1,):
@@ -969,6 +978,103 @@ class Model(Factor, WithMemoization, metaclass=ContextMeta):
         vars = inputvars(self.cont_vars)
         return self.bijection.mapf(self.fastdlogp(vars))
 
+    def logp_batch(self, points, max_chunk_bytes=2 ** 27):
+        """Evaluate the log-probability of the model at many points at once.
+
+        The points are evaluated by a compiled function that loops over them
+        with ``theano.scan``, in chunks whose inputs and outputs take about
+        ``max_chunk_bytes`` of memory. If the graph can not be compiled that
+        way, the points are evaluated one by one.
+
+        Parameters
+        ----------
+        points: array_like, shape (n, ndim)
+            Each row holds the concatenated values of the free variables in
+            the order of ``Model.bijection``, like the arrays of ``logp_array``.
+        max_chunk_bytes: int
+            Memory budget of the inputs and outputs of one call of the
+            compiled function.
+
+        Returns
+        -------
+        logp: array, shape (n,)
+        """
+        return self._eval_batch(points, max_chunk_bytes, grad=False)[0]
+
+    def dlogp_batch(self, points, max_chunk_bytes=2 ** 27):
+        """Evaluate the gradient of the log-probability at many points at once.
+
+        See ``logp_batch`` for details. All free variables must be continuous.
+
+        Parameters
+        ----------
+        points: array_like, shape (n, ndim)
+        max_chunk_bytes: int
+
+        Returns
+        -------
+        dlogp: array, shape (n, ndim)
+        """
+        return self._eval_batch(points, max_chunk_bytes, grad=True)[1]
+
+    def _eval_batch(self, points, max_chunk_bytes, grad):
+        bij = self.bijection
+        points = np.asarray(points, dtype=bij.array_dtype)
+        size = bij.ordering.size
+        if points.ndim != 2 or points.shape[1] != size:
+            raise ValueError(f"Invalid shape {points.shape} of points. Must be (n, {size}).")
+        if grad and any(var.dtype not in continuous_types for var in self.vars):
+            raise ValueError("Can only compute the gradient of continuous types.")
+
+        n = len(points)
+        row_bytes = points.itemsize * (size * (2 if grad else 1) + 1)
+        chunk_size = max(1, int(max_chunk_bytes // row_bytes))
+        fn = self._batch_function(grad)
+        if fn is None:
+            # logp_array and dlogp_array compile a new function on every access
+            logp = self.logp_array
+            dlogp = self.dlogp_array if grad else None
+        logps = np.empty(n, dtype=bij.array_dtype)
+        dlogps = np.empty((n, size), dtype=bij.array_dtype) if grad else None
+        for start in range(0, n, chunk_size):
+            chunk = points[start : start + chunk_size]
+            if fn is not None:
+                values = fn(chunk)
+            elif grad:
+                values = [[logp(x) for x in chunk], [dlogp(x) for x in chunk]]
+            else:
+                values = [[logp(x) for x in chunk]]
+            logps[start : start + len(chunk)] = values[0]
+            if grad:
+                dlogps[start : start + len(chunk)] = values[1]
+        return logps, dlogps
+
+    @memoize(bound=True)
+    def _batch_function(self, grad):
+        """Compile the function of ``_eval_batch``, or return None if that fails."""
+        bij = self.bijection
+        with self:
+            args_joined = tt.vector("__args_joined", dtype=bij.array_dtype)
+            args_joined.tag.test_value = bij.map(self.test_point)
+            replace = {}
+            for var in inputvars(self.vars):
+                varmap = bij.ordering.by_name[var.name]
+                value = args_joined[varmap.slc].reshape(varmap.shp)
+                replace[var] = tt.cast(value, var.dtype)
+            logp = theano.clone(self.logpt, replace=replace)
+            outputs = [logp, tt.grad(logp, args_joined)] if grad else [logp]
+            try:
+                inputs, outputs = scan_over_batch([args_joined], outputs)
+                return theano.function(
+                    inputs, outputs, allow_input_downcast=True, on_unused_input="ignore"
+                )
+            except (NotImplementedError, TypeError, ValueError):
+                warnings.warn(
+                    "Could not compile a batched logp function for this model. "
+                    "The points are evaluated one by one."
+                )
+                return None
+
     def logp_dlogp_function(self, grad_vars=None, tempered=False, **kwargs):
         """Compile a theano function that computes logp and gradient.
 
@@ -1250,7 +1356,7 @@ class Model(Factor, WithMemoization, metaclass=ContextMeta):
         Compiled Theano function
         """
         with self:
-            return theano.function(
+            return cached_function(
                 self.vars,
                 outs,
                 allow_input_downcast=True,
@@ -1292,6 +1398,65 @@ class Model(Factor, WithMemoization, metaclass=ContextMeta):
         f = self.makefn(outs, mode, *args, **kwargs)
         return FastPointFunc(f)
 
+    def makefn_batch(self, outs, mode=None, *args, **kwargs):
+        """Compiles a Theano function which returns ``outs`` for a batch of
+        values of the model vars.
+
+        The values of each model var are stacked along a new leading axis,
+        and so are the returned values of ``outs``.
+
+        Parameters
+        ----------
+        outs: Theano variable or iterable of Theano variables
+        mode: Theano compilation mode
+
+        Returns
+        -------
+        Compiled Theano function
+        """
+        single = not isinstance(outs, (list, tuple))
+        with self:
+            inputs, outputs = scan_over_batch(self.vars, makeiter(outs))
+            return theano.function(
+                inputs,
+                outputs[0] if single else outputs,
+                allow_input_downcast=True,
+                on_unused_input="ignore",
+                accept_inplace=True,
+                mode=mode,
+                *args,
+                **kwargs,
+            )
+
+    def fastfn_batch(self, outs, mode=None, *args, **kwargs):
+        """Compiles a Theano function which returns ``outs`` for a batch of
+        points given as a dict of stacked values of the model vars.
+
+        Parameters
+        ----------
+        outs: Theano variable or iterable of Theano variables
+        mode: Theano compilation mode
+
+        Returns
+        -------
+        Compiled Theano function as point function.
+        """
+        f = self.makefn_batch(outs, mode, *args, **kwargs)
+        return FastPointFunc(f)
+
+    @memoize(bound=True)
+    def _shared_fastfn_batch(self, outs):
+        """``fastfn_batch`` of ``outs`` compiled once, so that the traces of
+        all chains share it, or None if that fails."""
+        try:
+            return self.fastfn_batch(outs)
+        except (NotImplementedError, TypeError, ValueError):
+            warnings.warn(
+                "Could not compile a batched function of the deterministics of this model. "
+                "The draws are recorded one by one."
+            )
+            return None
+
     def profile(self, outs, n=1000, point=None, profile=True, *args, **kwargs):
         """Compiles and profiles a Theano function which returns ``outs`` and
         takes values of model vars as a dict as an argument.
@@ -1471,6 +1636,8 @@ def set_data(new_data, model=None):
             if isinstance(new_value, list):
                 new_value = np.array(new_value)
             model[variable_name].set_value(pandas_to_array(new_value))
+            if hasattr(model[variable_name], "dshape"):
+                model[variable_name].dshape = np.shape(model[variable_name].get_value(borrow=True))
         else:
             message = (
                 "The variable `{}` must be defined as `pymc3."
@@ -1481,6 +1648,41 @@ def set_data(new_data, model=None):
             raise TypeError(message)
 
 
+def _for_each_dataset(func, data, model=None):
+    """Call ``func`` with the data containers set to each of the new datasets.
+
+    The compiled functions of the model only depend on the data containers
+    through their shared variables, so they stay valid if the size of the data
+    changes and are reused for all datasets.
+
+    Parameters
+    ----------
+    func: callable
+        Function without arguments, e.g. a predictive sampler
+    data: dict or list of dict
+        New values for the data containers, see :func:`set_data`
+    model: Model (optional if in `with` context)
+
+    Returns
+    -------
+    The result of ``func`` for a dict, or the list of the results for each
+    dict of a list. The data containers are set back to their previous
+    values afterwards.
+    """
+    model = modelcontext(model)
+    datasets = [data] if isinstance(data, dict) else list(data)
+    names = {name for dataset in datasets for name in dataset}
+    previous = {name: model[name].get_value() for name in names if name in model.named_vars}
+    results = []
+    try:
+        for dataset in datasets:
+            set_data(dataset, model=model)
+            results.append(func())
+    finally:
+        set_data(previous, model=model)
+    return results[0] if isinstance(data, dict) else results
+
+
 def fn(outs, mode=None, model=None, *args, **kwargs):
     """Compiles a Theano function which returns the values of ``outs`` and
     takes values of model vars as arguments.
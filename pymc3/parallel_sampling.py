@@ -29,6 +29,7 @@ from fastprogress.fastprogress import progress_bar
 
 from pymc3 import theanof
 from pymc3.exceptions import SamplingError
+from pymc3.step_methods.hmc.quadpotential import QuadPotentialDiagAdapt
 
 logger = logging.getLogger("pymc3")
 
@@ -67,6 +68,77 @@ def rebuild_exc(exc, tb):
     return exc
 
 
+def _supports_pooled_tuning(step_method):
+    potential = getattr(step_method, "potential", None)
+    step_adapt = getattr(step_method, "step_adapt", None)
+    # subclasses, like the adaptation from gradients or the low rank update,
+    # estimate their mass matrix from more than the pooled variances
+    return type(potential) is QuadPotentialDiagAdapt and hasattr(step_adapt, "pool")
+
+
+class PooledTuning:
+    """Shared memory through which chains pool their tuning statistics.
+
+    Every chain periodically publishes the running mean and variance
+    estimate of its mass matrix adaptation and the state of its step size
+    adaptation. It then combines the estimates of the other chains with its
+    own, so that each chain adapts from the samples of all chains.
+
+    Parameters
+    ----------
+    chains: int
+        Number of chains that share their statistics.
+    size: int
+        Number of elements of the mass matrix diagonal.
+    mp_ctx: multiprocessing context
+    interval: int
+        Number of tuning steps between two exchanges.
+    """
+
+    def __init__(self, chains, size, mp_ctx, interval=10):
+        self.chains = chains
+        self.size = size
+        self.interval = int(interval)
+        self._lock = mp_ctx.Lock()
+        # Per chain: n_samples, hbar, log_bar, mean, raw_var
+        self._row = 3 + 2 * size
+        self._array = mp_ctx.RawArray("d", chains * self._row)
+
+    def _rows(self):
+        return np.frombuffer(self._array, "d").reshape(self.chains, self._row)
+
+    def exchange(self, idx, step_method):
+        """Publish the statistics of chain `idx` and pool the statistics of all chains."""
+        from pymc3.step_methods.hmc.quadpotential import _WeightedVariance
+
+        potential, step_adapt = step_method.potential, step_method.step_adapt
+        weightvar = potential.weighted_variance
+        n = self.size
+        with self._lock:
+            rows = self._rows()
+            rows[idx, 0] = weightvar.n_samples
+            rows[idx, 1] = step_adapt._hbar
+            rows[idx, 2] = step_adapt._log_bar
+            rows[idx, 3 : 3 + n] = weightvar.mean
+            rows[idx, 3 + n :] = weightvar.raw_var
+            rows = rows.copy()
+
+        published = rows[:, 0] > 0
+        pooled = None
+        for other, row in enumerate(rows):
+            if other == idx or not published[other]:
+                continue
+            var = _WeightedVariance(n, row[3 : 3 + n], dtype=potential.dtype)
+            var.n_samples = row[0]
+            var.raw_var[:] = row[3 + n :]
+            if pooled is None:
+                pooled = var
+            else:
+                pooled.add_variance(var)
+        potential.set_pooled_variance(pooled)
+        step_adapt.pool(rows[published, 1], rows[published, 2])
+
+
 # Messages
 # ('writing_done', is_last, sample_idx, tuning, stats, warns)
 # ('error', warnings, *exception_info)
@@ -93,6 +165,8 @@ class _Process:
         tune: int,
         seed,
         pickle_backend,
+        pooled_tuning=None,
+        pool_idx=None,
     ):
         self._msg_pipe = msg_pipe
         self._step_method = step_method
@@ -103,6 +177,8 @@ class _Process:
         self._draws = draws
         self._tune = tune
         self._pickle_backend = pickle_backend
+        self._pooled_tuning = pooled_tuning
+        self._pool_idx = pool_idx
 
     def _unpickle_step_method(self):
         unpickle_error = (
@@ -193,6 +269,12 @@ class _Process:
                     warns = self._collect_warnings()
                     e = ExceptionWithTraceback(e, e.__traceback__)
                     self._msg_pipe.send(("error", warns, e))
+                if (
+                    tuning
+                    and self._pooled_tuning is not None
+                    and (draw + 1) % self._pooled_tuning.interval == 0
+                ):
+                    self._pooled_tuning.exchange(self._pool_idx, self._step_method)
             else:
                 return
 
@@ -244,6 +326,8 @@ class ProcessAdapter:
         start,
         mp_ctx,
         pickle_backend,
+        pooled_tuning=None,
+        pool_idx=None,
     ):
         self.chain = chain
         process_name = "worker_chain_%s" % chain
@@ -287,6 +371,8 @@ class ProcessAdapter:
                 tune,
                 seed,
                 pickle_backend,
+                pooled_tuning,
+                pool_idx,
             ),
         )
         self._process.start()
@@ -406,6 +492,8 @@ class ParallelSampler:
         progressbar: bool = True,
         mp_ctx=None,
         pickle_backend: str = "pickle",
+        pool_tuning: bool = False,
+        pool_interval: int = 10,
     ):
 
         if any(len(arg) != chains for arg in [seeds, start_points]):
@@ -428,6 +516,20 @@ class ParallelSampler:
                     raise ValueError("dill must be installed for pickle_backend='dill'.")
                 step_method_pickled = dill.dumps(step_method, protocol=-1)
 
+        pooled_tuning = None
+        if pool_tuning and chains > 1 and tune > 0:
+            if not _supports_pooled_tuning(step_method):
+                raise ValueError(
+                    "Pooled tuning requires a single NUTS or HMC step method with an "
+                    "adaptive diagonal mass matrix."
+                )
+            if cores < chains:
+                # Chains that are not running can not exchange statistics
+                logger.warning("Pooled tuning only pools chains that run at the same time.")
+            pooled_tuning = PooledTuning(
+                chains, step_method.potential.weighted_variance.mean.size, mp_ctx, pool_interval
+            )
+
         self._samplers = [
             ProcessAdapter(
                 draws,
@@ -439,6 +541,8 @@ class ParallelSampler:
                 start,
                 mp_ctx,
                 pickle_backend,
+                pooled_tuning,
+                chain,
             )
             for chain, seed, start in zip(range(chains), seeds, start_points)
         ]
@@ -0,0 +1,146 @@
+#   Copyright 2020 The PyMC Developers
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""Time and call counts of the hot paths of the samplers."""
+
+import functools
+import inspect
+import time
+
+from collections import defaultdict
+
+import pandas as pd
+
+__all__ = ["SamplingProfiler"]
+
+
+class SamplingProfiler:
+    """Measures the time spent in the components of a sampling run.
+
+    The profiler replaces the methods of the step methods, backends and
+    parallel sampler that are instrumented with timed wrappers, and restores
+    them when it is closed. Nothing is measured, and there is no overhead,
+    while no profiler is active.
+
+    Examples
+    --------
+    .. code:: ipython
+
+        >>> with SamplingProfiler() as profiler:
+        ...     profiler.instrument_step(step)
+        ...     profiler.instrument_backend(NDArray)
+        ...     trace = pm.sample(step=step)
+        >>> profiler.report()
+    """
+
+    def __init__(self):
+        self.stats = defaultdict(lambda: [0, 0.0])
+        self._patches = []
+        self._depth = defaultdict(int)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """Restore all instrumented methods."""
+        while self._patches:
+            owner, attr, original, own = self._patches.pop()
+            if own:
+                setattr(owner, attr, original)
+            else:
+                delattr(owner, attr)
+
+    def timed(self, name, func):
+        """Wrap ``func`` to add its calls and time to the component ``name``.
+
+        Only the outermost call is timed if ``func`` is called recursively.
+        """
+        stats = self.stats[name]
+        depth = self._depth
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if depth[name]:
+                return func(*args, **kwargs)
+            depth[name] += 1
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                stats[1] += time.perf_counter() - start
+                stats[0] += 1
+                depth[name] -= 1
+
+        return wrapper
+
+    def patch(self, owner, attr, name):
+        """Replace the attribute ``attr`` of ``owner``, an instance or a class,
+        by a timed wrapper."""
+        static = inspect.getattr_static(owner, attr)
+        own = attr in vars(owner)
+        original = vars(owner)[attr] if own else None
+        if isinstance(static, staticmethod):
+            wrapper = staticmethod(self.timed(name, static.__func__))
+        else:
+            wrapper = self.timed(name, getattr(owner, attr))
+        setattr(owner, attr, wrapper)
+        self._patches.append((owner, attr, original, own))
+
+    def instrument_step(self, step):
+        """Instrument a step method, or the step methods of a CompoundStep."""
+        from pymc3.step_methods.hmc import nuts
+
+        for method in getattr(step, "methods", [step]):
+            self.patch(method, "astep", "%s.astep" % type(method).__name__)
+            integrator = getattr(method, "integrator", None)
+            if integrator is not None:
+                self.patch(integrator, "step", "integrator.step")
+                self.patch(integrator, "_logp_dlogp_func", "logp_dlogp_func")
+            potential = getattr(method, "potential", None)
+            if potential is not None:
+                self.patch(potential, "update", "potential.update")
+            if isinstance(method, nuts.NUTS) and "_build_subtree" not in self.stats:
+                self.patch(nuts._Tree, "_build_subtree", "_build_subtree")
+
+    def instrument_backend(self, backend):
+        """Instrument the recording of draws by a trace backend class."""
+        self.patch(backend, "record", "record")
+        if hasattr(backend, "record_array"):
+            self.patch(backend, "record_array", "record")
+
+    def instrument_parallel(self):
+        """Instrument the reception of draws from parallel chains."""
+        from pymc3.parallel_sampling import ProcessAdapter
+
+        self.patch(ProcessAdapter, "recv_draw", "recv_draw")
+
+    def report(self):
+        """The number of calls and the time of each component.
+
+        Returns
+        -------
+        pandas.DataFrame
+            With the columns ``calls``, ``time`` (seconds in total) and
+            ``time_per_call``, sorted by decreasing time. The times of nested
+            components are included in the time of the enclosing ones.
+        """
+        report = pd.DataFrame(
+            [(name, calls, t) for name, (calls, t) in self.stats.items()],
+            columns=["component", "calls", "time"],
+        ).set_index("component")
+        report["time_per_call"] = report["time"] / report["calls"].where(report["calls"] > 0)
+        return report.sort_values("time", ascending=False)
@@ -15,7 +15,9 @@
 """Functions for MCMC sampling."""
 
 import collections.abc as abc
+import contextlib
 import logging
+import multiprocessing
 import pickle
 import sys
 import time
@@ -40,9 +42,11 @@ from pymc3.backends.base import BaseTrace, MultiTrace
 from pymc3.backends.ndarray import NDArray
 from pymc3.distributions.distribution import draw_values
 from pymc3.distributions.posterior_predictive import fast_sample_posterior_predictive
+from pymc3.distributions.prior_predictive import _PriorPredictiveSampler
 from pymc3.exceptions import IncorrectArgumentsError, SamplingError
-from pymc3.model import Model, Point, all_continuous, modelcontext
+from pymc3.model import Model, Point, _for_each_dataset, all_continuous, modelcontext
 from pymc3.parallel_sampling import Draw, _cpu_count
+from pymc3.profiling import SamplingProfiler
 from pymc3.step_methods import (
     NUTS,
     PGBART,
@@ -55,7 +59,11 @@ from pymc3.step_methods import (
     Metropolis,
     Slice,
 )
-from pymc3.step_methods.arraystep import BlockedStep, PopulationArrayStepShared
+from pymc3.step_methods.arraystep import (
+    BlockedStep,
+    GradientSharedStep,
+    PopulationArrayStepShared,
+)
 from pymc3.step_methods.hmc import quadpotential
 from pymc3.util import (
     chains_and_samples,
@@ -73,10 +81,12 @@ sys.setrecursionlimit(10000)
 __all__ = [
     "sample",
     "iter_sample",
+    "compute_deterministics",
     "sample_posterior_predictive",
     "sample_posterior_predictive_w",
     "init_nuts",
     "sample_prior_predictive",
+    "fast_sample_prior_predictive",
     "fast_sample_posterior_predictive",
 ]
 
@@ -255,6 +265,9 @@ def sample(
     idata_kwargs: dict = None,
     mp_ctx=None,
     pickle_backend: str = "pickle",
+    defer_deterministics: bool = False,
+    pool_tuning: bool = False,
+    profile: bool = False,
     **kwargs,
 ):
     r"""Draw samples from the posterior using the given step methods.
@@ -286,6 +299,10 @@ def sample(
         * advi_map: Initialize ADVI with MAP and use MAP as starting point.
         * map: Use the MAP as starting point. This is discouraged.
         * adapt_full: Adapt a dense mass matrix using the sample covariances
+        * adapt_low_rank: Adapt a diagonal plus low rank mass matrix using the leading
+          eigenvectors of the sample covariance. This scales to high dimensional models.
+        * jitter+adapt_low_rank: Same as ``adapt_low_rank``, but add uniform jitter in [-1, 1]
+          to the starting point in each chain.
 
     step : function or iterable of functions
         A step function or collection of functions. If there are variables without step methods,
@@ -351,6 +368,25 @@ def sample(
         One of `'pickle'` or `'dill'`. The library used to pickle models
         in parallel sampling if the multiprocessing context is not of type
         `fork`.
+    defer_deterministics : bool, default=False
+        Whether to record only the free variables during sampling. The values of deterministics
+        and untransformed variables are then computed after sampling (and after discarding the
+        tuning samples) in a vectorized pass over all draws, see ``compute_deterministics``.
+        This is useful for models with expensive deterministics. The pass is split over
+        ``cores`` processes if there is enough work.
+    pool_tuning : bool, default=False
+        Whether chains that are sampled in parallel pool their mass matrix and step size
+        adaptation during tuning. The chains periodically exchange their statistics through
+        shared memory, so that each chain adapts using the samples of all chains. This allows
+        a shorter ``tune`` phase when many chains are used. Only supported for a single NUTS or
+        HMC step method with a diagonal adaptive mass matrix (the default).
+    profile : bool, default=False
+        Whether to measure the number of calls and the time spent in the components of the
+        samplers: the ``astep`` of each step method, the NUTS tree building, the leapfrog steps,
+        the logp and gradient evaluations, the mass matrix updates, the recording of draws and,
+        with parallel chains, the reception of draws. The measurements are stored as a
+        ``pandas.DataFrame`` in ``trace.report.profile``. The step methods of parallel chains run
+        in other processes and are not measured.
 
     Returns
     -------
@@ -517,6 +553,10 @@ def sample(
         step = CompoundStep(step)
     if start is None:
         start = {}
+    if defer_deterministics:
+        if trace is not None:
+            raise ValueError("`defer_deterministics` can not be used together with `trace`.")
+        trace = list(model.vars)
     if isinstance(start, dict):
         start = [start] * chains
 
@@ -538,6 +578,7 @@ def sample(
     parallel_args = {
         "pickle_backend": pickle_backend,
         "mp_ctx": mp_ctx,
+        "pool_tuning": pool_tuning,
     }
 
     sample_args.update(kwargs)
@@ -550,50 +591,66 @@ def sample(
     )
 
     parallel = cores > 1 and chains > 1 and not has_population_samplers
-    t_start = time.time()
-    if parallel:
-        _log.info(f"Multiprocess sampling ({chains} chains in {cores} jobs)")
-        _print_step_hierarchy(step)
-        try:
-            trace = _mp_sample(**sample_args, **parallel_args)
-        except pickle.PickleError:
-            _log.warning("Could not pickle model, sampling singlethreaded.")
-            _log.debug("Pickling error:", exec_info=True)
-            parallel = False
-        except AttributeError as e:
-            if not str(e).startswith("AttributeError: Can't pickle"):
-                raise
-            _log.warning("Could not pickle model, sampling singlethreaded.")
-            _log.debug("Pickling error:", exec_info=True)
-            parallel = False
-    if not parallel:
-        if has_population_samplers:
-            has_demcmc = np.any(
-                [
-                    isinstance(m, DEMetropolis)
-                    for m in (step.methods if isinstance(step, CompoundStep) else [step])
-                ]
-            )
-            _log.info(f"Population sampling ({chains} chains)")
-            if has_demcmc and chains < 3:
-                raise ValueError(
-                    "DEMetropolis requires at least 3 chains. "
-                    "For this {}-dimensional model you should use ≥{} chains".format(
-                        model.ndim, model.ndim + 1
-                    )
-                )
-            if has_demcmc and chains <= model.ndim:
-                warnings.warn(
-                    "DEMetropolis should be used with more chains than dimensions! "
-                    "(The model has {} dimensions.)".format(model.ndim),
-                    UserWarning,
-                )
-            _print_step_hierarchy(step)
-            trace = _sample_population(parallelize=cores > 1, **sample_args)
+    profiler = SamplingProfiler() if profile else contextlib.nullcontext()
+    if profile:
+        if isinstance(trace, BaseTrace):
+            profiler.instrument_backend(type(trace))
+        elif isinstance(trace, MultiTrace):
+            profiler.instrument_backend(type(trace._straces[0]))
+        else:
+            profiler.instrument_backend(NDArray)
+        if parallel:
+            profiler.instrument_parallel()
         else:
-            _log.info(f"Sequential sampling ({chains} chains in 1 job)")
+            # instrumented step methods can not be pickled for the worker processes
+            profiler.instrument_step(step)
+    t_start = time.time()
+    with profiler:
+        if parallel:
+            _log.info(f"Multiprocess sampling ({chains} chains in {cores} jobs)")
             _print_step_hierarchy(step)
-            trace = _sample_many(**sample_args)
+            try:
+                trace = _mp_sample(**sample_args, **parallel_args)
+            except pickle.PickleError:
+                _log.warning("Could not pickle model, sampling singlethreaded.")
+                _log.debug("Pickling error:", exec_info=True)
+                parallel = False
+            except AttributeError as e:
+                if not str(e).startswith("AttributeError: Can't pickle"):
+                    raise
+                _log.warning("Could not pickle model, sampling singlethreaded.")
+                _log.debug("Pickling error:", exec_info=True)
+                parallel = False
+        if not parallel:
+            if pool_tuning:
+                _log.warning("Pooled tuning requires parallel sampling and is disabled.")
+            if has_population_samplers:
+                has_demcmc = np.any(
+                    [
+                        isinstance(m, DEMetropolis)
+                        for m in (step.methods if isinstance(step, CompoundStep) else [step])
+                    ]
+                )
+                _log.info(f"Population sampling ({chains} chains)")
+                if has_demcmc and chains < 3:
+                    raise ValueError(
+                        "DEMetropolis requires at least 3 chains. "
+                        "For this {}-dimensional model you should use ≥{} chains".format(
+                            model.ndim, model.ndim + 1
+                        )
+                    )
+                if has_demcmc and chains <= model.ndim:
+                    warnings.warn(
+                        "DEMetropolis should be used with more chains than dimensions! "
+                        "(The model has {} dimensions.)".format(model.ndim),
+                        UserWarning,
+                    )
+                _print_step_hierarchy(step)
+                trace = _sample_population(parallelize=cores > 1, **sample_args)
+            else:
+                _log.info(f"Sequential sampling ({chains} chains in 1 job)")
+                _print_step_hierarchy(step)
+                trace = _sample_many(**sample_args)
 
     t_sampling = time.time() - t_start
     # count the number of tune/draw iterations that happened
@@ -614,10 +671,15 @@ def sample(
     if discard_tuned_samples:
         trace = trace[n_tune:]
 
+    if defer_deterministics:
+        trace = compute_deterministics(trace, model=model, cores=cores, mp_ctx=mp_ctx)
+
     # save metadata in SamplerReport
     trace.report._n_tune = n_tune
     trace.report._n_draws = n_draws
     trace.report._t_sampling = t_sampling
+    if profile:
+        trace.report.profile = profiler.report()
 
     if "variable_inclusion" in trace.stat_names:
         variable_inclusion = np.stack(trace.get_sampler_stats("variable_inclusion")).mean(0)
@@ -993,6 +1055,12 @@ def _iter_sample(
     else:
         strace.setup(draws, chain)
 
+    array_func = _array_record_func(step, strace, model)
+    if array_func is not None:
+        strace.setup_array(array_func._ordering, array_func.dtype)
+        array_func.set_extra_values(point)
+        q = array_func.dict_to_array(point)
+
     try:
         step.tune = bool(tune)
         if hasattr(step, "reset_tuning"):
@@ -1005,7 +1073,18 @@ def _iter_sample(
                 step.iter_count = 0
             if i == tune:
                 step = stop_tuning(step)
-            if step.generates_stats:
+            if array_func is not None:
+                # Skip the dict round trip and record the flat array directly
+                if step.generates_stats:
+                    q, stats = step.astep(q)
+                    strace.record_array(q, stats)
+                    diverging = i > tune and stats and stats[0].get("diverging")
+                else:
+                    q = step.astep(q)
+                    strace.record_array(q)
+                if callback is not None:
+                    point = array_func.array_to_full_dict(q)
+            elif step.generates_stats:
                 point, stats = step.step(point)
                 if strace.supports_sampler_stats:
                     strace.record(point, stats)
@@ -1039,6 +1118,28 @@ def _iter_sample(
             strace._add_warnings(warns)
 
 
+def _array_record_func(step, strace, model):
+    """Return the logp function of a gradient based step method whose flat
+    arrays can be recorded directly into the trace, or None.
+
+    This is possible if the step method samples all free variables of the
+    model, the backend supports ``record_array`` and the other variables of
+    the trace can be computed in batches.
+    """
+    if not isinstance(strace, NDArray) or not isinstance(step, GradientSharedStep):
+        return None
+    func = step._logp_dlogp_func
+    if strace.model is not model or func._extra_vars:
+        return None
+    if set(func._ordering.by_name) != {var.name for var in model.vars}:
+        return None
+    # the other variables are computed from the recorded arrays in batches
+    derived = tuple(var for var in strace.vars if var.name not in func._ordering.by_name)
+    if derived and model._shared_fastfn_batch(derived) is None:
+        return None
+    return func
+
+
 class PopulationStepper:
     """Wraps population of step methods to step them in parallel with single or multiprocessing."""
 
@@ -1396,6 +1497,7 @@ def _mp_sample(
     discard_tuned_samples=True,
     mp_ctx=None,
     pickle_backend="pickle",
+    pool_tuning=False,
     **kwargs,
 ):
     """Main iteration for multiprocess sampling.
@@ -1431,6 +1533,8 @@ def _mp_sample(
         the ``draw.chain`` argument can be used to determine which of the active chains the sample
         is drawn from.
         Sampling can be interrupted by throwing a ``KeyboardInterrupt`` in the callback.
+    pool_tuning : bool
+        Whether the chains pool their step size and mass matrix adaptation during tuning.
 
     Returns
     -------
@@ -1469,6 +1573,7 @@ def _mp_sample(
         progressbar,
         mp_ctx=mp_ctx,
         pickle_backend=pickle_backend,
+        pool_tuning=pool_tuning,
     )
     try:
         try:
@@ -1597,6 +1702,101 @@ class _DefaultTrace:
             self.trace_dict[k][idx, :] = v
 
 
+def compute_deterministics(
+    trace: MultiTrace,
+    model: Optional[Model] = None,
+    chunk_size: int = 1000,
+    cores: int = 1,
+    mp_ctx=None,
+    min_draws_per_core: int = 20000,
+) -> MultiTrace:
+    """Add the values of deterministics and untransformed variables to a trace.
+
+    The trace must contain the values of all free variables of the model,
+    e.g. because it was sampled with ``pm.sample(defer_deterministics=True)``.
+    The missing variables are computed with one compiled function that is
+    vectorized over the draws.
+
+    Parameters
+    ----------
+    trace : MultiTrace
+        Trace with ``NDArray`` chains. It is modified in place.
+    model : Model (optional if in ``with`` context)
+    chunk_size : int
+        Number of draws that are evaluated in one call of the compiled function.
+    cores : int
+        Number of processes among which the chunks are distributed.
+    mp_ctx : multiprocessing.context.BaseContent
+        A multiprocessing context for the parallel evaluation.
+    min_draws_per_core : int
+        Minimum number of draws per process. Fewer processes are used if
+        there are fewer draws, and none if they would get less than one.
+
+    Returns
+    -------
+    trace : MultiTrace
+        The trace, containing all unobserved variables of the model.
+    """
+    model = modelcontext(model)
+    missing = [var.name for var in model.vars if var.name not in trace.varnames]
+    if missing:
+        raise ValueError(f"The trace does not contain the free variables {missing}.")
+    outputs = [var for var in model.unobserved_RVs if var.name not in trace.varnames]
+    if not outputs:
+        return trace
+
+    fn = model.makefn_batch(outputs)
+
+    blocks = []
+    for chain in trace.chains:
+        values = [trace.get_values(var.name, chains=chain) for var in model.vars]
+        n_draws = len(trace._straces[chain])
+        for start in range(0, n_draws, chunk_size):
+            blocks.append((chain, [value[start : start + chunk_size] for value in values]))
+
+    n_draws = sum(len(trace._straces[chain]) for chain in trace.chains)
+    cores = min(cores, len(blocks), n_draws // max(min_draws_per_core, 1))
+    if cores > 1:
+        if mp_ctx is None or isinstance(mp_ctx, str):
+            mp_ctx = multiprocessing.get_context(mp_ctx)
+        with mp_ctx.Pool(cores, initializer=_init_batch_worker, initargs=(fn,)) as pool:
+            results = pool.map(_eval_batch, [inputs for _, inputs in blocks])
+    else:
+        results = [fn(*inputs) for _, inputs in blocks]
+
+    known = {var.name for var in model.unobserved_RVs}
+    for chain, strace in trace._straces.items():
+        chain_results = [result for (c, _), result in zip(blocks, results) if c == chain]
+        names = set(strace.varnames)
+        for i, var in enumerate(outputs):
+            if chain_results:
+                value = np.concatenate([result[i] for result in chain_results])
+            else:
+                test_values = [np.asarray(model.test_point[v.name])[None] for v in model.vars]
+                value = fn(*test_values)[i][:0]
+            strace.samples[var.name] = value
+            strace.var_shapes[var.name] = value.shape[1:]
+            strace.var_dtypes[var.name] = value.dtype
+            names.add(var.name)
+        strace.vars = [var for var in model.unobserved_RVs if var.name in names] + [
+            var for var in strace.vars if var.name not in known
+        ]
+        strace.varnames = [var.name for var in strace.vars]
+    return trace
+
+
+_batch_fn = None
+
+
+def _init_batch_worker(fn):
+    global _batch_fn
+    _batch_fn = fn
+
+
+def _eval_batch(inputs):
+    return _batch_fn(*inputs)
+
+
 def sample_posterior_predictive(
     trace,
     samples: Optional[int] = None,
@@ -1606,7 +1806,8 @@ def sample_posterior_predictive(
     keep_size: Optional[bool] = False,
     random_seed=None,
     progressbar: bool = True,
-) -> Dict[str, np.ndarray]:
+    data: Optional[Union[Dict[str, Any], List[Dict[str, Any]]]] = None,
+) -> Union[Dict[str, np.ndarray], List[Dict[str, np.ndarray]]]:
     """Generate posterior predictive samples from a model given a trace.
 
     Parameters
@@ -1639,13 +1840,33 @@ def sample_posterior_predictive(
         Whether or not to display a progress bar in the command line. The bar shows the percentage
         of completion, the sampling speed in samples per second (SPS), and the estimated remaining
         time until completion ("expected time of arrival"; ETA).
+    data : dict or list of dict, optional
+        New values for the ``pm.Data`` containers of the model, see :func:`~pymc3.set_data`.
+        With a list of dicts, the samples are generated for each dataset in turn, reusing the
+        compiled functions even if the size of the data changes. The data containers are set
+        back to their previous values afterwards.
 
     Returns
     -------
-    samples : dict
+    samples : dict or list of dict
         Dictionary with the variable names as keys, and values numpy arrays containing
-        posterior predictive samples.
+        posterior predictive samples, or a list of such dictionaries if ``data`` is a list.
     """
+    if data is not None:
+        return _for_each_dataset(
+            lambda: sample_posterior_predictive(
+                trace,
+                samples=samples,
+                model=model,
+                var_names=var_names,
+                size=size,
+                keep_size=keep_size,
+                random_seed=random_seed,
+                progressbar=progressbar,
+            ),
+            data,
+            model=model,
+        )
 
     _trace: Union[MultiTrace, PointList]
     if isinstance(trace, InferenceData):
@@ -1918,6 +2139,54 @@ def sample_prior_predictive(
         Dictionary with variable names as keys. The values are numpy arrays of prior
         samples.
     """
+    return _sample_prior_predictive(
+        lambda model, vars: draw_values(vars, size=samples), samples, model, var_names, random_seed
+    )
+
+
+def fast_sample_prior_predictive(
+    samples=500,
+    model: Optional[Model] = None,
+    var_names: Optional[Iterable[str]] = None,
+    random_seed=None,
+) -> Dict[str, np.ndarray]:
+    """Generate samples from the prior predictive distribution with a vectorized sampler.
+
+    This is an alternative to :func:`sample_prior_predictive` that draws each random variable
+    for all samples at once. The parameters of the distributions and the deterministics are
+    computed by compiled functions that map their graphs over the values drawn before, and
+    the common distributions are drawn with one call of a batched numpy generator, see
+    :func:`pymc3.distributions.prior_predictive.batched_random`. Other distributions fall
+    back to their ``random`` method. This is much faster for hierarchical models with many
+    groups, where ``sample_prior_predictive`` loops over the samples in Python.
+
+    Parameters
+    ----------
+    samples : int
+        Number of samples from the prior predictive to generate. Defaults to 500.
+    model : Model (optional if in ``with`` context)
+    var_names : Iterable[str]
+        A list of names of variables for which to compute the posterior predictive
+        samples. Defaults to both observed and unobserved RVs.
+    random_seed : int
+        Seed for the random number generator.
+
+    Returns
+    -------
+    dict
+        Dictionary with variable names as keys. The values are numpy arrays of prior
+        samples.
+    """
+    return _sample_prior_predictive(
+        lambda model, vars: _PriorPredictiveSampler(model, samples).draw(vars),
+        samples,
+        model,
+        var_names,
+        random_seed,
+    )
+
+
+def _sample_prior_predictive(draw, samples, model, var_names, random_seed):
     model = modelcontext(model)
 
     if model.potentials:
@@ -1940,7 +2209,7 @@ def sample_prior_predictive(
         np.random.seed(random_seed)
     names = get_default_varnames(vars_, include_transformed=False)
     # draw_values fails with auto-transformed variables. transform them later!
-    values = draw_values([model[name] for name in names], size=samples)
+    values = draw(model, [model[name] for name in names])
 
     data = {k: v for k, v in zip(names, values)}
     if data is None:
@@ -2038,6 +2307,11 @@ def init_nuts(
           test value (usually the prior mean) as starting point.
         * jitter+adapt_full: Same as ``adapt_full``, but use test value plus a uniform jitter in
           [-1, 1] as starting point in each chain.
+        * adapt_low_rank: Adapt a diagonal plus low rank mass matrix using the leading eigenvectors
+          of the sample covariance of the tuning samples. All chains use the test value (usually
+          the prior mean) as starting point.
+        * jitter+adapt_low_rank: Same as ``adapt_low_rank``, but use test value plus a uniform
+          jitter in [-1, 1] as starting point in each chain.
 
     chains : int
         Number of jobs to start.
@@ -2180,6 +2454,16 @@ def init_nuts(
         mean = np.mean([model.dict_to_array(vals) for vals in start], axis=0)
         cov = np.eye(model.ndim)
         potential = quadpotential.QuadPotentialFullAdapt(model.ndim, mean, cov, 10)
+    elif init == "adapt_low_rank":
+        start = [model.test_point] * chains
+        mean = np.mean([model.dict_to_array(vals) for vals in start], axis=0)
+        var = np.ones_like(mean)
+        potential = quadpotential.QuadPotentialLowRankAdapt(model.ndim, mean, var, 10)
+    elif init == "jitter+adapt_low_rank":
+        start = _init_jitter(model, chains, jitter_max_retries)
+        mean = np.mean([model.dict_to_array(vals) for vals in start], axis=0)
+        var = np.ones_like(mean)
+        potential = quadpotential.QuadPotentialLowRankAdapt(model.ndim, mean, var, 10)
     else:
         raise ValueError(f"Unknown initializer: {init}.")
 
@@ -57,6 +57,7 @@ class BaseHMC(arraystep.GradientSharedStep):
         t0=10,
         adapt_step_size=True,
         step_rand=None,
+        reuse_end_state=True,
         **theano_kwargs
     ):
         """Set up Hamiltonian samplers with common structures.
@@ -77,6 +78,10 @@ class BaseHMC(arraystep.GradientSharedStep):
         potential: Potential, optional
             An object that represents the Hamiltonian with methods `velocity`,
             `energy`, and `random` methods.
+        reuse_end_state: bool, default=True
+            Whether the log probability and gradient at the end of the last
+            trajectory are reused for the start of the next one, if the
+            sampler continues from that position.
         **theano_kwargs: passed to theano functions
         """
         self._model = modelcontext(model)
@@ -119,6 +124,8 @@ class BaseHMC(arraystep.GradientSharedStep):
         self.integrator = integration.CpuLeapfrogIntegrator(self.potential, self._logp_dlogp_func)
 
         self._step_rand = step_rand
+        self._reuse_end_state = reuse_end_state
+        self._end_state = None
         self._warnings = []
         self._samples_after_tune = 0
         self._num_divs_sample = 0
@@ -136,7 +143,7 @@ class BaseHMC(arraystep.GradientSharedStep):
         process_start = time.process_time()
 
         p0 = self.potential.random()
-        start = self.integrator.compute_state(q0, p0)
+        start = self.integrator.compute_state(q0, p0, self._cached_logp_dlogp(q0))
 
         if not np.isfinite(start.energy):
             model = self._model
@@ -172,6 +179,11 @@ class BaseHMC(arraystep.GradientSharedStep):
 
         self.step_adapt.update(hmc_step.accept_stat, adapt_step)
         self.potential.update(hmc_step.end.q, hmc_step.end.q_grad, self.tune)
+        if self._reuse_end_state:
+            end = hmc_step.end
+            # NUTS returns its proposal instead of an integrator state
+            logp = end.model_logp if isinstance(end, integration.State) else end.logp
+            self._end_state = (end.q.copy(), logp, end.q_grad)
         if hmc_step.divergence_info:
             info = hmc_step.divergence_info
             point = None
@@ -219,12 +231,25 @@ class BaseHMC(arraystep.GradientSharedStep):
 
         return hmc_step.end.q, [stats]
 
+    def _cached_logp_dlogp(self, q0):
+        """Return the logp and gradient of the last trajectory end if it is at `q0`."""
+        if self._end_state is None:
+            return None
+        # The logp also depends on variables of other step methods
+        if self._logp_dlogp_func._extra_vars:
+            return None
+        q_end, logp, dlogp = self._end_state
+        if not np.array_equal(q_end, q0):
+            return None
+        return logp, dlogp
+
     def reset_tuning(self, start=None):
         self.step_adapt.reset()
         self.reset(start=None)
 
     def reset(self, start=None):
         self.tune = True
+        self._end_state = None
         self.potential.reset()
 
     def warnings(self):
@@ -37,11 +37,18 @@ class CpuLeapfrogIntegrator:
                 "don't match." % (self._potential.dtype, self._dtype)
             )
 
-    def compute_state(self, q, p):
-        """Compute Hamiltonian functions using a position and momentum."""
+    def compute_state(self, q, p, logp_dlogp=None):
+        """Compute Hamiltonian functions using a position and momentum.
+
+        If `logp_dlogp` is given, it is used as the already known log
+        probability and gradient at `q` instead of evaluating the model.
+        """
         if q.dtype != self._dtype or p.dtype != self._dtype:
             raise ValueError("Invalid dtype. Must be %s" % self._dtype)
-        logp, dlogp = self._logp_dlogp_func(q)
+        if logp_dlogp is None:
+            logp, dlogp = self._logp_dlogp_func(q)
+        else:
+            logp, dlogp = logp_dlogp
         v = self._potential.velocity(p)
         kinetic = self._potential.energy(p, velocity=v)
         energy = kinetic - logp
@@ -145,6 +145,10 @@ class NUTS(BaseHMC):
             depth is reached.
         early_max_treedepth: int, default=8
             The maximum tree depth during the first 200 tuning samples.
+        reuse_end_state: bool, default=True
+            Whether the log probability and gradient at the end of a
+            trajectory are reused to start the next one, which saves one
+            gradient evaluation per draw.
         scaling: array_like, ndim = {1,2}
             The inverse mass, or precision matrix. One dimensional arrays are
             interpreted as diagonal matrices. If `is_cov` is set to True,
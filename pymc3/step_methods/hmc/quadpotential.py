@@ -12,6 +12,7 @@
 #   See the License for the specific language governing permissions and
 #   limitations under the License.
 
+import copy
 import warnings
 
 import numpy as np
@@ -30,6 +31,7 @@ __all__ = [
     "QuadPotentialFullInv",
     "QuadPotentialDiagAdapt",
     "QuadPotentialFullAdapt",
+    "QuadPotentialLowRankAdapt",
     "isquadpotential",
 ]
 
@@ -196,6 +198,7 @@ class QuadPotentialDiagAdapt(QuadPotential):
             self._n, self._initial_mean, self._initial_diag, self._initial_weight, self.dtype
         )
         self._background_var = _WeightedVariance(self._n, dtype=self.dtype)
+        self._pooled_var = None
         self._n_samples = 0
 
     def velocity(self, x, out=None):
@@ -224,6 +227,32 @@ class QuadPotentialDiagAdapt(QuadPotential):
         np.divide(1, self._stds, out=self._inv_stds)
         self._var_theano.set_value(self._var)
 
+    def _current_weightvar(self):
+        if self._pooled_var is None:
+            return self._foreground_var
+        combined = copy.deepcopy(self._foreground_var)
+        combined.add_variance(self._pooled_var)
+        return combined
+
+    @property
+    def weighted_variance(self):
+        """The running estimate of the variances of this chain."""
+        return self._foreground_var
+
+    def set_pooled_variance(self, pooled_var):
+        """Combine the variance estimate with the estimate of other chains.
+
+        The pooled estimate is added to the estimate of this chain until the
+        end of the current adaptation window or until it is replaced.
+
+        Parameters
+        ----------
+        pooled_var: _WeightedVariance or None
+            Variance estimate of the samples of other chains.
+        """
+        self._pooled_var = pooled_var
+        self._update_from_weightvar(self._current_weightvar())
+
     def update(self, sample, grad, tune):
         """Inform the potential about a new sample during tuning."""
         if not tune:
@@ -231,11 +260,12 @@ class QuadPotentialDiagAdapt(QuadPotential):
 
         self._foreground_var.add_sample(sample, weight=1)
         self._background_var.add_sample(sample, weight=1)
-        self._update_from_weightvar(self._foreground_var)
+        self._update_from_weightvar(self._current_weightvar())
 
         if self._n_samples > 0 and self._n_samples % self.adaptation_window == 0:
             self._foreground_var = self._background_var
             self._background_var = _WeightedVariance(self._n, dtype=self.dtype)
+            self._pooled_var = None
             self.adaptation_window = int(self.adaptation_window * self.adaptation_window_multiplier)
 
         self._n_samples += 1
@@ -328,6 +358,118 @@ class QuadPotentialDiagAdaptGrad(QuadPotentialDiagAdapt):
             self._grads2[:] = 1
 
 
+class QuadPotentialLowRankAdapt(QuadPotentialDiagAdapt):
+    """Adapt a diagonal plus low rank mass matrix.
+
+    The covariance of the posterior is approximated as
+    ``S (I + U (diag(lam) - 1) U^T) S``, where ``S`` contains the sample
+    standard deviations and the columns of ``U`` are the leading ``rank``
+    eigenvectors of the sample covariance of the standardized draws of the
+    previous adaptation window. The eigenvectors are computed from a thin
+    SVD of the stored draws, so that the cost of an update is linear in the
+    number of parameters, and velocity, energy and random momentum are
+    computed in O(n * rank).
+    """
+
+    def __init__(
+        self,
+        n,
+        initial_mean,
+        initial_diag=None,
+        initial_weight=0,
+        adaptation_window=101,
+        adaptation_window_multiplier=1,
+        rank=10,
+        dtype=None,
+    ):
+        """Set up a diagonal plus low rank mass matrix."""
+        if rank < 1:
+            raise ValueError("The rank of the low rank update must be at least one.")
+        self.rank = int(rank)
+        super().__init__(
+            n,
+            initial_mean,
+            initial_diag,
+            initial_weight,
+            adaptation_window,
+            adaptation_window_multiplier,
+            dtype,
+        )
+
+    def reset(self):
+        super().reset()
+        self._vecs = np.zeros((self._n, 0), dtype=self.dtype)
+        self._vals = np.zeros(0, dtype=self.dtype)
+        self._window_samples = []
+
+    def _compute_low_rank(self, samples):
+        samples = np.array(samples, dtype="d")
+        n_samples = len(samples)
+        if n_samples < 3:
+            return
+        stds = samples.std(axis=0)
+        if np.any(stds == 0) or not np.all(np.isfinite(stds)):
+            return
+        standardized = (samples - samples.mean(axis=0)) / stds
+        _, svals, vecs = np.linalg.svd(standardized, full_matrices=False)
+        rank = min(self.rank, len(svals))
+        vals = svals[:rank] ** 2 / (n_samples - 1)
+        # Shrink the eigenvalues towards one, like the regularization of
+        # the sample variances in Stan.
+        vals = (n_samples * vals + 5) / (n_samples + 5)
+
+        self._var[:] = stds ** 2
+        np.sqrt(self._var, out=self._stds)
+        np.divide(1, self._stds, out=self._inv_stds)
+        self._var_theano.set_value(self._var)
+        self._vecs = vecs[:rank].T.astype(self.dtype)
+        self._vals = vals.astype(self.dtype)
+
+    def velocity(self, x, out=None):
+        """Compute the current velocity at a position in parameter space."""
+        y = self._stds * x
+        y += self._vecs.dot((self._vals - 1) * self._vecs.T.dot(y))
+        return np.multiply(self._stds, y, out=out)
+
+    def energy(self, x, velocity=None):
+        """Compute kinetic energy at a position in parameter space."""
+        if velocity is None:
+            velocity = self.velocity(x)
+        return 0.5 * x.dot(velocity)
+
+    def random(self):
+        """Draw random value from QuadPotential."""
+        vals = normal(size=self._n).astype(self.dtype)
+        vals += self._vecs.dot((self._vals ** -0.5 - 1) * self._vecs.T.dot(vals))
+        return self._inv_stds * vals
+
+    def update(self, sample, grad, tune):
+        """Inform the potential about a new sample during tuning."""
+        if not tune:
+            return
+
+        self._foreground_var.add_sample(sample, weight=1)
+        self._background_var.add_sample(sample, weight=1)
+        self._window_samples.append(np.array(sample, copy=True))
+        self._update_from_weightvar(self._current_weightvar())
+
+        if self._n_samples > 0 and self._n_samples % self.adaptation_window == 0:
+            self._foreground_var = self._background_var
+            self._background_var = _WeightedVariance(self._n, dtype=self.dtype)
+            self._pooled_var = None
+            self._compute_low_rank(self._window_samples)
+            self._window_samples = []
+            self.adaptation_window = int(self.adaptation_window * self.adaptation_window_multiplier)
+
+        self._n_samples += 1
+
+    def _update_from_weightvar(self, weightvar):
+        if self._vals.size:
+            # Keep the diagonal consistent with the current eigenvectors
+            return
+        super()._update_from_weightvar(weightvar)
+
+
 class _WeightedVariance:
     """Online algorithm for computing mean of variance."""
 
@@ -360,6 +502,18 @@ class _WeightedVariance:
         new_diff = x - self.mean
         self.raw_var[:] += weight * old_diff * new_diff
 
+    def add_variance(self, other):
+        """Combine the estimate with the estimate of another set of samples."""
+        n_samples = self.n_samples + other.n_samples
+        if n_samples == 0:
+            return
+        delta = other.mean - self.mean
+        self.raw_var[:] += other.raw_var + delta ** 2 * (
+            self.n_samples * other.n_samples / n_samples
+        )
+        self.mean[:] += delta * (other.n_samples / n_samples)
+        self.n_samples = n_samples
+
     def current_variance(self, out=None):
         if self.n_samples == 0:
             raise ValueError("Can not compute variance without samples.")
@@ -56,6 +56,21 @@ class DualAverageAdaptation:
         self._log_bar = mk * self._log_step + (1 - mk) * self._log_bar
         self._count += 1
 
+    def pool(self, hbars, log_bars):
+        """Replace the adaptation state by the average of the states of several chains.
+
+        Parameters
+        ----------
+        hbars, log_bars: array_like
+            Running averages of the acceptance error and of the log step size
+            of the chains, including this one.
+        """
+        self._hbar = np.mean(hbars)
+        self._log_bar = np.mean(log_bars)
+        if self._count > 1:
+            # `_count` was already incremented after the last update
+            self._log_step = self._mu - self._hbar * np.sqrt(self._count - 1) / self._gamma
+
     def stats(self):
         return {
             "step_size": np.exp(self._log_step),
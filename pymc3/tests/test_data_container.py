@@ -12,6 +12,8 @@
 #   See the License for the specific language governing permissions and
 #   limitations under the License.
 
+from unittest import mock
+
 import numpy as np
 import pandas as pd
 import pytest
@@ -88,6 +90,46 @@ class TestData(SeededTest):
         np.testing.assert_allclose(x_test, y_test["obs"].mean(axis=0), atol=1e-1)
         np.testing.assert_allclose(x_test, y_test1["obs"].mean(axis=0), atol=1e-1)
 
+    def test_sample_posterior_predictive_on_datasets(self):
+        with pm.Model() as model:
+            x = pm.Data("x", [1.0, 2.0, 3.0])
+            y = pm.Data("y", [1.0, 2.0, 3.0])
+            beta = pm.Normal("beta", 0, 10.0)
+            pm.Normal("obs", beta * x, np.sqrt(1e-2), observed=y)
+        trace = [{"beta": 1.0}] * 100
+        datasets = [{"x": np.full(n, float(n)), "y": np.zeros(n)} for n in (2, 5, 2)]
+        with model:
+            y_test = pm.sample_posterior_predictive(trace, data=datasets, progressbar=False)
+            y_test1 = pm.fast_sample_posterior_predictive(trace, data=datasets)
+            y_single = pm.fast_sample_posterior_predictive(trace, data=datasets[1])
+        for samples in (y_test, y_test1):
+            assert [s["obs"].shape for s in samples] == [(100, 2), (100, 5), (100, 2)]
+            for n, s in zip((2, 5, 2), samples):
+                np.testing.assert_allclose(s["obs"].mean(), n, atol=1e-1)
+        assert y_single["obs"].shape == (100, 5)
+        # the data containers are restored
+        np.testing.assert_array_equal(x.get_value(), [1.0, 2.0, 3.0])
+        assert x.dshape == (3,)
+
+    def test_set_data_shape_change_reuses_functions(self):
+        with pm.Model() as model:
+            x = pm.Data("x", [1.0, 2.0, 3.0])
+            y = pm.Data("y", [1.0, 2.0, 3.0])
+            beta = pm.Normal("beta", 0, 10.0)
+            pm.Normal("obs", beta * x, 1.0, observed=y)
+        trace = [{"beta": 1.0}] * 10
+        with model:
+            pm.sample_posterior_predictive(trace, progressbar=False)
+            pm.set_data({"x": np.ones(7), "y": np.ones(7)})
+            assert x.dshape == (7,)
+            with mock.patch("theano.function", side_effect=AssertionError("recompiled")):
+                with mock.patch(
+                    "pymc3.distributions.distribution.function",
+                    side_effect=AssertionError("recompiled"),
+                ):
+                    ppc = pm.sample_posterior_predictive(trace, progressbar=False)
+        assert ppc["obs"].shape == (10, 7)
+
     def test_sample_after_set_data(self):
         with pm.Model() as model:
             x = pm.Data("x", [1.0, 2.0, 3.0])
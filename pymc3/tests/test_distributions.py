@@ -18,6 +18,7 @@ import sys
 import numpy as np
 import numpy.random as nr
 import pytest
+import scipy.sparse
 import scipy.stats
 import scipy.stats.distributions as sp
 import theano
@@ -35,6 +36,7 @@ import pymc3 as pm
 from pymc3.blocking import DictToVarBijection
 from pymc3.distributions import (
     AR1,
+    GMRF,
     AsymmetricLaplace,
     Bernoulli,
     Beta,
@@ -74,6 +76,7 @@ from pymc3.distributions import (
     Moyal,
     Multinomial,
     MvNormal,
+    MvNormalLowRank,
     MvStudentT,
     NegativeBinomial,
     Normal,
@@ -374,6 +377,16 @@ def matrix_normal_logpdf_chol(value, mu, rowchol, colchol):
     )
 
 
+def mvnormal_lowrank_logpdf(value, mu, diag, W):
+    cov = np.diag(diag) + np.dot(W, W.T)
+    return scipy.stats.multivariate_normal.logpdf(value, mu, cov).sum()
+
+
+def gmrf_logpdf(value, mu, tau, Q):
+    cov = np.linalg.inv(tau * Q.toarray())
+    return scipy.stats.multivariate_normal.logpdf(value, mu, cov).sum()
+
+
 def kron_normal_logpdf_cov(value, mu, covs, sigma):
     cov = kronecker(*covs).eval()
     if sigma is not None:
@@ -1706,6 +1719,66 @@ class TestMatchesScipy:
             scipy_args=evd_args,
         )
 
+    @pytest.mark.parametrize("n", [1, 2, 3])
+    def test_mvnormallowrank(self, n):
+        mu = Domain([np.zeros(n), np.linspace(-1, 1, n)], edges=(None, None))
+        diag = Domain([np.full(n, 0.1), np.linspace(0.5, 2, n)], edges=(None, None))
+        params = {"mu": mu, "diag": diag, "W": RealMatrix(n, 2)}
+        self.check_logp(MvNormalLowRank, Vector(R, n), params, mvnormal_lowrank_logpdf)
+        self.check_logp(MvNormalLowRank, RealMatrix(5, n), params, mvnormal_lowrank_logpdf)
+
+    def test_mvnormallowrank_invalid_diag(self):
+        with Model():
+            x = MvNormalLowRank("x", mu=np.zeros(3), diag=-np.ones(3), W=np.ones((3, 1)), shape=3)
+            assert x.logp({"x": np.zeros(3)}) == -np.inf
+
+    @pytest.mark.parametrize("n", [2, 3])
+    def test_gmrf(self, n):
+        W = scipy.sparse.diags([np.ones(n - 1), np.ones(n - 1)], [-1, 1])
+        Q = scipy.sparse.diags(np.full(n, 2.0)) - 0.5 * W
+        mu = Domain([np.zeros(n), np.linspace(-1, 1, n)], edges=(None, None))
+        for value in [Vector(R, n), RealMatrix(5, n)]:
+            self.check_logp(
+                GMRF,
+                value,
+                {"mu": mu, "tau": Rplus},
+                gmrf_logpdf,
+                extra_args={"Q": Q},
+                scipy_args={"Q": Q},
+            )
+        # The CAR precision of a graph
+        Q_car = scipy.sparse.diags(np.asarray(W.sum(axis=1)).ravel()) - 0.9 * W
+        self.check_logp(
+            GMRF,
+            Vector(R, n),
+            {"mu": mu, "tau": Rplus},
+            gmrf_logpdf,
+            extra_args={"W": W, "alpha": 0.9},
+            scipy_args={"Q": Q_car},
+        )
+
+    def test_gmrf_init_fail(self):
+        W = scipy.sparse.diags([np.ones(2), np.ones(2)], [-1, 1])
+        with Model():
+            with pytest.raises(ValueError):
+                GMRF("x", mu=np.zeros(3), shape=3)
+            with pytest.raises(ValueError):
+                GMRF("x", mu=np.zeros(3), Q=np.eye(3), W=W, alpha=0.5, shape=3)
+            with pytest.raises(ValueError):
+                GMRF("x", mu=np.zeros(3), W=W, alpha=1.0, shape=3)
+            with pytest.raises(ValueError):
+                GMRF("x", mu=np.zeros(3), Q=np.triu(np.ones((3, 3))), shape=3)
+            with pytest.raises(ValueError):
+                GMRF("x", mu=np.zeros(3), Q=-np.eye(3), shape=3)
+
+    def test_gmrf_factor_cache_bound(self):
+        multivariate = pm.distributions.multivariate
+        with Model():
+            for i in range(multivariate.MAX_CACHED_FACTORS + 2):
+                GMRF(f"x{i}", mu=np.zeros(3), Q=scipy.sparse.eye(3) * (i + 1), shape=3)
+        cache = multivariate._sparse_precision_factor.cache
+        assert len(cache) == multivariate.MAX_CACHED_FACTORS
+
     @pytest.mark.parametrize("n", [1, 2])
     def test_mvt(self, n):
         self.check_logp(
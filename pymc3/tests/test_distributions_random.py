@@ -21,6 +21,7 @@ import numpy as np
 import numpy.random as nr
 import numpy.testing as npt
 import pytest
+import scipy.sparse
 import scipy.stats as st
 import theano
 
@@ -156,6 +157,25 @@ class TestDrawValues(SeededTest):
         npt.assert_almost_equal(mu2, 5)
         npt.assert_almost_equal(tau2, 1 / 2.0 ** 2)
 
+    def test_named_node_tree_is_reused(self, monkeypatch):
+        with pm.Model():
+            mu = pm.Normal("mu", mu=0.0, tau=1e-3)
+            y = pm.Normal("y", mu=mu, sigma=1.0)
+            exp_y = pm.Deterministic("exp_y", pm.math.exp(y))
+
+        n_builds = []
+        build_named_node_tree = pm.distributions.distribution.build_named_node_tree
+
+        def counting_build(graphs):
+            n_builds.append(1)
+            return build_named_node_tree(graphs)
+
+        monkeypatch.setattr(pm.distributions.distribution, "build_named_node_tree", counting_build)
+        for value in [1.0, 2.0]:
+            y_draw, exp_y_draw = draw_values([y, exp_y], point={"mu": value})
+            npt.assert_almost_equal(np.exp(y_draw), exp_y_draw)
+        assert len(n_builds) == 1
+
     def test_random_sample_returns_nd_array(self):
         with pm.Model():
             mu = pm.Normal("mu", mu=0.0, tau=1e-3)
@@ -998,6 +1018,42 @@ class TestScalarParameterSamples(SeededTest):
                 model_args=evd_args,
             )
 
+    def test_mv_normal_lowrank(self):
+        def ref_rand(size, mu, diag, W):
+            cov = np.diag(diag) + np.dot(W, W.T)
+            return st.multivariate_normal.rvs(mean=mu, cov=cov, size=size)
+
+        for n in [2, 3]:
+            pymc3_random(
+                pm.MvNormalLowRank,
+                {
+                    "mu": Vector(R, n),
+                    "diag": Domain([np.full(n, 0.1), np.linspace(0.5, 2, n)], edges=(None, None)),
+                    "W": RealMatrix(n, 2),
+                },
+                size=100,
+                valuedomain=Vector(R, n),
+                ref_rand=ref_rand,
+            )
+
+    def test_gmrf(self):
+        def ref_rand(size, mu, tau, Q):
+            cov = np.linalg.inv(tau * Q.toarray())
+            return st.multivariate_normal.rvs(mean=mu, cov=cov, size=size)
+
+        for n in [2, 3]:
+            W = scipy.sparse.diags([np.ones(n - 1), np.ones(n - 1)], [-1, 1])
+            Q = scipy.sparse.diags(np.full(n, 2.0)) - 0.5 * W
+            pymc3_random(
+                pm.GMRF,
+                {"mu": Vector(R, n), "tau": Rplus},
+                size=100,
+                valuedomain=Vector(R, n),
+                ref_rand=ref_rand,
+                extra_args={"Q": Q},
+                model_args={"Q": Q},
+            )
+
     def test_mv_t(self):
         def ref_rand(size, nu, Sigma, mu):
             normal = st.multivariate_normal.rvs(cov=Sigma, size=size)
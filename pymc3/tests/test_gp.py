@@ -451,6 +451,41 @@ class TestExpQuad:
         Kd = theano.function([], cov(X, diag=True))()
         npt.assert_allclose(np.diag(K), Kd, atol=1e-5)
 
+    @pytest.mark.parametrize("ls", [0.5, np.array([0.5, 2.0])])
+    def test_constant_inputs(self, ls, monkeypatch):
+        X = np.random.rand(6, 2)
+        Xs = np.random.rand(4, 2)
+        cov = pm.gp.cov.ExpQuad(2, theano.shared(ls))
+        sqd = np.square(X[:, None, :] - Xs[None, :, :])
+        if np.ndim(ls) == 0:
+            sqd = sqd.sum(-1)
+
+        def has_cached_dist(f):
+            return any(
+                isinstance(var, tt.TensorConstant)
+                and var.data.shape == sqd.shape
+                and np.allclose(var.data, sqd)
+                for var in f.maker.fgraph.variables
+            )
+
+        # the distances between constant inputs are cached and only scaled in the graph
+        f = theano.function([], cov(X, Xs))
+        assert has_cached_dist(f)
+        K = cov(theano.shared(X), theano.shared(Xs)).eval()
+        npt.assert_allclose(f(), K, rtol=1e-10)
+        npt.assert_allclose(cov(X).eval(), cov(theano.shared(X)).eval(), rtol=1e-10)
+        # large per column distances are not embedded in the graph
+        monkeypatch.setattr(pm.gp.cov, "MAX_CACHED_DIST_SIZE", 0)
+        f = theano.function([], cov(X, Xs))
+        assert has_cached_dist(f) == (np.ndim(ls) == 0)
+        npt.assert_allclose(f(), K, rtol=1e-10)
+
+    def test_constant_inputs_cache_bound(self):
+        cov = pm.gp.cov.ExpQuad(1, 0.5)
+        for _ in range(pm.gp.cov.MAX_CACHED_DISTS + 2):
+            cov(np.random.rand(3, 1))
+        assert len(pm.gp.cov._constant_square_dist.cache) == pm.gp.cov.MAX_CACHED_DISTS
+
 
 class TestWhiteNoise:
     def test_1d(self):
@@ -812,6 +847,160 @@ class TestMarginalVsLatent:
         npt.assert_allclose(latent_logp, self.logp, atol=5)
 
 
+class TestMarginalCG:
+    R"""
+    Compare Marginal with the conjugate gradient solver to the Cholesky solver.
+    """
+
+    def setup_method(self):
+        self.X = np.random.rand(100, 2) * 3
+        self.y = np.random.randn(100)
+        self.Xnew = np.random.rand(10, 2) * 3
+
+    def build(self, **kwargs):
+        with pm.Model() as model:
+            ls = pm.Gamma("ls", alpha=2, beta=2, testval=0.7)
+            sigma = pm.HalfNormal("sigma", testval=0.3)
+            cov_func = pm.gp.cov.ExpQuad(2, ls=ls)
+            gp = pm.gp.Marginal(pm.gp.mean.Constant(0.5), cov_func)
+            gp.marginal_likelihood("f", self.X, self.y, noise=sigma, **kwargs)
+        return model, gp
+
+    def testMarginalCGvsCholesky(self):
+        model, gp = self.build()
+        cg_model, cg_gp = self.build(solver="cg", solver_kwargs={"n_probes": 50})
+        point = model.test_point
+        # the log-determinant of few data points is exact, with a matching gradient
+        npt.assert_allclose(cg_model.logp(point), model.logp(point), rtol=1e-5)
+        npt.assert_allclose(cg_model.dlogp()(point), model.dlogp()(point), rtol=1e-4)
+        # the separate gradient estimate is reported when the model is built
+        with pytest.warns(UserWarning, match="ADVI"):
+            slq_model, _ = self.build(solver="cg", solver_kwargs={"n_probes": 50, "exact_size": 0})
+        npt.assert_allclose(slq_model.logp(point), model.logp(point), rtol=1e-2)
+
+        mu, var = gp.predict(self.Xnew, point=point, diag=True)
+        cg_mu, cg_var = cg_gp.predict(self.Xnew, point=point, diag=True)
+        npt.assert_allclose(cg_mu, mu, rtol=1e-4)
+        npt.assert_allclose(cg_var, var, rtol=1e-4, atol=1e-6)
+        mu, cov = gp.predict(self.Xnew, point=point, pred_noise=True)
+        cg_mu, cg_cov = cg_gp.predict(self.Xnew, point=point, pred_noise=True)
+        npt.assert_allclose(cg_cov, cov, rtol=1e-4, atol=1e-6)
+
+    def testMarginalCGRaises(self):
+        with pytest.raises(ValueError):
+            self.build(solver="lu")
+
+
+class TestPredictTrace:
+    R"""
+    Compare predict_trace to predict at each draw of a trace.
+    """
+
+    def setup_method(self):
+        self.X = np.random.rand(30, 2) * 3
+        self.y = np.random.randn(30)
+        self.Xnew = np.random.rand(8, 2) * 3
+        self.trace = {
+            "ls_log__": np.log(np.random.rand(7) + 0.5),
+            "sigma_log__": np.log(np.random.rand(7) * 0.5 + 0.1),
+        }
+
+    def build(self, sparse):
+        with pm.Model() as model:
+            ls = pm.Gamma("ls", alpha=2, beta=2)
+            sigma = pm.HalfNormal("sigma")
+            cov_func = pm.gp.cov.ExpQuad(2, ls=ls)
+            if sparse:
+                gp = pm.gp.MarginalSparse(pm.gp.mean.Constant(0.5), cov_func)
+                gp.marginal_likelihood("f", self.X, self.X[::3], self.y, noise=sigma)
+            else:
+                gp = pm.gp.Marginal(pm.gp.mean.Constant(0.5), cov_func)
+                gp.marginal_likelihood("f", self.X, self.y, noise=sigma)
+        return model, gp
+
+    def points(self):
+        for i in range(7):
+            yield {name: values[i] for name, values in self.trace.items()}
+
+    @pytest.mark.parametrize("sparse", [False, True])
+    def testPredictTraceVar(self, sparse):
+        model, gp = self.build(sparse)
+        mus, variances = gp.predict_trace(self.Xnew, self.trace, chunk_size=3, model=model)
+        assert mus.shape == variances.shape == (7, 8)
+        for mu_i, var_i, point in zip(mus, variances, self.points()):
+            mu, var = gp.predict(self.Xnew, point=point, diag=True)
+            npt.assert_allclose(mu_i, mu, rtol=1e-5)
+            npt.assert_allclose(var_i, var, rtol=1e-5)
+
+    def testPredictTraceCov(self):
+        model, gp = self.build(False)
+        with model:
+            mus, covs = gp.predict_trace(
+                self.Xnew, self.trace, diag=False, pred_noise=True, cores=2
+            )
+        assert covs.shape == (7, 8, 8)
+        for mu_i, cov_i, point in zip(mus, covs, self.points()):
+            mu, cov = gp.predict(self.Xnew, point=point, pred_noise=True)
+            npt.assert_allclose(mu_i, mu, rtol=1e-5)
+            npt.assert_allclose(cov_i, cov, rtol=1e-5)
+
+    def testPredictTraceRaises(self):
+        model, gp = self.build(False)
+        with pytest.raises(ValueError):
+            gp.predict_trace(self.Xnew, {"ls_log__": self.trace["ls_log__"]}, model=model)
+
+
+class TestMarginalToeplitz:
+    R"""
+    Compare MarginalToeplitz with Marginal on an evenly spaced grid.
+    """
+
+    def setup_method(self):
+        self.X = np.linspace(0, 5, 40)[:, None]
+        self.y = np.random.randn(40)
+        self.Xnew = np.random.rand(10, 1) * 6.0
+        self.pnew = np.random.randn(10)
+
+    def build(self, gp_class):
+        with pm.Model() as model:
+            ls = pm.Gamma("ls", alpha=2, beta=2, testval=0.7)
+            sigma = pm.HalfNormal("sigma", testval=0.3)
+            cov_func = 1.5 * pm.gp.cov.Matern32(1, ls=ls)
+            mean_func = pm.gp.mean.Constant(0.5)
+            gp = gp_class(mean_func, cov_func)
+            gp.marginal_likelihood("f", self.X, self.y, noise=sigma)
+            gp.conditional("p", self.Xnew, pred_noise=True)
+        return model, gp
+
+    def testMarginalToeplitzvsMarginal(self):
+        model, _ = self.build(pm.gp.Marginal)
+        tmodel, _ = self.build(pm.gp.MarginalToeplitz)
+        point = model.test_point
+        point["p"] = self.pnew
+        npt.assert_allclose(tmodel.logp(point), model.logp(point), rtol=1e-5)
+        npt.assert_allclose(tmodel.dlogp()(point), model.dlogp()(point), rtol=1e-4)
+
+    def testMarginalToeplitzvsMarginalpredict(self):
+        model, gp = self.build(pm.gp.Marginal)
+        tmodel, tgp = self.build(pm.gp.MarginalToeplitz)
+        point = model.test_point
+        mu1, var1 = gp.predict(self.Xnew, point=point, diag=True)
+        mu2, var2 = tgp.predict(self.Xnew, point=point, diag=True)
+        npt.assert_allclose(mu1, mu2, rtol=1e-4)
+        npt.assert_allclose(var1, var2, rtol=1e-4)
+        with tmodel:
+            prior = pm.sample_prior_predictive(3, var_names=["f"])
+        assert prior["f"].shape == (3, 40)
+
+    def testMarginalToeplitzRaises(self):
+        with pm.Model():
+            gp = pm.gp.MarginalToeplitz(cov_func=pm.gp.cov.ExpQuad(1, ls=1.0))
+            with pytest.raises(ValueError):
+                gp.marginal_likelihood("f", np.random.rand(10, 1), np.zeros(10), noise=0.1)
+            with pytest.raises(TypeError):
+                gp.marginal_likelihood("f", self.X, self.y, noise=pm.gp.cov.WhiteNoise(0.1))
+
+
 class TestMarginalVsMarginalSparse:
     R"""
     Compare logp of models Marginal and MarginalSparse.
@@ -1220,3 +1409,164 @@ class TestCircular:
         # check diagonal
         Kd = theano.function([], cov(X, diag=True))()
         npt.assert_allclose(np.diag(K), Kd, atol=1e-5)
+
+
+class TestHSGP:
+    def setup_method(self):
+        self.X = np.linspace(0, 10, 100)[:, None]
+
+    @pytest.mark.parametrize(
+        "cov_class, atol",
+        [(pm.gp.cov.ExpQuad, 1e-6), (pm.gp.cov.Matern52, 1e-3), (pm.gp.cov.Matern32, 1e-2)],
+    )
+    def test_approximates_cov(self, cov_class, atol):
+        with pm.Model():
+            cov_func = 2.0 * cov_class(1, ls=1.5)
+            gp = pm.gp.HSGP(m=[100], c=2.0, cov_func=cov_func)
+            gp.prior("f", X=self.X)
+        phi, sqrt_psd = gp._build_basis(self.X)
+        K = tt.dot(phi * tt.square(sqrt_psd), phi.T).eval()
+        npt.assert_allclose(K, cov_func(self.X).eval(), atol=atol)
+
+    def test_approximates_cov_2d(self):
+        X = np.random.rand(30, 2) * 4
+        with pm.Model():
+            cov_func = pm.gp.cov.ExpQuad(2, ls=[1.0, 2.0])
+            gp = pm.gp.HSGP(m=[25, 20], L=[5.0, 5.0], cov_func=cov_func)
+            gp.prior("f", X=X)
+        phi, sqrt_psd = gp._build_basis(X)
+        K = tt.dot(phi * tt.square(sqrt_psd), phi.T).eval()
+        npt.assert_allclose(K, cov_func(X).eval(), atol=0.02)
+
+    def test_conditional(self):
+        with pm.Model() as model:
+            mean_func = pm.gp.mean.Constant(1.0)
+            gp = pm.gp.HSGP(m=[20], c=1.5, mean_func=mean_func, cov_func=pm.gp.cov.Matern52(1, 1.0))
+            f = gp.prior("f", X=self.X)
+            fcond = gp.conditional("fcond", self.X)
+        assert model["f_coeffs_"].tag.test_value.shape == (20,)
+        point = {"f_coeffs_": np.random.randn(20)}
+        f_val, fcond_val = model.fastfn([f, fcond])(point)
+        npt.assert_allclose(f_val, fcond_val)
+
+    def test_raises(self):
+        cov_func = pm.gp.cov.ExpQuad(1, ls=1.0)
+        with pytest.raises(ValueError):
+            pm.gp.HSGP(m=[10], cov_func=cov_func)
+        with pytest.raises(ValueError):
+            pm.gp.HSGP(m=[10], L=[5.0], c=1.5, cov_func=cov_func)
+        with pytest.raises(ValueError):
+            pm.gp.HSGP(m=[10, 10], c=1.5, cov_func=cov_func)
+        with pytest.raises(NotImplementedError):
+            pm.gp.cov.Cosine(1, ls=1.0).power_spectral_density(np.ones((3, 1)))
+
+
+class TestSVGP:
+    def setup_method(self):
+        self.X = np.random.rand(100, 1) * 5
+        self.y = np.sin(self.X[:, 0]) + 0.1 * np.random.randn(100)
+        self.Xu = np.linspace(0, 5, 8)[:, None]
+
+    def test_marginal_likelihood(self):
+        with pm.Model() as model:
+            gp = pm.gp.SVGP(cov_func=pm.gp.cov.ExpQuad(1, ls=1.0))
+            gp.marginal_likelihood("y", self.X, self.Xu, self.y, noise=0.3)
+        v = np.random.randn(8)
+        K = pm.gp.cov.ExpQuad(1, ls=1.0)
+        L = np.linalg.cholesky(K(self.Xu).eval() + 1e-6 * np.eye(8))
+        A = np.linalg.solve(L, K(self.Xu, self.X).eval())
+        f = np.dot(A.T, v)
+        expected = (
+            np.sum(-0.5 * np.log(2.0 * np.pi * 0.09) - 0.5 * np.square(self.y - f) / 0.09)
+            - 0.5 * np.sum(1.0 - np.sum(np.square(A), 0)) / 0.09
+            + np.sum(-0.5 * np.log(2.0 * np.pi) - 0.5 * np.square(v))
+        )
+        npt.assert_allclose(model.logp({"y_u_rotated_": v}), expected, rtol=1e-6)
+
+    def test_minibatch(self):
+        X_batch = pm.Minibatch(self.X, batch_size=20)
+        y_batch = pm.Minibatch(self.y, batch_size=20)
+        with pm.Model() as model:
+            gp = pm.gp.SVGP(cov_func=pm.gp.cov.ExpQuad(1, ls=1.0))
+            gp.marginal_likelihood("y", X_batch, 6, y_batch, noise=0.3, total_size=100)
+        # the inducing points are placed by K-means on all inputs
+        Xu = gp.Xu.eval()
+        assert Xu.shape == (6, 1)
+        assert np.all((Xu >= self.X.min()) & (Xu <= self.X.max()))
+        logp_elemwise = model.fastfn(model.observed_RVs[0].logp_elemwiset)(model.test_point)
+        assert logp_elemwise.shape == (20,)
+        with model:
+            approx = pm.fit(10, method="fullrank_advi", progressbar=False)
+        assert np.isfinite(approx.hist).all()
+
+    def test_conditional(self):
+        with pm.Model() as model:
+            mean_func = pm.gp.mean.Constant(0.5)
+            gp = pm.gp.SVGP(mean_func=mean_func, cov_func=pm.gp.cov.Matern52(1, ls=1.0))
+            f = gp.prior("f", self.X, self.Xu)
+            fcond = gp.conditional("fcond", self.Xu)
+        point = {"f_u_rotated_": np.random.randn(8), "fcond": np.zeros(8)}
+        # the GP interpolates the inducing values at the inducing points
+        u = model.fastfn(gp.u)(point)
+        mu, var = gp.predict(self.Xu, point=point, diag=True)
+        npt.assert_allclose(mu, u, atol=1e-4)
+        npt.assert_allclose(var, 0.0, atol=1e-4)
+        # so does the conditional distribution
+        assert fcond.logp(dict(point, fcond=u)) > fcond.logp(dict(point, fcond=u + 0.1))
+        assert model.fastfn(f)(point).shape == (100,)
+        with pytest.raises(TypeError):
+            gp + gp
+
+
+class TestStateSpace:
+    R"""
+    Compare StateSpace with Marginal on unsorted one dimensional inputs.
+    """
+
+    def setup_method(self):
+        self.X = np.random.rand(40, 1) * 10
+        self.y = np.sin(self.X[:, 0]) + 0.1 * np.random.randn(40)
+        self.Xnew = np.random.rand(8, 1) * 12
+
+    def build(self, gp_class, cov_class):
+        with pm.Model() as model:
+            ls = pm.Gamma("ls", alpha=2, beta=1, testval=1.3)
+            eta = pm.HalfNormal("eta", testval=1.2)
+            sigma = pm.HalfNormal("sigma", testval=0.3)
+            cov_func = eta ** 2 * cov_class(1, ls=ls)
+            gp = gp_class(pm.gp.mean.Constant(0.2), cov_func)
+            gp.marginal_likelihood("f", self.X, self.y, noise=sigma)
+        return model, gp
+
+    @pytest.mark.parametrize("cov_class", [pm.gp.cov.Matern32, pm.gp.cov.Matern52])
+    def testStateSpacevsMarginal(self, cov_class):
+        model, gp = self.build(pm.gp.Marginal, cov_class)
+        smodel, sgp = self.build(pm.gp.StateSpace, cov_class)
+        point = model.test_point
+        npt.assert_allclose(smodel.logp(point), model.logp(point), rtol=1e-6)
+        npt.assert_allclose(smodel.dlogp()(point), model.dlogp()(point), rtol=1e-5)
+        mu1, var1 = gp.predict(self.Xnew, point=point, diag=True, pred_noise=True)
+        mu2, var2 = sgp.predict(self.Xnew, point=point, pred_noise=True)
+        npt.assert_allclose(mu1, mu2, rtol=1e-4, atol=1e-5)
+        npt.assert_allclose(var1, var2, rtol=1e-4, atol=1e-5)
+
+    def testStateSpaceSum(self):
+        # Exponential and Matern12 covariances are evaluated at distances
+        # offset by a small constant, which limits the agreement
+        cov_func = pm.gp.cov.Matern52(1, ls=1.5) + 0.5 * pm.gp.cov.Exponential(1, ls=2.0)
+        A, P_inf, h = cov_func.state_space(np.array([0.0, 0.4, 2.5]))
+        k = np.einsum("i,nij,jk,k->n", h, A.eval(), P_inf.eval(), h)
+        X = np.array([[0.0], [0.0], [0.4], [2.5]])
+        npt.assert_allclose(k, cov_func(X).eval()[0, 1:], rtol=1e-5)
+
+    def testStateSpaceRaises(self):
+        with pm.Model():
+            gp = pm.gp.StateSpace(cov_func=pm.gp.cov.Matern32(1, ls=1.0))
+            with pytest.raises(ValueError):
+                gp.marginal_likelihood("f", np.random.rand(10, 2), np.zeros(10), noise=0.1)
+            with pytest.raises(TypeError):
+                gp.marginal_likelihood("f", self.X, self.y, noise=pm.gp.cov.WhiteNoise(0.1))
+        with pytest.raises(NotImplementedError):
+            pm.gp.cov.ExpQuad(1, ls=1.0).state_space(np.ones(3))
+        with pytest.raises(NotImplementedError):
+            pm.gp.cov.Matern32(2, ls=1.0).state_space(np.ones(3))
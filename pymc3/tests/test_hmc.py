@@ -57,3 +57,31 @@ def test_nuts_tuning():
 
     assert not step.tune
     assert np.all(trace["step_size"][5:] == trace["step_size"][5])
+
+
+def test_nuts_reuse_end_state():
+    def sample(reuse_end_state):
+        with pymc3.Model():
+            pymc3.Normal("a", shape=2)
+            step = pymc3.NUTS(reuse_end_state=reuse_end_state)
+        func = step.integrator._logp_dlogp_func
+        n_calls = []
+
+        def counting_func(*args, **kwargs):
+            n_calls.append(1)
+            return func(*args, **kwargs)
+
+        step.integrator._logp_dlogp_func = counting_func
+        func.set_extra_values({})
+        np.random.seed(2313)
+        q = floatX(np.zeros(2))
+        draws = []
+        for _ in range(20):
+            q, _ = step.astep(q)
+            draws.append(q)
+        return np.array(draws), len(n_calls)
+
+    draws, n_calls = sample(True)
+    draws_no_reuse, n_calls_no_reuse = sample(False)
+    npt.assert_allclose(draws, draws_no_reuse)
+    assert n_calls == n_calls_no_reuse - 19
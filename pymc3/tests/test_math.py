@@ -18,13 +18,22 @@ import pytest
 import theano
 import theano.tensor as tt
 
+from scipy.linalg import toeplitz
 from scipy.special import logsumexp as scipy_logsumexp
+from scipy.stats import multivariate_normal
 
 from pymc3.math import (
+    CGSolve,
     LogDet,
+    SLQLogDet,
     cartesian,
     expand_packed_triangular,
     invprobit,
+    kalman_filter,
+    kalman_smoother,
+    khatri_rao,
+    khatri_rao_dot,
+    khatri_rao_gram,
     kron_dot,
     kron_solve_lower,
     kronecker,
@@ -34,6 +43,9 @@ from pymc3.math import (
     logdet,
     logsumexp,
     probit,
+    slq_logdet,
+    toeplitz_logdet,
+    toeplitz_solve,
 )
 from pymc3.tests.helpers import SeededTest, verify_grad
 from pymc3.theanof import floatX
@@ -104,6 +116,28 @@ def test_kron_solve_lower():
     np.testing.assert_array_almost_equal(slow_ans.eval(), fast_ans.eval())
 
 
+def test_khatri_rao():
+    np.random.seed(1)
+    Bs = [np.random.rand(n, 4) for n in (2, 3, 4)]
+    # Build column by column from the full kronecker products
+    slow_ans = np.stack(
+        [np.kron(np.kron(Bs[0][:, j], Bs[1][:, j]), Bs[2][:, j]) for j in range(4)], 1
+    )
+    np.testing.assert_array_almost_equal(slow_ans, khatri_rao(*Bs).eval())
+
+
+@pytest.mark.parametrize("n_factors", [1, 3])
+def test_khatri_rao_dot_and_gram(n_factors):
+    np.random.seed(1)
+    Bs = [np.random.rand(n, 4) for n in (2, 3, 4)[:n_factors]]
+    tot_size = np.prod([B.shape[0] for B in Bs])
+    v = np.random.rand(tot_size)
+    # Construct the entire khatri-rao product then multiply
+    big = khatri_rao(*Bs).eval()
+    np.testing.assert_array_almost_equal(np.dot(v, big), khatri_rao_dot(Bs, v).eval())
+    np.testing.assert_array_almost_equal(np.dot(big.T * v, big), khatri_rao_gram(Bs, v).eval())
+
+
 def test_probit():
     p = np.array([0.01, 0.25, 0.5, 0.75, 0.99])
     np.testing.assert_allclose(invprobit(probit(p)).eval(), p, atol=1e-5)
@@ -196,6 +230,151 @@ class TestLogDet(SeededTest):
         self.validate(test_case_2.astype(theano.config.floatX))
 
 
+class TestToeplitz(SeededTest):
+    def setup_method(self):
+        super().setup_method()
+        x = np.linspace(0, 3, 12)
+        self.r = floatX(np.exp(-0.5 * x ** 2) + 0.2 * (x == 0))
+
+    @theano.config.change_flags(compute_test_value="ignore")
+    def test_logdet(self):
+        r = tt.vector()
+        out = theano.function([r], toeplitz_logdet(r))(self.r)
+        npt.assert_allclose(out, np.linalg.slogdet(toeplitz(self.r))[1], rtol=1e-5)
+        verify_grad(toeplitz_logdet, [self.r])
+
+    @theano.config.change_flags(compute_test_value="ignore")
+    def test_logdet_not_positive_definite(self):
+        r = tt.vector()
+        out = theano.function([r], toeplitz_logdet(r))(floatX([1.0, 2.0, 0.0]))
+        assert np.isinf(out)
+
+    @theano.config.change_flags(compute_test_value="ignore")
+    @pytest.mark.parametrize("shape", [(12,), (12, 3)])
+    def test_solve(self, shape):
+        b_val = floatX(np.random.randn(*shape))
+        r = tt.vector()
+        b = tt.TensorType(theano.config.floatX, (False,) * len(shape))()
+        out = theano.function([r, b], toeplitz_solve(r, b))(self.r, b_val)
+        npt.assert_allclose(out, np.linalg.solve(toeplitz(self.r), b_val), rtol=1e-5)
+        verify_grad(toeplitz_solve, [self.r, b_val])
+
+
+class TestIterativeSolvers(SeededTest):
+    def setup_method(self):
+        super().setup_method()
+        x = np.sort(np.random.rand(60)) * 5
+        self.A = floatX(np.exp(-0.5 * (x[:, None] - x) ** 2) + 0.1 * np.eye(60))
+
+    @theano.config.change_flags(compute_test_value="ignore")
+    @pytest.mark.parametrize("precond_rank", [0, 10])
+    def test_cg_solve(self, precond_rank):
+        # a tight tolerance, so that finite differences of the solution are accurate
+        op = CGSolve(tol=1e-13, precond_rank=precond_rank)
+        b_val = floatX(np.random.randn(60, 2))
+        A = tt.matrix()
+        b = tt.matrix()
+        out = theano.function([A, b], op(A, b))(self.A, b_val)
+        npt.assert_allclose(out, np.linalg.solve(self.A, b_val), rtol=1e-5, atol=1e-6)
+        # the gradient is taken with respect to symmetric matrices
+        verify_grad(lambda M, b: op(0.5 * (M + M.T), b), [self.A[:8, :8], b_val[:8]])
+
+    @theano.config.change_flags(compute_test_value="ignore")
+    def test_slq_logdet(self):
+        A = tt.matrix()
+        slq = SLQLogDet(exact_size=0)
+        f = theano.function([A], [slq(A), theano.grad(slq(A), A)])
+        logdet, grad = f(self.A)
+        npt.assert_allclose(logdet, np.linalg.slogdet(self.A)[1], rtol=0.02)
+        # the gradient is an unbiased estimate of the inverse
+        v = np.random.randn(60)
+        npt.assert_allclose(v @ grad @ v, v @ np.linalg.inv(self.A) @ v, rtol=0.5)
+        assert np.isinf(f(floatX(np.diag([1.0, -1.0])))[0])
+
+    def test_slq_logdet_exact(self):
+        # small matrices are factorized, so that the gradient matches the value
+        A = tt.matrix()
+        f = theano.function([A], [slq_logdet(A), theano.grad(slq_logdet(A), A)])
+        logdet, grad = f(self.A)
+        npt.assert_allclose(logdet, np.linalg.slogdet(self.A)[1], rtol=1e-5)
+        npt.assert_allclose(grad, np.linalg.inv(self.A), rtol=1e-4, atol=1e-6)
+        assert np.isinf(f(floatX(np.diag([1.0, -1.0])))[0])
+        verify_grad(lambda X: slq_logdet(X + X.T), [floatX(self.A / 2)])
+
+
+class TestKalmanFilter(SeededTest):
+    def setup_method(self):
+        super().setup_method()
+        n, p = 12, 2
+        self.A = floatX(np.array([[0.9, 0.2], [-0.3, 0.7]]))
+        self.Q = floatX(np.array([[0.3, 0.1], [0.1, 0.2]]))
+        self.h = floatX(np.array([1.0, 0.5]))
+        self.m0 = floatX(np.array([0.5, -0.2]))
+        self.P0 = floatX(np.eye(p))
+        self.y = floatX(np.random.randn(n))
+        # the joint distribution of the states
+        means, covs = [], []
+        m, P = self.m0, self.P0
+        for _ in range(n):
+            m = self.A @ m
+            P = self.A @ P @ self.A.T + self.Q
+            means.append(m)
+            covs.append(P)
+        C = np.zeros((n * p, n * p))
+        for k in range(n):
+            for j in range(k + 1):
+                C_kj = np.linalg.matrix_power(self.A, k - j) @ covs[j]
+                C[k * p : (k + 1) * p, j * p : (j + 1) * p] = C_kj
+                C[j * p : (j + 1) * p, k * p : (k + 1) * p] = C_kj.T
+        self.H = np.kron(np.eye(n), self.h)
+        self.mean = np.concatenate(means)
+        self.C = C
+        self.n = n
+
+    def filter(self, **kwargs):
+        A = np.tile(self.A, (self.n, 1, 1))
+        Q = np.tile(self.Q, (self.n, 1, 1))
+        return kalman_filter(self.y, A, Q, self.h, 0.4, self.m0, self.P0, **kwargs)
+
+    @theano.config.change_flags(compute_test_value="ignore")
+    def test_logp(self):
+        logp = self.filter()[0].eval()
+        S = self.H @ self.C @ self.H.T + 0.4 * np.eye(self.n)
+        expected = multivariate_normal(self.H @ self.mean, S).logpdf(self.y)
+        npt.assert_allclose(np.sum(logp), expected, rtol=1e-6)
+
+        # steps without observations are skipped
+        observed = np.ones(self.n)
+        observed[[2, 7]] = 0
+        logp = self.filter(observed=observed)[0].eval()
+        keep = observed > 0
+        expected = multivariate_normal((self.H @ self.mean)[keep], S[np.ix_(keep, keep)]).logpdf(
+            self.y[keep]
+        )
+        npt.assert_allclose(np.sum(logp), expected, rtol=1e-6)
+        npt.assert_allclose(logp[~keep], 0.0)
+
+        def f(A, r):
+            A = tt.alloc(A, self.n, 2, 2)
+            Q = np.tile(self.Q, (self.n, 1, 1))
+            return kalman_filter(self.y, A, Q, self.h, r, self.m0, self.P0)[0].sum()
+
+        verify_grad(f, [self.A, floatX(np.array(0.4))])
+
+    @theano.config.change_flags(compute_test_value="ignore")
+    def test_smoother(self):
+        _, m, P, m_pred, P_pred = self.filter()
+        A = tt.as_tensor_variable(np.tile(self.A, (self.n, 1, 1)))
+        m, P = [out.eval() for out in kalman_smoother(A, m, P, m_pred, P_pred)]
+        S = self.H @ self.C @ self.H.T + 0.4 * np.eye(self.n)
+        gain = self.C @ self.H.T @ np.linalg.inv(S)
+        post_mean = self.mean + gain @ (self.y - self.H @ self.mean)
+        post_cov = self.C - gain @ self.H @ self.C
+        npt.assert_allclose(m.ravel(), post_mean, rtol=1e-6, atol=1e-8)
+        for k in range(self.n):
+            npt.assert_allclose(P[k], post_cov[2 * k : 2 * k + 2, 2 * k : 2 * k + 2], atol=1e-8)
+
+
 def test_expand_packed_triangular():
     with pytest.raises(ValueError):
         x = tt.matrix("x")
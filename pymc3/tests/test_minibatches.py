@@ -349,3 +349,59 @@ class TestMinibatch:
         pm.align_minibatches([m, n])
         a, b = zip(*(f() for _ in range(1000)))
         assert a == b
+
+
+class TestStreamingMinibatch:
+    def test_memmap(self, tmpdir):
+        path = str(tmpdir.join("data.npy"))
+        data = np.lib.format.open_memmap(path, mode="w+", dtype="float64", shape=(100, 3))
+        data[:] = np.arange(300).reshape(100, 3)
+        data.flush()
+        mb = pm.StreamingMinibatch(path, batch_size=10, prefetch=3)
+        try:
+            assert mb.dtype == theano.config.floatX
+            f = theano.function([], mb)
+            batches = [f() for _ in range(10)]
+            # one pass over the data visits every row once
+            rows = np.concatenate(batches)
+            assert rows.shape == (100, 3)
+            np.testing.assert_array_equal(np.sort(rows[:, 0]), np.arange(0, 300, 3))
+            assert not np.array_equal(batches[0], f())
+        finally:
+            mb.stop()
+        assert not mb.prefetcher.is_alive()
+
+    def test_errors(self):
+        with pytest.raises(TypeError):
+            pm.StreamingMinibatch(np.arange(10), batch_size=[2])
+        with pytest.raises(ValueError):
+            pm.StreamingMinibatch(np.arange(10), batch_size=20)
+
+    def test_fit(self):
+        data = np.random.RandomState(0).normal(3.0, size=(1000,))
+        mb = pm.StreamingMinibatch(data, batch_size=50)
+        try:
+            with pm.Model():
+                mu = pm.Normal("mu", 0, 10)
+                pm.Normal("x", mu, 1, observed=mb, total_size=data.shape[0])
+                approx = pm.fit(2000, obj_optimizer=pm.adam(learning_rate=0.1), progressbar=False)
+            assert np.abs(approx.mean.eval() - 3.0) < 0.2
+        finally:
+            mb.stop()
+
+    def test_read_error(self):
+        class Unreadable:
+            shape = (10,)
+
+            def __getitem__(self, idx):
+                raise OSError("unreadable")
+
+        prefetcher = pm.data._BatchPrefetcher(Unreadable(), 2, "float64")
+        prefetcher.start()
+        try:
+            # the error is raised again instead of waiting on the exited thread
+            for _ in range(2):
+                with pytest.raises(OSError, match="unreadable"):
+                    next(prefetcher)
+        finally:
+            prefetcher.stop()
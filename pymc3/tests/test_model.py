@@ -449,6 +449,58 @@ def test_tempered_logp_dlogp():
     npt.assert_allclose(func_temp_nograd(x), func_temp(x)[0])
 
 
+def test_fastfn_batch():
+    with pm.Model() as model:
+        x = pm.Normal("x", shape=(2, 3))
+        s = pm.HalfNormal("s")
+        d = pm.Deterministic("d", x.sum() * s)
+
+    points = {"x": np.random.randn(4, 2, 3), "s_log__": np.random.randn(4)}
+    d_vals, s_vals = model.fastfn_batch([d, s])(points)
+    npt.assert_allclose(d_vals, points["x"].sum(axis=(1, 2)) * np.exp(points["s_log__"]))
+    npt.assert_allclose(s_vals, np.exp(points["s_log__"]))
+
+    single = model.fastfn(d)
+    batch = model.fastfn_batch(d)
+    for i in range(4):
+        point = {key: val[i] for key, val in points.items()}
+        npt.assert_allclose(batch(points)[i], single(point))
+
+
+def test_logp_dlogp_batch(monkeypatch):
+    with pm.Model() as model:
+        x = pm.Normal("x", shape=(2, 3))
+        s = pm.HalfNormal("s")
+        pm.Normal("y", x.sum() * s, 1, observed=[0.5, 1.5])
+
+    points = np.random.randn(5, model.bijection.ordering.size)
+    logp = model.logp_batch(points)
+    dlogp = model.dlogp_batch(points)
+    assert logp.shape == (5,)
+    assert dlogp.shape == (5, 7)
+    for i, point in enumerate(points):
+        npt.assert_allclose(logp[i], model.logp_array(point))
+        npt.assert_allclose(dlogp[i], model.dlogp_array(point))
+
+    # chunks of a single point
+    npt.assert_allclose(model.logp_batch(points, max_chunk_bytes=1), logp)
+    npt.assert_allclose(model.dlogp_batch(points, max_chunk_bytes=1), dlogp)
+
+    with pytest.raises(ValueError, match="Invalid shape"):
+        model.logp_batch(points[:, :3])
+
+    def fail(inputs, outputs):
+        raise NotImplementedError()
+
+    monkeypatch.setattr(pm.model, "scan_over_batch", fail)
+    with pm.Model() as model_loop:
+        x = pm.Normal("x", shape=(2, 3))
+        s = pm.HalfNormal("s")
+        pm.Normal("y", x.sum() * s, 1, observed=[0.5, 1.5])
+    with pytest.warns(UserWarning, match="one by one"):
+        npt.assert_allclose(model_loop.dlogp_batch(points), dlogp)
+
+
 def test_model_pickle(tmpdir):
     """Tests that PyMC3 models are pickleable"""
     with pm.Model() as model:
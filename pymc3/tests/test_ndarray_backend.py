@@ -175,6 +175,103 @@ class TestMultiTrace_add_remove_values(bf.ModelBackendSampledTestCase):
         assert len(orig_varnames) == len(mtrace.varnames)
         assert name not in mtrace.varnames
 
+    def test_combined_values_cached(self):
+        mtrace = self.mtrace
+        varname = mtrace.varnames[0]
+        combined = mtrace[varname]
+        assert mtrace[varname] is combined
+        assert mtrace.get_values(varname, burn=1) is not combined
+        assert mtrace.get_values(varname, burn=1) is mtrace.get_values(varname, burn=1)
+        # only the last combined values are cached
+        assert len(mtrace._values_cache) == 1
+        with pytest.raises(ValueError):
+            combined[0] = 0
+        # the values of a single chain are read-only views of the trace
+        single = mtrace.get_values(varname, chains=0)
+        assert np.shares_memory(single, mtrace._straces[0].samples[varname])
+        with pytest.raises(ValueError):
+            single[0] = 0
+        assert mtrace._straces[0].samples[varname].flags.writeable
+
+        name = "cached_var"
+        mtrace.add_values({name: combined + 1})
+        assert mtrace[varname] is not combined
+        npt.assert_allclose(mtrace[name], combined + 1)
+        mtrace.add_values({name: combined + 2}, overwrite=True)
+        npt.assert_allclose(mtrace[name], combined + 2)
+        mtrace.remove_values(name)
+        with pytest.raises(KeyError):
+            mtrace[name]
+
+
+class TestNDArrayRecordArray:
+    def setup_method(self):
+        with pm.Model() as self.model:
+            x = pm.Normal("x", shape=(2, 3))
+            s = pm.HalfNormal("s")
+            pm.Deterministic("d", x.sum() * s)
+        self.ordering = pm.blocking.ArrayOrdering(self.model.vars)
+        self.draws = 5
+
+    def _points(self):
+        bij = pm.blocking.DictToArrayBijection(self.ordering, self.model.test_point)
+        rng = np.random.RandomState(42)
+        qs = rng.randn(self.draws, self.ordering.size)
+        return qs, [bij.rmap(q) for q in qs]
+
+    def test_matches_record(self):
+        qs, points = self._points()
+        stats = [[{"a": float(i), "b": bool(i % 2)}] for i in range(self.draws)]
+        with self.model:
+            expected = ndarray.NDArray()
+            expected.setup(self.draws, 0, STATS1)
+            actual = ndarray.NDArray()
+            actual.setup(self.draws, 0, STATS1)
+            actual.setup_array(self.ordering, qs.dtype)
+        for q, point, stat in zip(qs, points, stats):
+            expected.record(point, stat)
+            actual.record_array(q, stat)
+        expected.close()
+        actual.close()
+
+        for varname in expected.varnames:
+            npt.assert_allclose(actual.get_values(varname), expected.get_values(varname))
+        for key in STATS1[0]:
+            npt.assert_equal(actual.get_sampler_stats(key), expected.get_sampler_stats(key))
+            assert actual.get_sampler_stats(key).dtype == STATS1[0][key]
+
+    def test_missing_sampler_stats(self):
+        qs, _ = self._points()
+        with self.model:
+            strace = ndarray.NDArray()
+            strace.setup(self.draws, 0, STATS1)
+            strace.setup_array(self.ordering, qs.dtype)
+        with pytest.raises(ValueError, match="Missing sampler stats"):
+            strace.record_array(qs[0], [{"a": 1.0}])
+
+    def test_read_during_sampling(self):
+        qs, points = self._points()
+        with self.model:
+            strace = ndarray.NDArray()
+            strace.setup(self.draws, 0)
+            strace.setup_array(self.ordering, qs.dtype)
+        strace.record_array(qs[0])
+        npt.assert_allclose(strace.point(0)["x"], points[0]["x"])
+        strace.record_array(qs[1])
+        assert len(strace[:2]) == 2
+        npt.assert_allclose(strace.get_values("d")[1], points[1]["x"].sum() * np.exp(qs[1, -1]))
+
+    def test_requires_setup(self):
+        with self.model:
+            strace = ndarray.NDArray()
+            with pytest.raises(ValueError):
+                strace.setup_array(self.ordering)
+            strace.setup(self.draws, 0)
+        with pytest.raises(ValueError):
+            strace.record_array(np.zeros(self.ordering.size))
+        with pytest.raises(ValueError):
+            strace.setup_array(pm.blocking.ArrayOrdering(self.model.vars[:1]))
+
 
 class TestSqueezeCat:
     def setup_method(self):
@@ -202,3 +202,26 @@ def test_spawn_densitydist_mpctxwarning(monkeypatch):
         normal_dist = pm.Normal.dist(mu, 1)
         with pytest.warns(UserWarning, match="errors when sampling when multiprocessing"):
             obs = pm.DensityDist("density_dist", normal_dist.logp, observed=np.random.randn(100))
+
+
+def test_pool_tuning():
+    with pm.Model():
+        pm.Normal("x", shape=3, sigma=np.array([1.0, 10.0, 0.1]))
+        trace = pm.sample(
+            tune=60, draws=10, chains=2, cores=2, pool_tuning=True, compute_convergence_checks=False
+        )
+    assert trace.nchains == 2
+    assert np.all(np.isfinite(trace.get_sampler_stats("step_size")))
+
+
+def test_pool_tuning_unsupported_step():
+    with pm.Model():
+        pm.Normal("x")
+        with pytest.raises(ValueError, match="Pooled tuning requires"):
+            pm.sample(tune=10, draws=2, chains=2, cores=2, step=pm.Metropolis(), pool_tuning=True)
+        with pytest.raises(ValueError, match="Pooled tuning requires"):
+            pm.sample(tune=10, draws=2, chains=2, cores=2, init="adapt_low_rank", pool_tuning=True)
+        # the adaptation from gradients would be replaced by the pooled variances
+        potential = pm.step_methods.hmc.quadpotential.QuadPotentialDiagAdaptGrad(1, np.zeros(1))
+        assert not ps._supports_pooled_tuning(pm.NUTS(potential=potential))
+        assert ps._supports_pooled_tuning(pm.NUTS())
@@ -12,6 +12,8 @@
 #   See the License for the specific language governing permissions and
 #   limitations under the License.
 
+import copy
+
 import numpy as np
 import numpy.testing as npt
 import pytest
@@ -278,6 +280,116 @@ def test_full_adapt_sampling(seed=289586):
         pymc3.sample(draws=10, tune=1000, random_seed=seed, step=step, cores=1, chains=1)
 
 
+def test_low_rank_operations(seed=4211):
+    np.random.seed(seed)
+    n = 6
+    pot = quadpotential.QuadPotentialLowRankAdapt(n, np.zeros(n), rank=2)
+    stds = np.exp(np.random.randn(n))
+    vecs, _ = np.linalg.qr(np.random.randn(n, 2))
+    vals = np.array([4.0, 0.5])
+    pot._stds[:] = stds
+    pot._inv_stds[:] = 1 / stds
+    pot._vecs = vecs
+    pot._vals = vals
+
+    cov = np.diag(stds) @ (np.eye(n) + vecs @ np.diag(vals - 1) @ vecs.T) @ np.diag(stds)
+    x = np.random.randn(n)
+    npt.assert_allclose(pot.velocity(x), cov @ x)
+    npt.assert_allclose(pot.energy(x), 0.5 * x @ cov @ x)
+    v_out = np.empty(n)
+    npt.assert_allclose(pot.velocity_energy(x, v_out), 0.5 * x @ cov @ x)
+    npt.assert_allclose(v_out, cov @ x)
+
+    samples = np.array([pot.random() for _ in range(20000)])
+    sample_cov = np.cov(samples, rowvar=0)
+    npt.assert_allclose(sample_cov, np.linalg.inv(cov), atol=0.1 * np.abs(np.linalg.inv(cov)).max())
+
+
+def test_low_rank_adapt(seed=2124):
+    np.random.seed(seed)
+    n = 20
+    L = np.eye(n)
+    L[:, 0] += 3.0
+    window = 200
+    pot = quadpotential.QuadPotentialLowRankAdapt(n, np.zeros(n), adaptation_window=window, rank=3)
+    assert pot._vals.shape == (0,)
+    for _ in range(window + 1):
+        pot.update(L @ np.random.randn(n), None, True)
+    assert pot._vecs.shape == (n, 3)
+    npt.assert_allclose(pot._vecs.T @ pot._vecs, np.eye(3), atol=1e-8)
+    # The correlated direction of the draws is picked up
+    cov = np.cov(L @ np.random.randn(n, 5000))
+    corr = cov / np.sqrt(np.outer(np.diag(cov), np.diag(cov)))
+    top = np.linalg.eigh(corr)[1][:, -1]
+    assert np.abs(top @ pot._vecs[:, 0]) > 0.9
+    assert pot._vals[0] > 5
+
+    stds = pot._stds.copy()
+    pot.update(np.random.randn(n), None, True)
+    npt.assert_allclose(pot._stds, stds)
+    pot.raise_ok(None)
+
+    pot.reset()
+    assert pot._vals.shape == (0,)
+
+    with pytest.raises(ValueError):
+        quadpotential.QuadPotentialLowRankAdapt(n, np.zeros(n), rank=0)
+
+
+def test_low_rank_adapt_sampling(seed=289586):
+    with pymc3.Model():
+        pymc3.MvNormal(
+            "a", mu=np.zeros(3), cov=np.array([[1.0, 0.9, 0], [0.9, 1, 0], [0, 0, 2]]), shape=3
+        )
+        pymc3.sample(draws=10, tune=300, random_seed=seed, init="adapt_low_rank", cores=1, chains=1)
+
+
+def test_weighted_variance_add_variance(seed=4321):
+    np.random.seed(seed)
+    data = np.random.randn(30, 4)
+    var1 = quadpotential._WeightedVariance(4)
+    var2 = quadpotential._WeightedVariance(4)
+    for x in data[:12]:
+        var1.add_sample(x, 1)
+    for x in data[12:]:
+        var2.add_sample(x, 1)
+    var1.add_variance(var2)
+    assert var1.n_samples == 30
+    npt.assert_allclose(var1.mean, data.mean(0))
+    npt.assert_allclose(var1.current_variance(), data.var(0))
+
+
+def test_diag_adapt_pooled_variance(seed=5622):
+    np.random.seed(seed)
+    data = np.random.randn(50, 3) * [1.0, 2.0, 3.0]
+    pot = quadpotential.QuadPotentialDiagAdapt(3, np.zeros(3), np.ones(3), 1, dtype="float64")
+    other = quadpotential._WeightedVariance(3)
+    for x in data[:20]:
+        pot.update(x, None, True)
+    for x in data[20:]:
+        other.add_sample(x, 1)
+    own_var = pot._var.copy()
+
+    pot.set_pooled_variance(other)
+    combined = copy.deepcopy(pot.weighted_variance)
+    combined.add_variance(other)
+    npt.assert_allclose(pot._var, combined.current_variance())
+    assert pot.weighted_variance.n_samples == 21
+
+    pot.set_pooled_variance(None)
+    npt.assert_allclose(pot._var, own_var)
+
+
+def test_dual_average_pool():
+    adapt = pymc3.step_methods.step_sizes.DualAverageAdaptation(0.1, 0.8, 0.05, 10, 0.75)
+    for accept in [0.9, 0.6, 0.7]:
+        adapt.update(accept, True)
+    adapt.pool([0.1, -0.2, 0.4], [-1.0, -2.0, -3.0])
+    assert adapt._hbar == pytest.approx(0.1)
+    assert adapt._log_bar == pytest.approx(-2.0)
+    assert adapt._log_step == pytest.approx(adapt._mu - 0.1 * np.sqrt(3) / 0.05)
+
+
 def test_issue_3965():
     with pymc3.Model():
         pymc3.Normal("n")
@@ -134,6 +134,69 @@ class TestSample(SeededTest):
         assert tr.get_values("x", chains=0)[0][0] > 0
         assert tr.get_values("x", chains=1)[0][0] < 0
 
+    def test_sample_records_flat_arrays(self):
+        with pm.Model():
+            x = pm.Normal("x", shape=3)
+            s = pm.HalfNormal("s")
+            pm.Deterministic("d", x.sum() * s)
+            step = pm.NUTS()
+            assert pm.sampling._array_record_func(step, NDArray(), pm.modelcontext(None))
+            trace = pm.sample(20, tune=5, step=step, chains=1, cores=1, return_inferencedata=False)
+        npt.assert_allclose(trace["d"], trace["x"].sum(axis=1) * trace["s"])
+        npt.assert_allclose(trace["s"], np.exp(trace["s_log__"]))
+        assert trace.get_sampler_stats("tree_size").shape == (20,)
+
+    def test_sample_records_points_without_batch_function(self, monkeypatch):
+        def fail(inputs, outputs):
+            raise NotImplementedError()
+
+        monkeypatch.setattr(pm.model, "scan_over_batch", fail)
+        with pm.Model() as model:
+            x = pm.Normal("x", shape=3)
+            s = pm.HalfNormal("s")
+            pm.Deterministic("d", x.sum() * s)
+            step = pm.NUTS()
+            strace = NDArray()
+            with pytest.warns(UserWarning, match="one by one"):
+                assert pm.sampling._array_record_func(step, strace, model) is None
+            strace.setup(5, 0)
+            with pytest.raises(ValueError, match="can not be computed in batches"):
+                strace.setup_array(step._logp_dlogp_func._ordering)
+            trace = pm.sample(20, tune=5, step=step, chains=1, cores=1, return_inferencedata=False)
+        npt.assert_allclose(trace["d"], trace["x"].sum(axis=1) * trace["s"])
+
+    @pytest.mark.parametrize("cores", [1, 2])
+    def test_defer_deterministics(self, cores):
+        with pm.Model() as model:
+            x = pm.Normal("x", shape=3)
+            s = pm.HalfNormal("s")
+            pm.Deterministic("d", x.sum() * s)
+            kwargs = dict(
+                draws=30,
+                tune=10,
+                chains=2,
+                cores=cores,
+                random_seed=self.random_seed,
+                return_inferencedata=False,
+                compute_convergence_checks=False,
+            )
+            expected = pm.sample(**kwargs)
+            trace = pm.sample(defer_deterministics=True, **kwargs)
+        assert trace.varnames == expected.varnames
+        for varname in expected.varnames:
+            npt.assert_allclose(trace[varname], expected[varname])
+
+        with model:
+            with pytest.raises(ValueError):
+                pm.sample(defer_deterministics=True, trace=[x], **kwargs)
+            free = pm.sample(trace=model.vars, **kwargs)
+        assert "d" not in free.varnames
+        assert pm.sampling.compute_deterministics(free[:0], model=model)["d"].shape == (0,)
+        pm.sampling.compute_deterministics(
+            free, model=model, chunk_size=7, cores=cores, min_draws_per_core=7
+        )
+        npt.assert_allclose(free["d"], expected["d"])
+
     def test_sample_tune_len(self):
         with self.model:
             trace = pm.sample(draws=100, tune=50, cores=1)
@@ -314,6 +377,31 @@ def test_empty_model():
         error.match("any free variables")
 
 
+def test_sample_profile():
+    with pm.Model():
+        pm.Normal("x", shape=3)
+        step = pm.NUTS()
+        trace = pm.sample(
+            20,
+            tune=10,
+            step=step,
+            chains=1,
+            cores=1,
+            profile=True,
+            compute_convergence_checks=False,
+        )
+    profile = trace.report.profile
+    assert profile.loc["NUTS.astep", "calls"] == 30
+    assert profile.loc["record", "calls"] == 30
+    assert profile.loc["potential.update", "calls"] == 30
+    for name in ["_build_subtree", "integrator.step", "logp_dlogp_func"]:
+        assert profile.loc[name, "calls"] > 0
+    assert (profile["time"] > 0).all()
+    # the instrumented methods are restored
+    assert "astep" not in vars(step)
+    assert not hasattr(pm.step_methods.hmc.nuts._Tree._build_subtree, "__wrapped__")
+
+
 def test_partial_trace_sample():
     with pm.Model() as model:
         a = pm.Normal("a", mu=0, sigma=1)
@@ -758,6 +846,31 @@ class TestSamplePPC(SeededTest):
             with pytest.warns(UserWarning, match=warning_msg):
                 pm.fast_sample_posterior_predictive(trace, samples=5)
 
+    def test_fast_ppc_chunks(self, tmp_path):
+        with pm.Model() as model:
+            mu = pm.Normal("mu", 0.0, 1.0, shape=2)
+            pm.Normal("a", mu=mu, sigma=1e-3, observed=np.zeros((3, 2)))
+        trace = [{"mu": np.array([i, -i], dtype=float)} for i in range(10)]
+
+        with model:
+            ppc = pm.fast_sample_posterior_predictive(trace, random_seed=4, chunk_size=3)
+            assert ppc["a"].shape == (10, 3, 2)
+            npt.assert_allclose(
+                ppc["a"].mean(1), np.stack([trace_point["mu"] for trace_point in trace]), atol=0.01
+            )
+
+            ppc_parallel = pm.fast_sample_posterior_predictive(
+                trace, random_seed=4, chunk_size=3, cores=2
+            )
+            npt.assert_array_equal(ppc_parallel["a"], ppc["a"])
+
+            ppc_memmap = pm.fast_sample_posterior_predictive(
+                trace, samples=25, random_seed=4, chunk_size=4, memmap_dir=str(tmp_path)
+            )
+            assert isinstance(ppc_memmap["a"], np.memmap)
+            assert ppc_memmap["a"].shape == (25, 3, 2)
+            npt.assert_array_equal(np.load(tmp_path / "a.npy"), ppc_memmap["a"])
+
 
 class TestSamplePPCW(SeededTest):
     def test_sample_posterior_predictive_w(self):
@@ -833,6 +946,8 @@ class TestSamplePPCW(SeededTest):
         "advi_map",
         "adapt_full",
         "jitter+adapt_full",
+        "adapt_low_rank",
+        "jitter+adapt_low_rank",
     ],
 )
 def test_exec_nuts_init(method):
@@ -945,6 +1060,44 @@ class TestSamplePriorPredictive(SeededTest):
             assert trace1["goals"].shape == (10,) + shape
             assert trace2["goals"].shape == (10,) + shape
 
+    def test_fast_prior_predictive(self):
+        idx = np.repeat(np.arange(20), 3)
+        with pm.Model() as model:
+            mu = pm.Normal("mu", 0, 1)
+            sd = pm.HalfNormal("sd", 1)
+            a = pm.Normal("a", mu, sd, shape=20)
+            lam = pm.Deterministic("lam", pm.math.exp(a[idx]))
+            # no batched generator, falls back to Weibull.random
+            w = pm.Weibull("w", 2.0, 1.0)
+            pm.Poisson("y", lam, observed=np.ones(len(idx)))
+            pm.Normal("z", a[idx] * w, 1, observed=np.zeros(len(idx)))
+            prior = pm.fast_sample_prior_predictive(2000)
+            reference = pm.sample_prior_predictive(2000)
+
+        assert set(prior) == set(reference)
+        for name in reference:
+            assert prior[name].shape == reference[name].shape
+            assert prior[name].dtype == reference[name].dtype
+        npt.assert_allclose(prior["lam"], np.exp(prior["a"][:, idx]))
+        npt.assert_allclose(prior["sd_log__"], np.log(prior["sd"]))
+        # the groups of each draw share the draws of the hyperpriors
+        npt.assert_allclose(prior["a"].mean(axis=1), prior["mu"], atol=4 * prior["sd"].max())
+        for name in ("mu", "sd", "a", "w", "z"):
+            npt.assert_allclose(prior[name].mean(), reference[name].mean(), atol=0.1)
+            npt.assert_allclose(prior[name].std(), reference[name].std(), rtol=0.1)
+        npt.assert_allclose(np.median(prior["y"]), np.median(reference["y"]), atol=1)
+
+    def test_fast_prior_predictive_respects_shape(self):
+        for shape in (2, (2,), (10, 2), (10, 10)):
+            with pm.Model():
+                mu = pm.Gamma("mu", 3, 1, shape=1)
+                pm.Poisson("goals", mu, shape=shape)
+                prior = pm.fast_sample_prior_predictive(10, var_names=["mu", "goals"])
+            if shape == 2:
+                shape = (2,)
+            assert prior["mu"].shape == (10, 1)
+            assert prior["goals"].shape == (10,) + shape
+
     def test_multivariate(self):
         with pm.Model():
             m = pm.Multinomial("m", n=5, p=np.array([0.25, 0.25, 0.25, 0.25]), shape=4)
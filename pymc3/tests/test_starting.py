@@ -16,7 +16,20 @@ import numpy as np
 
 from pytest import raises
 
-from pymc3 import Beta, Binomial, Model, Normal, Point, Uniform, find_MAP
+import pymc3 as pm
+
+from pymc3 import (
+    Beta,
+    Binomial,
+    HalfNormal,
+    MAPOptimum,
+    Model,
+    Normal,
+    NormalMixture,
+    Point,
+    Uniform,
+    find_MAP,
+)
 from pymc3.tests.checks import close_to
 from pymc3.tests.helpers import select_by_precision
 from pymc3.tests.models import non_normal, simple_arbitrary_det, simple_model
@@ -106,3 +119,50 @@ def test_allinmodel():
         starting.allinmodel([x2, y1], model1)
     with raises(ValueError, match=r"Some variables not in the model: \['x2'\]"):
         starting.allinmodel([x2], model1)
+
+
+def test_find_MAP_multistart():
+    with Model():
+        NormalMixture("x", w=np.array([0.3, 0.7]), mu=np.array([-3.0, 3.0]), sigma=1.0)
+        optima = find_MAP({"x": 0.0}, n_starts=8, random_seed=1, progressbar=False)
+        optima_prior = find_MAP(
+            n_starts=4, starts_from="prior", cores=2, random_seed=1, progressbar=False
+        )
+        with raises(ValueError):
+            find_MAP(n_starts=2, starts_from="nowhere", progressbar=False)
+
+    for result in (optima, optima_prior):
+        assert all(isinstance(optimum, MAPOptimum) for optimum in result)
+        logps = [optimum.logp for optimum in result]
+        assert logps == sorted(logps, reverse=True)
+        close_to(result[0].point["x"], 3, 1e-2)
+        assert all(optimum.time > 0 and optimum.n_eval > 0 for optimum in result)
+    assert len(optima) == 8 and len(optima_prior) == 4
+    # the test point is the first start
+    assert any(o.start["x"] == 0 for o in optima)
+    # both modes are found
+    assert np.any(np.isclose([o.point["x"] for o in optima], -3, atol=1e-2))
+
+
+def test_find_MAP_multistart_prior_transformed(monkeypatch):
+    sample_prior = pm.fast_sample_prior_predictive
+    sampled_names = []
+
+    def record_names(*args, var_names=None, **kwargs):
+        sampled_names.extend(var_names)
+        return sample_prior(*args, var_names=var_names, **kwargs)
+
+    monkeypatch.setattr(pm, "fast_sample_prior_predictive", record_names)
+    with Model():
+        mu = Normal("mu", 0, 1)
+        sigma = HalfNormal("sigma", 1)
+        Normal("y", mu, sigma, observed=np.array([-0.5, 0.2, 0.9, 1.4]))
+        optima = find_MAP(n_starts=3, starts_from="prior", random_seed=1, progressbar=False)
+
+    # only the free variables are drawn from the prior
+    assert sorted(sampled_names) == ["mu", "sigma"]
+    assert len(optima) == 3
+    for optimum in optima:
+        assert "sigma_log__" in optimum.start
+        assert np.isfinite(optimum.start["sigma_log__"])
+    close_to(optima[0].point["sigma"], np.std([-0.5, 0.2, 0.9, 1.4]), 1e-2)
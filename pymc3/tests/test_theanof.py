@@ -19,7 +19,9 @@ import pytest
 import theano
 import theano.tensor as tt
 
-from pymc3.theanof import _conversion_map, take_along_axis
+import pymc3 as pm
+
+from pymc3.theanof import FUNCTION_CACHE_ENV, _conversion_map, take_along_axis
 from pymc3.vartypes import int_types
 
 FLOATX = str(theano.config.floatX)
@@ -223,3 +225,53 @@ class TestTakeAlongAxis:
         indices.tag.test_value = np.zeros((1,) * indices.ndim, dtype=FLOATX)
         with pytest.raises(IndexError):
             take_along_axis(arr, indices)
+
+
+def test_cached_function(tmp_path, monkeypatch):
+    monkeypatch.setenv(FUNCTION_CACHE_ENV, str(tmp_path))
+    compiled = []
+    function = theano.function
+
+    def counting_function(*args, **kwargs):
+        compiled.append(1)
+        return function(*args, **kwargs)
+
+    monkeypatch.setattr(theano, "function", counting_function)
+
+    def make_model(observed):
+        with pm.Model() as model:
+            x = pm.Data("x", np.linspace(0, 1, 10))
+            a = pm.Normal("a")
+            sigma = pm.HalfNormal("sigma")
+            pm.Normal("y", a * x, sigma, observed=observed)
+        return model
+
+    def compile_logp_dlogp(model):
+        n_compiled = len(compiled)
+        func = model.logp_dlogp_function()
+        return func, len(compiled) - n_compiled
+
+    model = make_model(np.ones(10))
+    func, n_compiled = compile_logp_dlogp(model)
+    assert n_compiled == 1
+    assert len(list(tmp_path.iterdir())) == 1
+
+    cached_model = make_model(np.ones(10))
+    cached_func, n_compiled = compile_logp_dlogp(cached_model)
+    assert n_compiled == 0
+
+    q = np.array([0.5, 0.1])
+    for value in [np.linspace(0, 1, 10), np.zeros(10)]:
+        with model:
+            pm.set_data({"x": value})
+        with cached_model:
+            pm.set_data({"x": value})
+        func.set_extra_values({})
+        cached_func.set_extra_values({})
+        logp, dlogp = func(q)
+        cached_logp, cached_dlogp = cached_func(q)
+        np.testing.assert_allclose(cached_logp, logp)
+        np.testing.assert_allclose(cached_dlogp, dlogp)
+
+    _, n_compiled = compile_logp_dlogp(make_model(np.zeros(10)))
+    assert n_compiled == 1
@@ -12,13 +12,23 @@
 #   See the License for the specific language governing permissions and
 #   limitations under the License.
 
+import hashlib
+import logging
+import os
+import pickle
+import tempfile
+
+from collections.abc import Mapping
+
 import numpy as np
 import theano
 
 from theano import scalar
 from theano import tensor as tt
-from theano.graph.basic import Apply, graph_inputs
+from theano.compile import SharedVariable
+from theano.graph.basic import Apply, Constant, graph_inputs, io_toposort
 from theano.graph.op import Op
+from theano.graph.type import Type
 from theano.sandbox.rng_mrg import MRG_RandomStream as RandomStream
 
 from pymc3.blocking import ArrayOrdering
@@ -42,8 +52,12 @@ __all__ = [
     "set_tt_rng",
     "tt_rng",
     "take_along_axis",
+    "set_function_cache_dir",
+    "cached_function",
 ]
 
+_log = logging.getLogger("pymc3")
+
 
 def inputvars(a):
     """
@@ -197,6 +211,269 @@ def makeiter(a):
         return [a]
 
 
+def scan_over_batch(inputs, outputs):
+    """Map a graph over a leading batch axis of its inputs.
+
+    Parameters
+    ----------
+    inputs: list of theano variables
+        Inputs of the graph. Each one is replaced by a variable with an
+        additional leading axis that carries the same name.
+    outputs: list of theano variables
+        Outputs of the graph.
+
+    Returns
+    -------
+    batch_inputs: list of theano variables
+    batch_outputs: list of theano variables
+        The values of ``outputs`` for each element of the batch, stacked along
+        the leading axis. The graph is evaluated with one ``theano.scan``, so
+        the loop over the batch runs inside the compiled function.
+    """
+    outputs = list(outputs)
+    with theano.config.change_flags(compute_test_value="off"):
+        batch_inputs = [
+            tt.TensorType(var.dtype, (False,) + var.broadcastable)(var.name) for var in inputs
+        ]
+
+        def single(*values):
+            return theano.clone(outputs, replace=dict(zip(inputs, values)))
+
+        batch_outputs, _ = theano.scan(single, sequences=batch_inputs)
+    if not isinstance(batch_outputs, list):
+        batch_outputs = [batch_outputs]
+    return batch_inputs, batch_outputs
+
+
+FUNCTION_CACHE_ENV = "PYMC3_FUNCTION_CACHE_DIR"
+
+
+def set_function_cache_dir(path):
+    """Set the directory of the on-disk cache of compiled model functions.
+
+    Functions compiled with ``cached_function``, e.g. the logp and gradient
+    function of NUTS or the functions of ``Model.fastfn``, are stored in this
+    directory and loaded instead of compiled when a later run or another
+    process builds the same graph. The directory is passed on to child
+    processes through the ``PYMC3_FUNCTION_CACHE_DIR`` environment variable,
+    which can also be set directly.
+
+    Parameters
+    ----------
+    path: str or None
+        The cache directory. ``None`` disables the cache.
+    """
+    if path is None:
+        os.environ.pop(FUNCTION_CACHE_ENV, None)
+    else:
+        path = os.fspath(path)
+        os.makedirs(path, exist_ok=True)
+        os.environ[FUNCTION_CACHE_ENV] = path
+
+
+class _Uncacheable(Exception):
+    pass
+
+
+def _array_digest(value):
+    value = np.asarray(value)
+    if value.dtype.hasobject:
+        raise _Uncacheable()
+    digest = hashlib.sha256(np.ascontiguousarray(value).tobytes()).hexdigest()
+    return f"array({value.dtype},{value.shape},{digest})"
+
+
+def _stable_repr(value, depth=0):
+    """A representation of `value` that does not depend on the process that created it."""
+    if depth > 10:
+        raise _Uncacheable()
+    depth += 1
+    if value is None or isinstance(value, (bool, int, float, complex, str, bytes, np.generic)):
+        return repr(value)
+    if isinstance(value, (list, tuple)):
+        return "({})".format(",".join(_stable_repr(item, depth) for item in value))
+    if isinstance(value, slice):
+        return "slice" + _stable_repr((value.start, value.stop, value.step), depth)
+    if isinstance(value, Mapping):
+        items = sorted((_stable_repr(k, depth), _stable_repr(v, depth)) for k, v in value.items())
+        return "{{{}}}".format(",".join(f"{k}:{v}" for k, v in items))
+    if isinstance(value, np.ndarray):
+        return _array_digest(value)
+    if isinstance(value, Type):
+        return str(value)
+    cls = type(value)
+    name = f"{cls.__module__}.{cls.__qualname__}"
+    props = getattr(value, "__props__", None)
+    if props is not None:
+        return name + _stable_repr([getattr(value, prop) for prop in props], depth)
+    if isinstance(value, scalar.ScalarOp):
+        # Scalar ops are compared by their attributes
+        return name + _stable_repr(vars(value), depth)
+    if isinstance(value, Op):
+        # Other ops without __props__ may depend on state we can not compare
+        raise _Uncacheable()
+    if isinstance(value, type) or callable(value) and hasattr(value, "__qualname__"):
+        if getattr(value, "__closure__", None):
+            raise _Uncacheable()
+        return f"{value.__module__}.{value.__qualname__}"
+    if hasattr(value, "__dict__"):
+        return name + _stable_repr(vars(value), depth)
+    raise _Uncacheable()
+
+
+def _function_fingerprint(inputs, outputs, givens, kwargs):
+    """Fingerprint of the graph of a theano function.
+
+    Returns the fingerprint and the shared variables of the graph in a
+    canonical order, which only depends on the structure of the graph.
+    """
+    inputs = list(inputs)
+    givens = list(givens.items() if isinstance(givens, dict) else givens or [])
+    given_vars = [var for var, _ in givens]
+    outputs_list = list(makeiter(outputs))
+    for key, value in kwargs.items():
+        if key in ("updates", "givens") or not isinstance(value, (type(None), bool, str)):
+            raise _Uncacheable()
+
+    refs = {}
+    shared = []
+    description = []
+
+    def ref(var):
+        if var not in refs:
+            if var in inputs:
+                desc = ("input", inputs.index(var), str(var.type))
+            elif var in given_vars:
+                value = givens[given_vars.index(var)][1]
+                if not isinstance(value, SharedVariable):
+                    raise _Uncacheable()
+                shared.append(value)
+                desc = ("given", given_vars.index(var), str(value.type))
+            elif isinstance(var, SharedVariable):
+                shared.append(var)
+                desc = ("shared", str(var.type))
+            elif isinstance(var, Constant):
+                desc = ("constant", str(var.type), _array_digest(var.data))
+            else:
+                raise _Uncacheable()
+            refs[var] = len(refs)
+            description.append(desc)
+        return refs[var]
+
+    for node in io_toposort(inputs + given_vars, outputs_list):
+        node_inputs = [ref(var) for var in node.inputs]
+        for out in node.outputs:
+            refs[out] = len(refs)
+        description.append(
+            (_stable_repr(node.op), node_inputs, [str(out.type) for out in node.outputs])
+        )
+    description.append(("outputs", [ref(var) for var in outputs_list], outputs is outputs_list))
+    for var in inputs:
+        ref(var)
+    description.append(("kwargs", sorted(kwargs.items())))
+    description.append(
+        (
+            "config",
+            theano.__version__,
+            str(theano.config.mode),
+            theano.config.optimizer,
+            theano.config.linker,
+            theano.config.floatX,
+            theano.config.cxx,
+        )
+    )
+    fingerprint = hashlib.sha256(repr(description).encode()).hexdigest()
+    return fingerprint, shared
+
+
+def cached_function(inputs, outputs, givens=None, **kwargs):
+    """Compile a theano function, using the on-disk function cache if it is enabled.
+
+    Graphs are identified by a fingerprint of their structure, their constants
+    and the types of their inputs. The values of shared variables are not part
+    of the fingerprint: a function loaded from the cache uses the shared
+    variables of `outputs`, just like a newly compiled function. Graphs with
+    ops that can not be fingerprinted are always compiled.
+
+    Parameters
+    ----------
+    inputs, outputs, givens, kwargs
+        Arguments of `theano.function`.
+
+    See Also
+    --------
+    set_function_cache_dir
+    """
+    cache_dir = os.environ.get(FUNCTION_CACHE_ENV)
+    if not cache_dir:
+        return theano.function(inputs, outputs, givens=givens, **kwargs)
+    try:
+        fingerprint, shared = _function_fingerprint(inputs, outputs, givens, kwargs)
+    except _Uncacheable:
+        return theano.function(inputs, outputs, givens=givens, **kwargs)
+
+    path = os.path.join(cache_dir, fingerprint + ".pkl")
+    try:
+        with open(path, "rb") as file:
+            return _SharedUnpickler(file, shared).load()
+    except FileNotFoundError:
+        pass
+    except Exception:
+        _log.debug("Could not load compiled function %s from cache.", path, exc_info=True)
+
+    fn = theano.function(inputs, outputs, givens=givens, **kwargs)
+    # Write to a temporary file first, so that other processes never
+    # see a partially written function
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            _SharedPickler(file, shared).dump(fn)
+        os.replace(tmp_path, path)
+    except Exception:
+        _log.debug("Could not store compiled function in cache.", exc_info=True)
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return fn
+
+
+class _SharedPickler(pickle.Pickler):
+    """Pickler that stores references to shared variables instead of their values.
+
+    The compiled function is linked to the storage of the shared variables,
+    so on loading it is linked to the shared variables of the current graph.
+    """
+
+    def __init__(self, file, shared):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self._ids = {}
+        for i, var in enumerate(shared):
+            self._ids[id(var)] = ("shared", i)
+            self._ids[id(var.container)] = ("container", i)
+            # The function has its own containers around the same storage
+            self._ids[id(var.container.storage)] = ("storage", i)
+            self._ids[id(var.container.storage[0])] = ("value", i)
+
+    def persistent_id(self, obj):
+        return self._ids.get(id(obj))
+
+
+class _SharedUnpickler(pickle.Unpickler):
+    def __init__(self, file, shared):
+        super().__init__(file)
+        self._shared = shared
+
+    def persistent_load(self, pid):
+        kind, index = pid
+        var = self._shared[index]
+        if kind == "shared":
+            return var
+        if kind == "container":
+            return var.container
+        if kind == "storage":
+            return var.container.storage
+        return var.container.storage[0]
+
+
 class IdentityOp(scalar.UnaryScalarOp):
     @staticmethod
     def st_impl(x):
@@ -13,4 +13,4 @@
 #   limitations under the License.
 
 from pymc3.tuning.scaling import find_hessian, guess_scaling, trace_cov
-from pymc3.tuning.starting import find_MAP
+from pymc3.tuning.starting import MAPOptimum, find_MAP
@@ -17,7 +17,10 @@ Created on Mar 12, 2011
 
 @author: johnsalvatier
 """
+import collections
 import copy
+import multiprocessing
+import time
 
 import numpy as np
 import theano.gradient as tg
@@ -34,12 +37,14 @@ from pymc3.theanof import inputvars
 from pymc3.util import (
     check_start_vals,
     get_default_varnames,
+    get_untransformed_name,
     get_var_name,
+    is_transformed_name,
     update_start_vals,
 )
 from pymc3.vartypes import discrete_types, typefilter
 
-__all__ = ["find_MAP"]
+__all__ = ["find_MAP", "MAPOptimum"]
 
 
 def find_MAP(
@@ -52,6 +57,11 @@ def find_MAP(
     maxeval=5000,
     model=None,
     *args,
+    n_starts=1,
+    starts_from="jitter",
+    cores=1,
+    mp_ctx=None,
+    random_seed=None,
     **kwargs
 ):
     """
@@ -79,9 +89,29 @@ def find_MAP(
     maxeval: int, optional, defaults to 5000
         The maximum number of times the posterior distribution is evaluated.
     model: Model (optional if in `with` context)
+    n_starts: int, optional, defaults to 1
+        Number of optimizations to run from different starting points. With more than
+        one start a list of :class:`MAPOptimum` is returned, ranked by decreasing logp.
+    starts_from: str, optional, defaults to "jitter"
+        How the starting points of a multi-start run are chosen. "jitter" adds a uniform
+        jitter in [-1, 1] to `start` in the transformed space, "prior" draws them from the
+        prior. The first optimization always starts from `start`.
+    cores: int, optional, defaults to 1
+        Number of processes among which the optimizations of a multi-start run are
+        distributed. The logp and gradient functions are compiled once per process.
+    mp_ctx: multiprocessing.context.BaseContent
+        A multiprocessing context for the parallel optimizations.
+    random_seed: int, optional
+        Seed for the random starting points.
     *args, **kwargs
         Extra args passed to scipy.optimize.minimize
 
+    Returns
+    -------
+    dict, or list of MAPOptimum if `n_starts` > 1
+        The point of the optimum, or with `return_raw` a tuple of the point and the
+        output of scipy.optimize.minimize.
+
     Notes
     -----
     Older code examples used find_MAP() to initialize the NUTS sampler,
@@ -96,7 +126,6 @@ def find_MAP(
         if not vars:
             raise ValueError("Model has no unobserved continuous variables.")
     vars = inputvars(vars)
-    disc_vars = list(typefilter(vars, discrete_types))
     allinmodel(vars, model)
     start = copy.deepcopy(start)
     if start is None:
@@ -106,53 +135,188 @@ def find_MAP(
     check_start_vals(start, model)
 
     start = Point(start, model=model)
-    bij = DictToArrayBijection(ArrayOrdering(vars), start)
-    logp_func = bij.mapf(model.fastlogp_nojac)
-    x0 = bij.map(start)
-
-    try:
-        dlogp_func = bij.mapf(model.fastdlogp_nojac(vars))
-        compute_gradient = True
-    except (AttributeError, NotImplementedError, tg.NullTypeGradError):
-        compute_gradient = False
-
-    if disc_vars or not compute_gradient:
-        pm._log.warning(
-            "Warning: gradient not available."
-            + "(E.g. vars contains discrete variables). MAP "
-            + "estimates may not be accurate for the default "
-            + "parameters. Defaulting to non-gradient minimization "
-            + "'Powell'."
-        )
-        method = "Powell"
+    optimizer = _MAPOptimizer(model, vars, start, method, maxeval, args, kwargs)
+    x0 = optimizer.bij.map(start)
+
+    out_vars = get_default_varnames(model.unobserved_RVs, include_transformed)
+    out_func = model.fastfn(out_vars)
 
-    if compute_gradient:
-        cost_func = CostFuncWrapper(maxeval, progressbar, logp_func, dlogp_func)
+    def point(x):
+        return {var.name: value for var, value in zip(out_vars, out_func(optimizer.bij.rmap(x)))}
+
+    if n_starts == 1:
+        mx0, opt_result, _ = optimizer(x0, progressbar)
+        mx = point(mx0)
+        if return_raw:
+            return mx, opt_result
+        else:
+            return mx
+
+    starts = _map_starts(model, optimizer.bij, x0, n_starts, starts_from, random_seed)
+    if cores > 1:
+        if mp_ctx is None or isinstance(mp_ctx, str):
+            mp_ctx = multiprocessing.get_context(mp_ctx)
+        with mp_ctx.Pool(
+            cores,
+            initializer=_init_map_worker,
+            initargs=(model, [var.name for var in vars], start, method, maxeval, args, kwargs),
+        ) as pool:
+            results = []
+            for result in progress_bar(
+                pool.imap(_map_worker, starts), total=n_starts, display=progressbar
+            ):
+                results.append(result)
     else:
-        cost_func = CostFuncWrapper(maxeval, progressbar, logp_func)
-
-    try:
-        opt_result = minimize(cost_func, x0, method=method, jac=compute_gradient, *args, **kwargs)
-        mx0 = opt_result["x"]  # r -> opt_result
-    except (KeyboardInterrupt, StopIteration) as e:
-        mx0, opt_result = cost_func.previous_x, None
-        if isinstance(e, StopIteration):
-            pm._log.info(e)
-    finally:
-        last_v = cost_func.n_eval
-        if progressbar:
-            assert isinstance(cost_func.progress, ProgressBar)
-            cost_func.progress.total = last_v
-            cost_func.progress.update(last_v)
-            print()
+        results = []
+        for x in progress_bar(starts, total=n_starts, display=progressbar):
+            t0 = time.perf_counter()
+            mx0, opt_result, n_eval = optimizer(x)
+            results.append((mx0, opt_result, n_eval, time.perf_counter() - t0))
+
+    optima = []
+    for x, (mx0, opt_result, n_eval, elapsed) in zip(starts, results):
+        logp = float(optimizer.logp_func(pm.floatX(mx0)))
+        optima.append(
+            MAPOptimum(
+                point=point(mx0),
+                logp=logp if np.isfinite(logp) else -np.inf,
+                start=optimizer.bij.rmap(x),
+                n_eval=n_eval,
+                time=elapsed,
+                result=opt_result,
+            )
+        )
+    return sorted(optima, key=lambda optimum: -optimum.logp)
+
+
+MAPOptimum = collections.namedtuple("MAPOptimum", "point,logp,start,n_eval,time,result")
+MAPOptimum.__doc__ = """An optimum of a multi-start find_MAP run.
+
+Attributes
+----------
+point: dict
+    The optimum, including the deterministics
+logp: float
+    The log-probability at the optimum, without the Jacobian terms of the transformations
+start: dict
+    The starting point of the free variables
+n_eval: int
+    The number of evaluations of the log-probability
+time: float
+    The time the optimization took in seconds
+result: scipy.optimize.OptimizeResult
+    The output of scipy.optimize.minimize, None if the optimization was interrupted
+"""
+
 
-    vars = get_default_varnames(model.unobserved_RVs, include_transformed)
-    mx = {var.name: value for var, value in zip(vars, model.fastfn(vars)(bij.rmap(mx0)))}
+class _MAPOptimizer:
+    """Runs the optimizations of find_MAP with logp and gradient functions that
+    are compiled once and reused for all starting points."""
+
+    def __init__(self, model, vars, start, method, maxeval, args, kwargs):
+        disc_vars = list(typefilter(vars, discrete_types))
+        self.bij = DictToArrayBijection(ArrayOrdering(vars), start)
+        self.logp_func = self.bij.mapf(model.fastlogp_nojac)
+
+        try:
+            self.dlogp_func = self.bij.mapf(model.fastdlogp_nojac(vars))
+            self.compute_gradient = True
+        except (AttributeError, NotImplementedError, tg.NullTypeGradError):
+            self.dlogp_func = None
+            self.compute_gradient = False
+
+        if disc_vars or not self.compute_gradient:
+            pm._log.warning(
+                "Warning: gradient not available."
+                + "(E.g. vars contains discrete variables). MAP "
+                + "estimates may not be accurate for the default "
+                + "parameters. Defaulting to non-gradient minimization "
+                + "'Powell'."
+            )
+            method = "Powell"
+        self.method = method
+        self.maxeval = maxeval
+        self.args = args
+        self.kwargs = kwargs
 
-    if return_raw:
-        return mx, opt_result
+    def __call__(self, x0, progressbar=False):
+        if self.compute_gradient:
+            cost_func = CostFuncWrapper(self.maxeval, progressbar, self.logp_func, self.dlogp_func)
+        else:
+            cost_func = CostFuncWrapper(self.maxeval, progressbar, self.logp_func)
+
+        try:
+            opt_result = minimize(
+                cost_func,
+                x0,
+                method=self.method,
+                jac=self.compute_gradient,
+                *self.args,
+                **self.kwargs
+            )
+            mx0 = opt_result["x"]  # r -> opt_result
+        except (KeyboardInterrupt, StopIteration) as e:
+            mx0, opt_result = cost_func.previous_x, None
+            if isinstance(e, StopIteration):
+                pm._log.info(e)
+        finally:
+            last_v = cost_func.n_eval
+            if progressbar:
+                assert isinstance(cost_func.progress, ProgressBar)
+                cost_func.progress.total = last_v
+                cost_func.progress.update(last_v)
+                print()
+        return mx0, opt_result, cost_func.n_eval
+
+
+def _map_starts(model, bij, x0, n_starts, starts_from, random_seed):
+    """Starting points of a multi-start find_MAP run, the first one is `x0`."""
+    rng = np.random.RandomState(random_seed)
+    if starts_from == "jitter":
+        starts = x0 + rng.uniform(-1, 1, size=(n_starts - 1, x0.size))
+    elif starts_from == "prior":
+        if random_seed is not None:
+            np.random.seed(random_seed)
+        # the prior sampler only knows the untransformed variables, the free
+        # variables are mapped to their transformed space draw by draw
+        names = [vmap.var for vmap in bij.ordering.vmap]
+        untransformed = {
+            name: get_untransformed_name(name) if is_transformed_name(name) else name
+            for name in names
+        }
+        prior = pm.fast_sample_prior_predictive(
+            n_starts - 1, model=model, var_names=list(untransformed.values())
+        )
+        starts = []
+        for i in range(n_starts - 1):
+            draw = {name: values[i] for name, values in prior.items()}
+            point = {}
+            for name in names:
+                value = draw[untransformed[name]]
+                if untransformed[name] != name:
+                    transform = model[untransformed[name]].transformation
+                    value = transform.forward_val(value, point=draw)
+                point[name] = value
+            starts.append(bij.map(point))
+        starts = np.stack(starts)
     else:
-        return mx
+        raise ValueError("Unknown starts_from {}, use 'jitter' or 'prior'".format(starts_from))
+    return [x0] + list(starts.astype(x0.dtype))
+
+
+_map_optimizer = None
+
+
+def _init_map_worker(model, var_names, start, method, maxeval, args, kwargs):
+    global _map_optimizer
+    vars = [model[name] for name in var_names]
+    _map_optimizer = _MAPOptimizer(model, vars, start, method, maxeval, args, kwargs)
+
+
+def _map_worker(x0):
+    t0 = time.perf_counter()
+    mx0, opt_result, n_eval = _map_optimizer(x0)
+    return mx0, opt_result, n_eval, time.perf_counter() - t0
 
 
 def allfinite(x):